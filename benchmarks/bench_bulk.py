@@ -0,0 +1,49 @@
+"""
+Compares setting the same positions on many collections bit by bit
+with building a mask once and applying it with one OR per collection.
+
+Run from the repository root:
+    $ PYTHONPATH=. python benchmarks/bench_bulk.py
+"""
+
+import random
+import timeit
+
+from token_cloak import BitCollection
+
+
+SIZES = [(128, 16), (512, 64), (4096, 64), (4096, 1024), (65536, 8192)]
+"""Collection bits and number of positions to set."""
+
+COUNT = 1000
+"""Collections the positions are set on."""
+
+
+def bench(bits, count):
+    """Print the time per collection with a list and with a mask."""
+    rnd = random.Random(bits * count)
+    positions = [rnd.randrange(bits) for i in range(count)]
+    collections = [BitCollection.from_random(bits) for i in range(COUNT)]
+    
+    def by_list():
+        for b in collections:
+            b.set_positions(positions)
+    
+    def by_mask():
+        mask = BitCollection.from_positions(positions, bits)
+        for b in collections:
+            b.set_positions(mask)
+    
+    times = []
+    for f in [by_list, by_mask]:
+        times.append(min(timeit.repeat(f, number=1, repeat=3)) / COUNT)
+    print('%6d %6d %10.2f %10.2f %8.1fx' % (
+            bits, count, times[0] * 1e6, times[1] * 1e6,
+            times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    print('%6s %6s %10s %10s %9s' % (
+            'bits', 'count', 'list us', 'mask us', 'speedup'))
+    for bits, count in SIZES:
+        bench(bits, count)
@@ -0,0 +1,67 @@
+"""
+Compares Token.encode and Token.decode with their compiled versions.
+
+Layers without seed bits have the same positions in every token, so
+compiling writes them in as constants, and those configs gain the most.
+Seeded layers still generate positions for every token.
+
+Run from the repository root:
+    $ PYTHONPATH=. python benchmarks/bench_codegen.py
+"""
+
+import time
+
+from token_cloak import Token
+
+
+NUMBER = 2000
+
+LAYERS = [
+    {
+        "type": "int",
+        "bits": 32,
+    },
+    {
+        "type": "hex",
+        "length": 8,
+    },
+    {
+        "type": "bool",
+    },
+]
+
+CONFIGS = {
+    "unseeded": {"seed_bits": 0},
+    "seed_bits=4": {"seed_bits": 4},
+}
+
+
+def bench(encode, decode, args):
+    """Return microseconds per encode and per decode."""
+    start = time.perf_counter()
+    for i in range(NUMBER):
+        encode(*args)
+    encoded_at = time.perf_counter()
+    s = encode(*args).public_token.to_base64()
+    decoded_at = time.perf_counter()
+    for i in range(NUMBER):
+        decode(s, data_type='base64')
+    end = time.perf_counter()
+    return ((encoded_at - start) / NUMBER * 1e6,
+            (end - decoded_at) / NUMBER * 1e6)
+
+
+if __name__ == '__main__':
+    args = (5, 'deadbeef', True)
+    print('%-12s %-9s %10s %10s' % ('config', 'path', 'encode', 'decode'))
+    for name, extra in CONFIGS.items():
+        config = dict(extra, layers=LAYERS, private_token_bits=64,
+                secret_key="a benchmark secret key that is long enough")
+        token = Token(config).freeze()
+        compiled = token.compile()
+        for path, encode, decode in [
+                ('generic', token.encode, token.decode),
+                ('compiled', compiled.encode, compiled.decode)]:
+            encode_us, decode_us = bench(encode, decode, args)
+            print('%-12s %-9s %8.1fus %8.1fus' % (
+                    name, path, encode_us, decode_us))
@@ -0,0 +1,37 @@
+"""
+Compares the string encodings of BitCollection by size and speed.
+
+Run from the repository root:
+    $ PYTHONPATH=. python benchmarks/bench_encodings.py
+"""
+
+import timeit
+
+from token_cloak import BitCollection
+
+
+ENCODINGS = ['base64', 'base32', 'base58', 'base85', 'hex']
+
+SIZES = [96, 128, 256, 512, 1024]
+
+NUMBER = 2000
+
+
+def bench(bits):
+    """Print one row per encoding for tokens of the given size."""
+    b = BitCollection.from_random(bits)
+    for encoding in ENCODINGS:
+        encode = getattr(b, 'to_' + encoding)
+        decode = getattr(BitCollection, 'from_' + encoding)
+        s = encode()
+        encode_rate = NUMBER / timeit.timeit(encode, number=NUMBER)
+        decode_rate = NUMBER / timeit.timeit(lambda: decode(s), number=NUMBER)
+        print('%6d %-8s %6d %12.0f %12.0f' % (
+                bits, encoding, len(s), encode_rate, decode_rate))
+
+
+if __name__ == '__main__':
+    print('%6s %-8s %6s %12s %12s' % (
+            'bits', 'encoding', 'chars', 'encode/s', 'decode/s'))
+    for bits in SIZES:
+        bench(bits)
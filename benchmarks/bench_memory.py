@@ -0,0 +1,96 @@
+"""
+Measures the memory held per decoded token with tracemalloc.
+
+Tokens are decoded first, then every result is rebuilt while tracing,
+once with the current classes and once with the per-instance __dict__
+layout BitCollection and TokenResult had before they were slotted. Both
+layouts hold copies of exactly the same payload.
+
+Run from the repository root:
+    $ PYTHONPATH=. python benchmarks/bench_memory.py
+"""
+
+from bitarray import bitarray
+import gc
+import tracemalloc
+
+from token_cloak import BitCollection, Token
+from token_cloak.tokens import TokenResult
+
+
+COUNT = 2000
+
+CONFIG = {
+    "secret_key": "a benchmark secret key that is long enough",
+    "private_token_bits": 128,
+    "seed_bits": 8,
+    "layers": [
+        {
+            "type": "int",
+            "bits": 32,
+        },
+        {
+            "type": "hex",
+            "length": 8,
+        },
+    ],
+}
+
+
+class DictBitCollection:
+    """The BitCollection layout before __slots__."""
+    
+    def __init__(self, content):
+        self.content = content
+
+
+class DictTokenResult:
+    """The TokenResult layout before it became a tuple."""
+    
+    def __init__(self, private_token=None, public_token=None, layers=None):
+        self.layers = layers
+        self.public_token = public_token
+        self.private_token = private_token
+
+
+def as_result(result):
+    """Copy a result with the current classes."""
+    return TokenResult(
+            private_token=BitCollection(bitarray(result.private_token.content)),
+            public_token=BitCollection(bitarray(result.public_token.content)),
+            layers=list(result.layers))
+
+
+def as_dict_result(result):
+    """Copy a result into the old layout."""
+    return DictTokenResult(
+            private_token=DictBitCollection(
+                    bitarray(result.private_token.content)),
+            public_token=DictBitCollection(
+                    bitarray(result.public_token.content)),
+            layers=list(result.layers))
+
+
+def measure(make):
+    """Return bytes allocated per token by the results make() keeps."""
+    gc.collect()
+    tracemalloc.start()
+    kept = make()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / COUNT
+
+
+if __name__ == '__main__':
+    token = Token(CONFIG)
+    results = []
+    for i in range(COUNT):
+        public_token = token.encode(i, '%08x' % i).public_token
+        results.append(token.decode(public_token))
+    
+    slotted = measure(lambda: [as_result(r) for r in results])
+    legacy = measure(lambda: [as_dict_result(r) for r in results])
+    print('%-8s %10s' % ('layout', 'bytes/token'))
+    print('%-8s %10.1f' % ('dict', legacy))
+    print('%-8s %10.1f' % ('slots', slotted))
@@ -0,0 +1,75 @@
+"""
+Measures encode and decode throughput on one Token shared by threads.
+
+Every thread runs the same number of round trips against a single
+frozen Token, with no locking. On a GIL build the total rate stays
+roughly flat as threads are added. On a free-threaded build
+(python3.13t and later) it should scale with the number of cores.
+
+Run from the repository root:
+    $ PYTHONPATH=. python benchmarks/bench_threads.py
+"""
+
+import sys
+import threading
+import time
+
+from token_cloak import Token
+
+
+THREADS = [1, 2, 4, 8, 16, 32]
+
+PER_THREAD = 200
+
+CONFIG = {
+    "secret_key": "a benchmark secret key that is long enough",
+    "private_token_bits": 128,
+    "seed_bits": 8,
+    "layers": [
+        {
+            "type": "int",
+            "bits": 32,
+        },
+        {
+            "type": "hex",
+            "length": 8,
+        },
+    ],
+}
+
+
+def work(token, errors):
+    """Round-trip PER_THREAD tokens and count any that come back wrong."""
+    for i in range(PER_THREAD):
+        result = token.encode(i, '%08x' % i)
+        if token.decode(result.public_token).layers != [i, '%08x' % i]:
+            errors.append(i)
+
+
+def bench(token, count):
+    """Return round trips per second with count threads."""
+    errors = []
+    threads = [threading.Thread(target=work, args=(token, errors))
+            for i in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise AssertionError('%d tokens failed to round trip' % len(errors))
+    return count * PER_THREAD / elapsed
+
+
+if __name__ == '__main__':
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('Python %s, GIL %s' % (sys.version.split()[0],
+            'enabled' if gil else 'disabled'))
+    token = Token(CONFIG).freeze()
+    print('%8s %12s %8s' % ('threads', 'trips/s', 'scaling'))
+    single = None
+    for count in THREADS:
+        rate = bench(token, count)
+        single = single or rate
+        print('%8d %12.0f %7.2fx' % (count, rate, rate / single))
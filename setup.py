@@ -49,6 +49,9 @@ setup(
         install_requires=[
             'bitarray',
         ],
+        extras_require={
+            'numpy': ['numpy'],
+        },
         classifiers=[
             'Development Status :: 4 - Beta',
             'Environment :: Web Environment',
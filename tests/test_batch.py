@@ -0,0 +1,94 @@
+import pytest
+import random
+import token_cloak
+from token_cloak import BitCollection, Token
+from token_cloak.batch import load_engine
+
+
+class TestBatch:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the batch tests"
+        self.token = Token({
+            "private_token_bits": 40,
+            "seed_bits": 2,
+            "layers": [
+                {"type": "int", "bits": 12},
+                {"type": "hex", "length": 3, "seed_bits": 0},
+                {"type": "bool", "positions": [7]},
+                {"type": "bytes", "length": 2, "seed_bits": 3},
+            ],
+        })
+        rnd = random.Random(7)
+        self.rows = [[
+            BitCollection.from_int(rnd.getrandbits(40), 40),
+            rnd.getrandbits(12),
+            '%03x' % rnd.getrandbits(12),
+            rnd.random() < 0.5,
+            bytes([rnd.getrandbits(8), rnd.getrandbits(8)]),
+        ] for i in range(200)]
+        self.seeds = [[rnd.getrandbits(2), rnd.getrandbits(3)]
+                for i in range(200)]
+    
+    def test_scalar(self):
+        encoded = self.token.encode_many(
+                self.rows, data_type='hex', seeds=self.seeds, engine='scalar')
+        assert encoded == [self.token.encode_to('hex', *row, seeds=seeds)
+                for row, seeds in zip(self.rows, self.seeds)]
+        results = self.token.decode_many(
+                encoded + ['abc'], data_type='hex', engine='scalar')
+        assert results[-1] is None
+        assert [result.layers for result in results[:-1]] == [
+                row[1:] for row in self.rows]
+        with pytest.raises(ValueError):
+            self.token.encode_many(self.rows, engine='fortran')
+    
+    def test_fallback(self):
+        # Whatever is installed, auto agrees with scalar.
+        encoded = self.token.encode_many(
+                self.rows, data_type='base64', seeds=self.seeds)
+        assert encoded == self.token.encode_many(
+                self.rows, data_type='base64', seeds=self.seeds,
+                engine='scalar')
+        if load_engine('auto') is None:
+            with pytest.raises(ImportError):
+                self.token.decode_many(encoded, data_type='base64',
+                        engine='numpy')
+    
+    def test_numpy(self):
+        pytest.importorskip('numpy')
+        token = self.token
+        results = token.encode_many(
+                self.rows, seeds=self.seeds, engine='numpy')
+        for row, seeds, result in zip(self.rows, self.seeds, results):
+            expected = token.encode(*row, seeds=seeds)
+            assert result.public_token.content == (
+                    expected.public_token.content)
+            assert result.private_token is row[0]
+            assert result.layers == row[1:]
+        
+        # Random private tokens and seeds still decode.
+        encoded = token.encode_many(
+                [row[1:] for row in self.rows], data_type='base64',
+                engine='numpy')
+        decoded = token.decode_many(
+                encoded + ['AAAA'], data_type='base64', engine='numpy')
+        assert decoded[-1] is None
+        assert [result.layers for result in decoded[:-1]] == [
+                row[1:] for row in self.rows]
+        
+        columns = token.decode_many(
+                [result.public_token for result in results],
+                columnar=True, engine='numpy')
+        assert all(columns.valid)
+        assert columns.values(0) == [row[1] for row in self.rows]
+        assert bytes(columns.private_tokens) == b''.join(
+                row[0].to_bytes() for row in self.rows)
+        
+        with pytest.raises(ValueError):
+            token.encode_many(self.rows, seeds=[[1]] * 200, engine='numpy')
+        with pytest.raises(ValueError):
+            token.encode_many(self.rows, seeds=[[1, 8]] * 200, engine='numpy')
+        with pytest.raises(ValueError):
+            token.encode_many(self.rows, seeds=[[1, 1, 1]] * 200,
+                    engine='numpy')
@@ -1,4 +1,6 @@
+import pytest
 from token_cloak import BitCollection
+from token_cloak.collections import FrozenBitCollection
 
 class TestBitCollection:
     
@@ -25,4 +27,190 @@ class TestBitCollection:
         b = BitCollection.from_bytes(msg)
         s = b.to_bytes()
         assert msg == s
-    
\ No newline at end of file
+    
+    def test_base32(self):
+        msg = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+        b = BitCollection.from_base32(msg)
+        assert b.length() == 160
+        assert msg == b.to_base32()
+        assert b.to_int() == BitCollection.from_base32(msg.lower()).to_int()
+        assert BitCollection.from_base32('O1-IL').to_base32() == '0111'
+    
+    def test_base58(self):
+        msg = '11StV1DL6CwTryKyV'
+        b = BitCollection.from_base58(msg)
+        assert b.to_bytes() == b'\0\0hello world'
+        assert msg == b.to_base58()
+    
+    def test_base85(self):
+        msg = b'moose'
+        b = BitCollection.from_bytes(msg)
+        s = b.to_base85()
+        assert len(s) == 7
+        assert BitCollection.from_base85(s).to_bytes() == msg
+    
+    def test_dense_padding(self):
+        for i in range(1, 70):
+            b = BitCollection.from_random(i)
+            for name, divisor in [('base32', 5), ('base58', 8), ('base85', 8)]:
+                s = getattr(b, 'to_' + name)()
+                c = getattr(BitCollection, 'from_' + name)(s)
+                assert c.length() == i + (-i % divisor)
+                assert c.content[:i] == b.content
+    
+    def test_slots(self):
+        b = BitCollection.from_int(5, bits=3)
+        assert not hasattr(b, '__dict__')
+        with pytest.raises(AttributeError):
+            b.other = 1
+    
+    def test_freeze(self):
+        b = BitCollection.from_int(5, bits=3)
+        f = b.freeze()
+        assert isinstance(f, FrozenBitCollection)
+        assert f.freeze() is f
+        assert f.to_int() == 5
+        b.pop()
+        assert f.length() == 3
+        with pytest.raises(TypeError):
+            f.pop()
+        with pytest.raises(TypeError):
+            f.insert_int(1, positions=[0])
+        with pytest.raises(TypeError):
+            f.content = b.content
+        t = f.thaw()
+        t.pop()
+        assert t.length() == 2
+        assert f.length() == 3
+    
+    def test_compare(self):
+        a = BitCollection.from_hex('a5')
+        assert a == BitCollection.from_hex('a5')
+        assert a == a.freeze()
+        assert a != BitCollection.from_hex('a4')
+        assert a != a.content
+        assert BitCollection.from_int(1, bits=1) != (
+                BitCollection.from_int(2, bits=2))
+        ordered = [BitCollection.from_int(i, bits=3) for i in [6, 1, 3]]
+        assert [b.to_int() for b in sorted(ordered)] == [1, 3, 6]
+        assert BitCollection.from_int(1, bits=2) < (
+                BitCollection.from_int(2, bits=3))
+        assert BitCollection.from_int(1, bits=2) < (
+                BitCollection.from_int(2, bits=2))
+        with pytest.raises(TypeError):
+            a < 'a5'
+    
+    def test_hash(self):
+        with pytest.raises(TypeError):
+            hash(BitCollection.from_hex('a5'))
+        f = BitCollection.from_hex('a5').freeze()
+        assert hash(f) == hash(f)
+        assert hash(f) == hash(BitCollection.from_hex('a5').freeze())
+        
+        # Same packed bytes, different lengths.
+        one = BitCollection.from_int(1, bits=1).freeze()
+        ten = BitCollection.from_int(2, bits=2).freeze()
+        assert one.to_bytes() == ten.to_bytes()
+        assert len(set([one, ten, one.thaw().freeze()])) == 2
+        index = {f: 'a5'}
+        assert index[BitCollection.from_hex('a5').freeze()] == 'a5'
+        with pytest.raises(TypeError):
+            f.cached_hash = 0
+    
+    def test_bulk(self):
+        a = BitCollection.from_hex('f0')
+        b = BitCollection.from_hex('3c')
+        assert (a & b).to_hex() == '30'
+        assert (a | b).to_hex() == 'fc'
+        assert (a ^ b).to_hex() == 'cc'
+        assert (~a).to_hex() == '0f'
+        assert (a + b).to_hex() == 'f03c'
+        assert a[2:6].to_hex() == 'c'
+        assert a[0] and not a[7]
+        assert a.to_hex() == 'f0'
+        with pytest.raises(ValueError):
+            a ^ BitCollection.from_hex('f')
+        f = a.freeze()
+        assert isinstance(f ^ b, FrozenBitCollection)
+        assert isinstance(f[1:], FrozenBitCollection)
+        assert isinstance(b ^ f, BitCollection)
+        assert not isinstance(b ^ f, FrozenBitCollection)
+    
+    def test_count_and_find(self):
+        b = BitCollection.from_hex('0a5')
+        assert b.count() == 4
+        assert b.count(False) == 8
+        assert b.find(True) == 4
+        assert b.find(True, 5) == 6
+        assert b.find(BitCollection.from_int(0b101, bits=3)) == 4
+        assert b.find(BitCollection.from_int(0b101, bits=3), 5) == 9
+        assert b.find(BitCollection.from_int(0b111, bits=3)) == -1
+        assert BitCollection.from_hex('0').find(True) == -1
+    
+    def test_extract_range(self):
+        b = BitCollection.from_hex('a5')
+        r = b.extract_range(2, 6)
+        assert r.to_int() == 0b1001
+        assert b.to_int() == 0b1001
+        with pytest.raises(TypeError):
+            b.freeze().extract_range(0, 1)
+    
+    def test_set_positions(self):
+        b = BitCollection.from_hex('00')
+        b.set_positions([0, 3, 7])
+        assert b.to_hex() == '91'
+        b.set_positions([3, 7], False)
+        assert b.to_hex() == '80'
+        with pytest.raises(TypeError):
+            b.freeze().set_positions([1])
+        
+        # A mask sets the same bits as its list of positions.
+        mask = BitCollection.from_positions([0, 3, 7, 3], 8)
+        assert mask.to_hex() == '91'
+        b = BitCollection.from_hex('46')
+        b.set_positions(mask)
+        assert b.to_hex() == 'd7'
+        b.set_positions(mask, False)
+        assert b.to_hex() == '46'
+        with pytest.raises(ValueError):
+            b.set_positions(BitCollection.from_positions([0], 9))
+        with pytest.raises(TypeError):
+            b.freeze().set_positions(mask)
+    
+    def test_many(self):
+        for bits in [24, 48, 8, 12, 5]:
+            collections = [BitCollection.from_random(bits) for i in range(20)]
+            for url_safe in [False, True]:
+                strings = [b.to_base64(url_safe=url_safe) for b in collections]
+                assert BitCollection.to_base64_many(
+                        collections, url_safe=url_safe) == strings
+                assert BitCollection.from_base64_many(
+                        strings, url_safe=url_safe) == [
+                        BitCollection.from_base64(s, url_safe=url_safe)
+                        for s in strings]
+            strings = [b.to_hex() for b in collections]
+            assert BitCollection.to_hex_many(collections) == strings
+            assert BitCollection.from_hex_many(strings) == [
+                    BitCollection.from_hex(s) for s in strings]
+        assert BitCollection.to_base64_many([]) == []
+        assert BitCollection.from_hex_many([]) == []
+        
+        # Mixed lengths, and strings a single call would misalign.
+        mixed = [BitCollection.from_random(24), BitCollection.from_random(48)]
+        assert BitCollection.to_base64_many(mixed) == [
+                b.to_base64() for b in mixed]
+        for strings in [['AAAA', 'A!AA'], ['AAAA', 'AA=='],
+                ['AAAA', 'AAAAAA']]:
+            assert BitCollection.from_base64_many(strings) == [
+                    BitCollection.from_base64(s) for s in strings]
+        collections = BitCollection.from_hex_many(['ab', 'cd'])
+        assert [b.to_hex() for b in collections] == ['ab', 'cd']
+        with pytest.raises(ValueError):
+            BitCollection.from_hex_many(['ab', 'zz'])
+    
+    def test_hex_odd_bits(self):
+        for i in range(1, 40):
+            b = BitCollection.from_random(i)
+            s = b.to_hex()
+            assert len(s) == (i + 3) // 4
+            assert BitCollection.from_hex(s).content[:i] == b.content
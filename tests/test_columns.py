@@ -0,0 +1,83 @@
+from array import array
+import random
+import token_cloak
+from token_cloak import BitCollection, Token
+
+
+class TestTokenColumns:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the columns tests"
+        self.config = {
+            "private_token_bits": 37,
+            "seed_bits": 4,
+            "layers": [
+                {"type": "int", "bits": 20, "name": "small"},
+                {"type": "int", "bits": 90},
+                {"type": "bytes", "length": 3},
+                {"type": "hex", "length": 5},
+                {"type": "bool", "name": "flag"},
+                {"type": "BitCollection", "bits": 11},
+                {
+                    "type": "struct",
+                    "fields": [
+                        {"name": "a", "type": "int", "bits": 3},
+                        {"name": "b", "type": "hex", "length": 1},
+                    ],
+                },
+            ],
+        }
+    
+    def values(self, i):
+        return [
+            random.randint(0, 2 ** 20 - 1),
+            random.randint(0, 2 ** 90 - 1),
+            bytes([random.randint(0, 255) for j in range(3)]),
+            ''.join(random.choice('0123456789abcdef') for j in range(5)),
+            bool(i % 2),
+            BitCollection.from_int(i, bits=11),
+            {"a": i % 8, "b": "f"},
+        ]
+    
+    def test_columnar(self):
+        token = Token(self.config)
+        expected = []
+        tokens = []
+        for i in range(20):
+            values = self.values(i)
+            result = token.encode(*values)
+            expected.append((result.private_token, values))
+            tokens.append(result.public_token.to_base64())
+        tokens[3] = 'not base64!'
+        tokens[7] = tokens[7][:-8]
+        columns = token.decode_many(tokens, data_type='base64', columnar=True)
+        assert columns.count == 20
+        assert columns.valid.count(True) == 18
+        assert not columns.valid[3] and not columns.valid[7]
+        assert isinstance(columns.column('small'), array)
+        assert columns.column(0)[3] == 0
+        for index in range(7):
+            values = columns.values(index)
+            for i, (private_token, layer_values) in enumerate(expected):
+                if i in [3, 7]:
+                    assert values[i] is None
+                elif index == 5:
+                    assert values[i].to_int() == layer_values[index].to_int()
+                else:
+                    assert values[i] == layer_values[index]
+        width = columns.private_token_width
+        assert width == 5
+        for i, (private_token, layer_values) in enumerate(expected):
+            packed = bytes(columns.private_tokens[i * width:(i + 1) * width])
+            if i not in [3, 7]:
+                assert packed == private_token.to_bytes()
+            else:
+                assert packed == bytes(width)
+        assert columns.column('flag').tolist()[:3] == [False, True, False]
+    
+    def test_rows(self):
+        token = Token(self.config)
+        tokens = [token.encode(*self.values(i)).public_token for i in range(3)]
+        results = token.decode_many(tokens)
+        assert [r.layers[0] for r in results] == token.decode_many(
+                tokens, columnar=True).values(0)
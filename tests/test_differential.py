@@ -0,0 +1,267 @@
+"""
+Differential tests: every engine must agree on every random input.
+
+Each case is a random config and inputs, with a fixed private token
+and fixed seeds. Every encoder must build bit-identical public tokens
+from them, and every decoder must read back identical bits. New
+engines only need an entry in ENCODERS or DECODERS.
+
+The workload is seeded, so failures reproduce. Set
+TOKEN_CLOAK_FUZZ_SEED and TOKEN_CLOAK_FUZZ_CASES to explore further.
+"""
+
+from bitarray import bitarray
+import os
+import random
+import pytest
+from token_cloak import BitCollection, Token
+from token_cloak.batch import load_engine
+from token_cloak.tables import build_position_tables
+from token_cloak.tokens import TokenResult
+
+
+SEED = int(os.environ.get('TOKEN_CLOAK_FUZZ_SEED', 1234))
+
+CASES = int(os.environ.get('TOKEN_CLOAK_FUZZ_CASES', 30))
+
+
+def random_layer(rnd):
+    """Make a random layer config and its input."""
+    kind = rnd.choice(['int', 'hex', 'bytes', 'BitCollection', 'bool',
+            'struct', 'timestamp', 'envelope'])
+    if kind == 'int':
+        layer = {'type': 'int', 'bits': rnd.randint(1, 70)}
+        value = rnd.getrandbits(layer['bits'])
+    elif kind == 'hex':
+        layer = {'type': 'hex', 'length': rnd.randint(1, 9)}
+        value = '%0*x' % (layer['length'], rnd.getrandbits(
+                layer['length'] * 4))
+    elif kind == 'bytes':
+        layer = {'type': 'bytes', 'length': rnd.randint(1, 5)}
+        value = bytes(rnd.getrandbits(8) for i in range(layer['length']))
+    elif kind == 'BitCollection':
+        layer = {'type': 'BitCollection', 'bits': rnd.randint(1, 20)}
+        value = BitCollection(bitarray(
+                [rnd.random() < 0.5 for i in range(layer['bits'])]))
+    elif kind == 'bool':
+        layer = {'type': 'bool'}
+        value = rnd.random() < 0.5
+    elif kind == 'timestamp':
+        layer = {'type': 'timestamp', 'bits': rnd.randint(8, 32),
+                'epoch': 1700000000, 'granularity': rnd.choice([1, 60])}
+        value = 1700000000 + rnd.getrandbits(layer['bits']) * (
+                layer['granularity'])
+    elif kind == 'envelope':
+        layer = {'type': rnd.choice(['int', 'bytes']), 'bits': 64,
+                'envelope': rnd.randint(24, 40)}
+        if layer['type'] == 'int':
+            value = rnd.getrandbits(rnd.randint(0, 16))
+        else:
+            count = rnd.randint(0, 2)
+            value = bytes(rnd.getrandbits(8)
+                    for i in range(count)) + bytes(8 - count)
+    else:
+        layer = {'type': 'struct', 'fields': [
+            {'name': 'a', 'type': 'int', 'bits': 7},
+            {'name': 'b', 'type': 'bool'},
+            {'name': 'c', 'type': 'hex', 'length': 2},
+        ]}
+        value = {'a': rnd.getrandbits(7), 'b': rnd.random() < 0.5,
+                'c': '%02x' % rnd.getrandbits(8)}
+    return layer, value
+
+
+def random_case(rnd):
+    """Make a random config, inputs, private token, and seeds."""
+    config = {
+        'secret_key': 'fuzz secret %d' % rnd.getrandbits(32),
+        'private_token_bits': rnd.choice([8, 13, 64, 96]),
+        'seed_bits': rnd.choice([0, 2, 4]),
+        'layers': [],
+    }
+    inputs = []
+    for i in range(rnd.randint(1, 4)):
+        layer, value = random_layer(rnd)
+        if rnd.random() < 0.3:
+            # Over 64 bits, the NumPy engine falls back to scalar.
+            layer['seed_bits'] = rnd.choice([0, 1, 3, 65, 70])
+        config['layers'].append(layer)
+        inputs.append(value)
+    token = Token(config)
+    
+    # Some layers get explicit positions, now that bits are known.
+    length = config['private_token_bits']
+    seeds = []
+    for layer, compiled in zip(config['layers'], token.layers):
+        if compiled.seed_bits is None and rnd.random() < 0.2:
+            layer['positions'] = [rnd.randint(0, length + i)
+                    for i in range(compiled.bits)]
+            length += compiled.bits
+            continue
+        length += compiled.bits
+        seed_bits = compiled.seed_bits
+        if seed_bits is None:
+            seed_bits = config['seed_bits']
+        if seed_bits:
+            seeds.append(rnd.getrandbits(seed_bits))
+            length += seed_bits
+    private_token = BitCollection.from_int(
+            rnd.getrandbits(config['private_token_bits']),
+            config['private_token_bits'])
+    return config, inputs, private_token, seeds
+
+
+def encode_generated(config, inputs, private_token, seeds):
+    """Positions from MT19937 on every encode."""
+    return Token(config).encode(private_token, *inputs, seeds=seeds)
+
+
+def encode_tabled(config, inputs, private_token, seeds):
+    """Positions looked up in precomputed tables."""
+    token = Token(config)
+    token.position_tables = build_position_tables(token, max_seed_bits=4)
+    return token.encode(private_token, *inputs, seeds=seeds)
+
+
+def encode_fused(config, inputs, private_token, seeds):
+    """Straight to bytes, with encode_to."""
+    token = Token(config)
+    bits = bitarray()
+    bits.frombytes(token.encode_to(
+            'bytes', private_token, *inputs, seeds=seeds))
+    return TokenResult(public_token=BitCollection(
+            bits[:token.public_token_bit_length()]))
+
+
+def encode_spliced(backend):
+    """Splice with a given backend."""
+    def encode(config, inputs, private_token, seeds):
+        token = Token(dict(config, splice_backend=backend))
+        return token.encode(private_token, *inputs, seeds=seeds)
+    return encode
+
+
+def encode_compiled(config, inputs, private_token, seeds):
+    """With encode generated for the config."""
+    compiled = Token(config).compile()
+    return compiled.encode(private_token, *inputs, seeds=seeds)
+
+
+ENCODERS = {
+    'generated': encode_generated,
+    'compiled': encode_compiled,
+    'tabled': encode_tabled,
+    'fused': encode_fused,
+    'insert': encode_spliced('insert'),
+    'int': encode_spliced('int'),
+    'gather': encode_spliced('gather'),
+}
+"""Ways to encode: each returns a TokenResult."""
+
+if load_engine('auto') is not None:
+    def encode_numpy(config, inputs, private_token, seeds):
+        """Spliced with others on a NumPy bit matrix."""
+        token = Token(config)
+        other = [BitCollection.from_random(token.private_token_bits)] + inputs
+        results = token.encode_many([other, [private_token] + inputs],
+                seeds=[seeds, seeds], engine='numpy')
+        return results[1]
+    ENCODERS['numpy'] = encode_numpy
+
+
+def decode_peeled(token, public_token):
+    """Peel every layer off the token."""
+    public, private, layers = token.decode_bits(BitCollection(
+            bitarray(public_token.content)))
+    return private.content, [layer.content for layer in layers]
+
+
+def decode_read(token, public_token):
+    """Read each layer in place, without peeling."""
+    private = decode_peeled(token, public_token)[0]
+    read = []
+    for index in range(len(token.layers)):
+        positions = token.layer_positions(public_token, index)
+        read.append(bitarray([public_token.content[p] for p in positions]))
+    return private, read
+
+
+def decode_columnar(token, public_token):
+    """Decode as a single-token column batch."""
+    columns = token.decode_many([public_token.to_base64()],
+            data_type='base64', columnar=True, engine='scalar')
+    private = bitarray()
+    private.frombytes(bytes(columns.private_tokens))
+    layers = []
+    for index, layer in enumerate(token.layers):
+        value = columns.value(layer, columns.columns[index], 0)
+        layers.append(layer.to_bitcollection(value).content)
+    return private[:token.private_token_bits], layers
+
+
+def decode_spliced(backend):
+    """Peel with a given splice backend."""
+    def decode(token, public_token):
+        token = Token(dict(token.config, splice_backend=backend))
+        return decode_peeled(token, public_token)
+    return decode
+
+
+def decode_compiled(token, public_token):
+    """With decode generated for the config."""
+    result = token.compile().decode(public_token)
+    return result.private_token.content, [layer.to_bitcollection(value).content
+            for layer, value in zip(token.layers, result.layers)]
+
+
+DECODERS = {
+    'peeled': decode_peeled,
+    'compiled': decode_compiled,
+    'read': decode_read,
+    'columnar': decode_columnar,
+    'insert': decode_spliced('insert'),
+    'int': decode_spliced('int'),
+    'gather': decode_spliced('gather'),
+}
+"""Ways to decode: each returns private token and layer bitarrays."""
+
+if load_engine('auto') is not None:
+    def decode_numpy(token, public_token):
+        """Peeled with others on a NumPy bit matrix."""
+        other = token.encode(*[layer.from_bitcollection(
+                BitCollection.from_int(0, layer.bits))
+                for layer in token.layers])
+        result = token.decode_many([other.public_token, public_token],
+                engine='numpy')[1]
+        private = result.private_token.content
+        return private, [layer.to_bitcollection(value).content
+                for layer, value in zip(token.layers, result.layers)]
+    DECODERS['numpy'] = decode_numpy
+
+
+@pytest.mark.parametrize('case', range(CASES))
+def test_engines_agree(case):
+    rnd = random.Random(SEED * 100003 + case)
+    config, inputs, private_token, seeds = random_case(rnd)
+    token = Token(config)
+    expected = [token.layers[i].to_bitcollection(value).content
+            for i, value in enumerate(inputs)]
+    
+    public_tokens = {}
+    for name, encode in ENCODERS.items():
+        public_tokens[name] = encode(
+                config, inputs, private_token, seeds).public_token.content
+    reference = public_tokens['generated']
+    for name, public_token in public_tokens.items():
+        assert public_token == reference, name
+    
+    for name, decode in DECODERS.items():
+        private, layers = decode(token, BitCollection(bitarray(reference)))
+        assert private == private_token.content, name
+        assert layers == expected, name
+    
+    # Rewriting every layer with its own value changes nothing.
+    updated = BitCollection(bitarray(reference))
+    for index, value in enumerate(inputs):
+        token.update_layer(updated, index, value)
+    assert updated.content == reference
@@ -0,0 +1,57 @@
+import json
+import os
+import token_cloak
+from token_cloak import Token
+
+
+class TestExplain:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the explain tests"
+        self.config = {
+            "private_token_bits": 64,
+            "seed_bits": 4,
+            "layers": [
+                {"type": "int", "bits": 12},
+                {"type": "hex", "length": 3, "seed_bits": 6},
+                {"type": "bytes", "length": 1, "positions": list(range(8))},
+                {"type": "int", "bits": 9, "seed_bits": 0},
+                {"type": "int", "bits": 5, "seed_bits": 20},
+            ],
+        }
+    
+    def test_explain(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'positions.table')
+        token = Token(self.config)
+        report = token.explain(measure=0)
+        assert 'encode_us' not in report
+        assert report['public_token_bits'] == (
+                token.public_token_bit_length())
+        assert report['encoded_lengths']['hex'] == token.encoded_length('hex')
+        assert [info['positions'] for info in report['layers']] == [
+                'seeded', 'seeded', 'explicit', 'secret', 'seeded']
+        assert [info['spliced_into'] for info in report['layers']] == [
+                64, 80, 98, 106, 115]
+        assert [info['table_bytes'] for info in report['layers']] == [
+                16 * 12 * 2, 64 * 12 * 2, None, None, None]
+        assert report['generators'] == 2 + 2 + 0 + 1 + 2
+        
+        token.build_position_table(path)
+        token.load_position_table(path)
+        report = token.explain(measure=5)
+        assert report['generators'] == 1 + 1 + 0 + 1 + 2
+        assert report['table_bytes'] == sum(
+                len(table.values) * table.values.itemsize
+                for table in token.position_tables.values())
+        assert report['encode_us'] > 0 and report['decode_us'] > 0
+    
+    def test_explain_command(self, tmpdir, capsys):
+        from token_cloak.__main__ import main
+        path = os.path.join(str(tmpdir), 'config.json')
+        with open(path, 'w') as f:
+            json.dump(dict(self.config, secret_key="k" * 16), f)
+        main(['explain', path, '--measure', '0'])
+        out = capsys.readouterr().out
+        assert 'public token   %d bits' % (
+                Token(self.config).public_token_bit_length()) in out
+        assert 'generators     7 per encode and decode' in out
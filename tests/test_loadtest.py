@@ -0,0 +1,65 @@
+import random
+import pytest
+import token_cloak
+from token_cloak import Token
+from token_cloak.loadtest import Histogram, Workload, run
+
+
+class TestLoadTest:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the load tests"
+        self.token = Token({
+            "private_token_bits": 48,
+            "seed_bits": 2,
+            "layers": [
+                {"type": "int", "bits": 12},
+                {"type": "bool"},
+            ],
+        })
+    
+    def test_histogram(self):
+        histogram = Histogram()
+        values = [random.randint(0, 10 ** 9) for i in range(5000)]
+        for value in values:
+            histogram.record(value)
+        values.sort()
+        for p in [50, 99, 99.9]:
+            exact = values[int(round(len(values) * p / 100)) - 1]
+            assert exact <= histogram.percentile(p) <= exact * 1.01
+        assert histogram.percentile(100) == values[-1]
+        
+        other = Histogram()
+        other.record(10 ** 10)
+        histogram.merge(other)
+        assert histogram.total == 5001
+        assert histogram.max == 10 ** 10
+        assert Histogram().percentile(50) == 0
+    
+    def test_workload(self):
+        mix = {'valid': 5, 'malformed': 2, 'wrong_config': 2, 'encode': 1}
+        workload = Workload(self.token, seed=7, mix=mix,
+                data_types=['base64', 'hex', 'base58'])
+        requests = workload.requests(200)
+        assert requests == Workload(self.token, seed=7, mix=mix,
+                data_types=['base64', 'hex', 'base58']).requests(200)
+        assert requests != Workload(self.token, seed=8, mix=mix,
+                data_types=['base64', 'hex', 'base58']).requests(200)
+        assert set(kind for kind, data_type, payload in requests) == set(mix)
+        with pytest.raises(ValueError):
+            Workload(self.token, mix={'bogus': 1})
+        
+        for kind, data_type, payload in requests:
+            if kind == 'valid':
+                assert self.token.decode(payload, data_type) is not None
+    
+    @pytest.mark.parametrize('mode', ['inline', 'threads', 'processes'])
+    def test_run(self, mode):
+        requests = Workload(self.token, seed=3).requests(40)
+        report = run(self.token, requests, rate=2000, mode=mode, workers=2)
+        assert report['count'] == 40
+        assert sum(report['outcomes'].values()) == 40
+        assert report['outcomes']['ok'] >= 30
+        assert 0 < report['p50'] <= report['p99'] <= report['p999']
+        assert report['p999'] <= report['max']
+        assert report['throughput'] > 0
@@ -0,0 +1,83 @@
+import pytest
+import token_cloak
+from token_cloak.exceptions import ConfigError
+from token_cloak.registry import TokenRegistry
+
+
+class TestTokenRegistry:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the registry tests"
+        self.config = {
+            "private_token_bits": 64,
+            "seed_bits": 4,
+            "layers": [{"type": "int", "bits": 16}],
+        }
+    
+    def test_interning(self):
+        registry = TokenRegistry()
+        token = registry.get(self.config)
+        assert token.frozen
+        assert registry.get(dict(self.config)) is token
+        assert registry.get(dict(self.config, secret_key="tenant 2")) is not token
+        assert registry.stats() == {
+            'size': 2, 'maxsize': 1024, 'hits': 1, 'misses': 2,
+            'evictions': 0}
+        
+        # Tokens made by the registry decode each other's tokens.
+        result = token.encode(1234)
+        assert registry.get(self.config).decode(
+                result.public_token).layers == [1234]
+        
+        # Shared tokens can't be changed.
+        with pytest.raises(AttributeError):
+            token.seed_bits = 2
+        with pytest.raises(AttributeError):
+            token.set_config(self.config)
+        
+        # The caller's config can change without affecting the token.
+        self.config["layers"][0]["bits"] = 8
+        assert token.layers[0].bits == 16
+        assert registry.get(self.config) is not token
+    
+    def test_public_token_type(self):
+        registry = TokenRegistry()
+        hex_token = registry.get(dict(self.config, public_token_type="hex"))
+        base64_token = registry.get(
+                dict(self.config, public_token_type="base64"))
+        assert base64_token is not hex_token
+        s = base64_token.encode(1234).public_token.to_base64()
+        assert base64_token.decode(s).layers == [1234]
+        insert = registry.get(dict(self.config, splice_backend="insert"))
+        assert registry.get(dict(self.config, splice_backend="int")) is not (
+                insert)
+    
+    def test_lru(self):
+        registry = TokenRegistry(maxsize=2)
+        configs = [dict(self.config, secret_key="tenant %d" % i)
+                for i in range(3)]
+        first = registry.get(configs[0])
+        registry.get(configs[1])
+        registry.get(configs[0])
+        registry.get(configs[2])
+        assert len(registry) == 2
+        assert registry.stats()['evictions'] == 1
+        assert registry.get(configs[0]) is first
+        assert registry.get(configs[1]) is not None
+        assert registry.stats()['misses'] == 4
+        
+        registry.discard(configs[1])
+        assert len(registry) == 1
+        registry.clear()
+        assert registry.stats()['size'] == 0
+    
+    def test_errors(self):
+        with pytest.raises(ConfigError):
+            TokenRegistry(maxsize=0)
+        registry = TokenRegistry()
+        with pytest.raises(ConfigError):
+            registry.get(dict(self.config, seed_bits=-1))
+        assert len(registry) == 0
+        token_cloak.secret_key = None
+        with pytest.raises(ConfigError):
+            registry.get(self.config)
@@ -0,0 +1,88 @@
+import os
+import pytest
+import token_cloak
+from token_cloak import BitCollection, Token
+from token_cloak.bloom import BloomFilter
+from token_cloak.revocation import RevocationIndex
+from token_cloak.tokens import RevokedTokenResult, TokenResult
+
+
+class TestBloomFilter:
+    
+    def test_bloom(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(b"key %d" % i)
+        for i in range(1000):
+            assert b'key %d' % i in bloom
+        false_positives = sum(
+                b'other %d' % i in bloom for i in range(10000))
+        assert false_positives < 300
+        
+        copy = BloomFilter.from_bytes(
+                bloom.to_bytes(), 1000, 0.01, bloom.size, bloom.hashes)
+        assert all(b'key %d' % i in copy for i in range(1000))
+
+
+class TestRevocationIndex:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the revocation tests"
+        self.token = Token({
+            "private_token_bits": 68,
+            "seed_bits": 4,
+            "layers": [{"type": "int", "bits": 16}],
+        })
+        self.results = [self.token.encode(i) for i in range(200)]
+    
+    def test_index(self, tmpdir):
+        revoked = [r.private_token for r in self.results[::3]]
+        for error_rate in [None, 0.001]:
+            path = os.path.join(str(tmpdir), 'revoked.%s' % error_rate)
+            RevocationIndex.build(revoked, error_rate=error_rate).write(path)
+            index = RevocationIndex.load(path)
+            assert len(index) == len(revoked)
+            assert (index.bloom is None) == (error_rate is None)
+            for i, result in enumerate(self.results):
+                assert (result.private_token in index) == (i % 3 == 0)
+            assert BitCollection.from_random(68) not in index
+            assert BitCollection.from_random(64) not in index
+    
+    def test_decode(self):
+        index = RevocationIndex.build([self.results[0].private_token])
+        s = self.results[0].public_token.to_base64()
+        assert self.token.decode(
+                s, data_type='base64', revocations=index) is None
+        revoked = self.token.decode(
+                s, data_type='base64', revocations=index, status=True)
+        assert isinstance(revoked, RevokedTokenResult)
+        assert revoked.status == 'revoked'
+        assert revoked.layers is None
+        assert revoked.private_token.to_int() == (
+                self.results[0].private_token.to_int())
+        
+        valid = self.token.decode(
+                self.results[1].public_token, revocations=index)
+        assert valid.status == 'valid'
+        assert valid.layers == [1]
+        
+        tokens = [r.public_token.to_hex() for r in self.results[:3]]
+        many = self.token.decode_many(
+                tokens, data_type='hex', revocations=index)
+        assert many[0] is None and many[1].layers == [1]
+        many = self.token.decode_many(
+                tokens, data_type='hex', revocations=index, status=True)
+        assert [r.status for r in many] == ['revoked', 'valid', 'valid']
+        columns = self.token.decode_many(
+                tokens, data_type='hex', columnar=True, revocations=index)
+        assert columns.valid.tolist() == [False, True, True]
+    
+    def test_errors(self, tmpdir):
+        with pytest.raises(ValueError):
+            RevocationIndex.build([b'ab', b'abc'])
+        path = os.path.join(str(tmpdir), 'bad')
+        with open(path, 'wb') as f:
+            f.write(b'not an index' * 10)
+        with pytest.raises(ValueError):
+            RevocationIndex.load(path)
+        assert b'ab' not in RevocationIndex.build([])
@@ -0,0 +1,138 @@
+import pytest
+import token_cloak
+from token_cloak import Token
+from token_cloak.exceptions import ConfigError
+from token_cloak.router import TokenRouter
+
+
+class TestTokenRouter:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the router tests"
+        self.sessions = Token({
+            "private_token_bits": 128,
+            "seed_bits": 6,
+            "layers": [{"type": "int", "bits": 32}],
+        })
+        self.invites = Token({
+            "private_token_bits": 64,
+            "layers": [{"type": "hex", "length": 6}],
+        })
+        self.keys = {}
+        for version in [1, 2]:
+            self.keys[version] = Token({
+                "secret_key": "api key secret %d" % version,
+                "private_token_bits": 96,
+                "seed_bits": 3,
+                "layers": [
+                    {"type": "bytes", "length": 4},
+                    {"type": "int", "bits": 4, "name": "version",
+                            "positions": [0, 17, 64, 130]},
+                ],
+            })
+    
+    def make_router(self):
+        router = TokenRouter()
+        router.register('sessions', self.sessions)
+        router.register('invites', self.invites)
+        router.register('keys1', self.keys[1], version=1, data_types=[
+                None, 'base64', 'hex'])
+        router.register('keys2', self.keys[2], version=2, data_types=[
+                None, 'base64', 'hex'])
+        return router
+    
+    def test_route(self):
+        router = self.make_router()
+        session = self.sessions.encode(7).public_token
+        invite = self.invites.encode('abcdef').public_token
+        key1 = self.keys[1].encode(b'key1', 1).public_token
+        key2 = self.keys[2].encode(b'key2', 2).public_token
+        for data_type in [None, 'base64', 'hex']:
+            def convert(b):
+                if data_type is None:
+                    return b
+                return getattr(b, 'to_' + data_type)()
+            assert router.route(convert(session), data_type) == 'sessions'
+            assert router.route(convert(invite), data_type) == 'invites'
+            assert router.route(convert(key1), data_type) == 'keys1'
+            assert router.route(convert(key2), data_type) == 'keys2'
+        for data_type in ['base32', 'base85', 'bytes']:
+            s = getattr(invite, 'to_' + data_type)()
+            assert router.route(s, data_type) == 'invites'
+        assert router.route(session.to_base64().rstrip('='), 'base64') == 'sessions'
+        assert router.route('abc', 'hex') is None
+        name, result = router.decode(key2.to_hex(), data_type='hex')
+        assert name == 'keys2'
+        assert result.layers == [b'key2', 2]
+    
+    def test_base58_lengths(self):
+        router = TokenRouter()
+        router.register('invites', self.invites, data_types=['base58'])
+        for i in range(50):
+            s = self.invites.encode('abcdef').public_token.to_base58()
+            assert router.route(s, 'base58') == 'invites'
+    
+    def test_decode_many(self):
+        router = self.make_router()
+        tokens = [
+            self.sessions.encode(1).public_token.to_base64(),
+            self.keys[2].encode(b'abcd', 2).public_token.to_base64(),
+            'garbage',
+            self.invites.encode('123456').public_token.to_base64(),
+            self.keys[1].encode(b'efgh', 1).public_token.to_base64(),
+        ]
+        groups = router.route_many(tokens, data_type='base64')
+        assert groups == {
+            'sessions': [0], 'keys2': [1], None: [2], 'invites': [3],
+            'keys1': [4]}
+        results = router.decode_many(tokens, data_type='base64')
+        assert [r and r[0] for r in results] == [
+                'sessions', 'keys2', None, 'invites', 'keys1']
+        assert results[1][1].layers == [b'abcd', 2]
+        assert results[3][1].layers == ['123456']
+        
+        # Tokens of the wrong type match no route, without aborting.
+        mixed = [tokens[0], self.sessions.encode(1).public_token, None,
+                b'\0' * 8, tokens[4]]
+        results = router.decode_many(mixed, data_type='base64')
+        assert [r and r[0] for r in results] == [
+                'sessions', None, None, None, 'keys1']
+        assert router.route('AAAA') is None
+        assert router.route(tokens[0].encode('ascii'), 'bytes') is None
+        with pytest.raises(ValueError):
+            router.route(tokens[0], 'base36')
+    
+    def test_conflicts(self):
+        router = TokenRouter()
+        router.register('keys1', self.keys[1])
+        with pytest.raises(ConfigError):
+            router.register('keys2', self.keys[2])
+        with pytest.raises(ConfigError):
+            router.register('keys1', self.sessions)
+        router = TokenRouter()
+        router.register('keys1', self.keys[1], version=1)
+        with pytest.raises(ConfigError):
+            router.register('keys2', self.keys[2], version=1)
+        with pytest.raises(ConfigError):
+            router.register('sessions', self.sessions, version=1)
+        seeded = Token({
+            "private_token_bits": 96,
+            "layers": [
+                {"type": "int", "bits": 4, "name": "version"},
+                {"type": "bytes", "length": 4},
+            ],
+        })
+        with pytest.raises(ConfigError):
+            router.register('seeded', seeded, version=3)
+        
+        # Versions must be read from the same place in every config.
+        for version_layer in [
+                {"type": "int", "bits": 4, "name": "version",
+                        "positions": [1, 17, 64, 130]},
+                {"type": "hex", "length": 1, "name": "version",
+                        "positions": [0, 17, 64, 130]}]:
+            moved = Token(dict(self.keys[2].config,
+                    layers=[self.keys[2].config["layers"][0], version_layer]))
+            with pytest.raises(ConfigError):
+                router.register('moved', moved, version=2)
+        router.register('keys2', self.keys[2], version=2)
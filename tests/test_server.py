@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+import struct
+import token_cloak
+from token_cloak import Token
+from token_cloak.server import TokenServer
+
+
+class TestTokenServer:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the server tests"
+        self.token = Token({
+            "private_token_bits": 64,
+            "seed_bits": 4,
+            "layers": [
+                {"type": "int", "bits": 16},
+                {"type": "bytes", "length": 2},
+            ],
+        }).freeze()
+    
+    def run(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+    
+    def test_line_framing(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'tokens.sock')
+        server = TokenServer(self.token, max_batch=8, max_wait=0.01)
+        
+        async def talk():
+            await server.start_unix(path)
+            reader, writer = await asyncio.open_unix_connection(path)
+            
+            # Pipeline every request before reading any response.
+            for i in range(20):
+                writer.write(json.dumps({
+                    "id": i, "op": "encode", "layers": [i, "00%02x" % i],
+                    "data_type": "base64"}).encode() + b'\n')
+            encoded = [json.loads(await reader.readline()) for i in range(20)]
+            for response in encoded:
+                writer.write(json.dumps({
+                    "id": response["id"], "op": "decode",
+                    "token": response["public_token"],
+                    "data_type": "base64"}).encode() + b'\n')
+            writer.write(b'{"id": "bad", "op": "decode", "token": "AAAA", '
+                    b'"data_type": "base64"}\n')
+            writer.write(b'not json\n')
+            writer.write(b'{"id": "s", "op": "stats"}\n')
+            decoded = [json.loads(await reader.readline()) for i in range(23)]
+            writer.close()
+            await asyncio.sleep(0.05)
+            await server.close()
+            return encoded, decoded
+        
+        encoded, decoded = self.run(talk())
+        assert [r["id"] for r in encoded] == list(range(20))
+        for i in range(20):
+            assert decoded[i]["ok"]
+            assert decoded[i]["layers"] == [i, "00%02x" % i]
+            assert decoded[i]["private_token"] == encoded[i]["private_token"]
+        assert decoded[20] == {"id": "bad", "ok": False, "error": "invalid token"}
+        assert decoded[21]["ok"] is False
+        stats = decoded[22]["stats"]
+        assert stats["requests"] == 41
+        assert stats["largest_batch"] <= 8
+        assert server.stats()["batches"] >= 6
+        assert server.stats()["mean_batch_size"] <= 8
+    
+    def test_length_framing(self):
+        server = TokenServer(self.token, framing='length')
+        public_token = self.token.encode(7, b'hi').public_token.to_hex()
+        
+        async def talk():
+            tcp = await server.start_tcp()
+            port = tcp.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            data = json.dumps({"id": 1, "op": "decode", "token": public_token,
+                    "data_type": "hex"}).encode()
+            writer.write(struct.pack('>I', len(data)) + data)
+            length = struct.unpack('>I', await reader.readexactly(4))[0]
+            response = json.loads(await reader.readexactly(length))
+            writer.close()
+            await asyncio.sleep(0.05)
+            await server.close()
+            return response
+        
+        response = self.run(talk())
+        assert response["layers"] == [7, "6869"]
+        assert response["public_token"] == public_token
+    
+    def test_bad_request(self):
+        server = TokenServer(self.token, max_batch=1, max_wait=0)
+        public_token = self.token.encode(7, b'hi').public_token.to_hex()
+        
+        async def talk():
+            tcp = await server.start_tcp()
+            port = tcp.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'{"id": 1, "op": "decode", "token": "abc", '
+                    b'"data_type": "int"}\n')
+            writer.write(json.dumps({"id": 2, "op": "decode",
+                    "token": public_token, "data_type": "hex"}).encode()
+                    + b'\n')
+            responses = [json.loads(await asyncio.wait_for(
+                    reader.readline(), 5)) for i in range(2)]
+            writer.close()
+            await asyncio.sleep(0.05)
+            await server.close()
+            return responses
+        
+        bad, good = self.run(talk())
+        assert bad == {"id": 1, "ok": False, "error": "invalid token"}
+        assert good["ok"] and good["layers"] == [7, "6869"]
+        
+        # Encoding needs a value for every layer, and no more.
+        for layers in [[7], [7, "6869", 1], 7]:
+            response = server.encode({"id": 3, "op": "encode",
+                    "layers": layers})
+            assert response == {"id": 3, "ok": False,
+                    "error": "expected a list of 2 layer values"}
+        assert server.encode({"id": 4, "layers": [7, "6869"]})["ok"]
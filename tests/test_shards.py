@@ -0,0 +1,100 @@
+import json
+import os
+import pytest
+import subprocess
+import sys
+import token_cloak
+from token_cloak import Token
+from token_cloak.shards import MANIFEST_SUFFIX, merge_shards
+
+
+class TestShards:
+    
+    config = {
+        "private_token_bits": 10,
+        "layers": [{"type": "int", "bits": 4}],
+    }
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the shard tests"
+    
+    def test_mint_shard(self):
+        token = Token(self.config)
+        results = list(token.mint_shard(200, 2, 3, 9))
+        assert len(set(r.private_token.freeze() for r in results)) == 200
+        assert all(r.private_token[:2].to_int() == 2 for r in results)
+        assert all(r.layers == [9] for r in results)
+        
+        # Only 7 random bits are left, so a shard holds 128 at most.
+        with pytest.raises(ValueError):
+            list(token.mint_shard(129, 0, 8, 9, max_retries=20))
+        with pytest.raises(ValueError):
+            token.mint_shard(1, 6, 6, 9)
+        with pytest.raises(ValueError):
+            token.mint_shard(1, 0, 2048, 9)
+    
+    def test_write_and_merge(self, tmpdir):
+        token = Token(self.config)
+        manifests = []
+        for shard in [2, 0, 1]:
+            path = os.path.join(str(tmpdir), 'tokens-%d.txt' % shard)
+            minter = token.mint_shard(100, shard, 3, values=lambda i: [i % 16])
+            manifest = minter.write(path, data_type='hex')
+            assert manifest['count'] == 100
+            assert manifest['fingerprint'] == token.fingerprint()
+            manifests.append(path + MANIFEST_SUFFIX)
+        
+        out = os.path.join(str(tmpdir), 'tokens.txt')
+        merged = merge_shards(manifests, out)
+        assert merged['parts'] == [0, 1, 2]
+        assert merged['count'] == 300
+        with open(out + MANIFEST_SUFFIX) as f:
+            assert json.load(f) == merged
+        with open(out) as f:
+            lines = f.read().split()
+        assert len(set(lines)) == 300
+        shards = [token.decode(s, data_type='hex').private_token[:2].to_int()
+                for s in lines]
+        assert shards == [0] * 100 + [1] * 100 + [2] * 100
+        
+        # The same shard twice.
+        with pytest.raises(ValueError):
+            merge_shards(manifests + manifests[:1], out)
+        
+        # A file that's changed since it was minted.
+        with open(os.path.join(str(tmpdir), 'tokens-1.txt'), 'a') as f:
+            f.write('00\n')
+        with pytest.raises(ValueError):
+            merge_shards(manifests, out)
+        assert not os.path.exists(out)
+    
+    def test_merge_other_config(self, tmpdir):
+        manifests = []
+        for shard, secret_key in enumerate(['one secret key', 'another']):
+            config = dict(self.config, secret_key=secret_key)
+            path = os.path.join(str(tmpdir), 'tokens-%d.txt' % shard)
+            Token(config).mint_shard(10, shard, 2, 1).write(path)
+            manifests.append(path + MANIFEST_SUFFIX)
+        with pytest.raises(ValueError):
+            merge_shards(manifests, os.path.join(str(tmpdir), 'tokens.txt'))
+    
+    def test_processes(self, tmpdir):
+        """Each shard is minted by its own process, like separate nodes."""
+        tmpdir = str(tmpdir)
+        config = os.path.join(tmpdir, 'config.json')
+        with open(config, 'w') as f:
+            json.dump(dict(self.config, secret_key="k" * 16), f)
+        command = [sys.executable, '-m', 'token_cloak']
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(
+                os.path.dirname(token_cloak.__file__)))
+        workers = [subprocess.Popen(command + [
+                'mint', config, '150', '--shard', str(shard), '--shards', '4',
+                '--values', '[3]', '--out', 'tokens-%d.txt' % shard],
+                cwd=tmpdir, env=env) for shard in range(4)]
+        assert [worker.wait() for worker in workers] == [0] * 4
+        subprocess.check_call(command + ['merge', 'tokens.txt'] + [
+                'tokens-%d.txt%s' % (shard, MANIFEST_SUFFIX)
+                for shard in range(4)], cwd=tmpdir, env=env)
+        with open(os.path.join(tmpdir, 'tokens.txt')) as f:
+            lines = f.read().split()
+        assert len(set(lines)) == 600
@@ -0,0 +1,78 @@
+import pytest
+import random
+import token_cloak
+from token_cloak import Token
+from token_cloak.exceptions import ConfigError
+from token_cloak.splice import SPLICERS, free_slot, place_inserts
+
+
+class TestSplice:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the splice tests"
+    
+    def test_cost_model(self):
+        short = Token({
+            "private_token_bits": 64,
+            "layers": [{"type": "bool", "positions": [5]}],
+        })
+        assert short.splice_backend == 'insert'
+        assert short.splice_choice['reason'] == 'predicted cheapest'
+        
+        long = Token({
+            "private_token_bits": 1024,
+            "seed_bits": 8,
+            "layers": [{"type": "bytes", "length": 256}],
+        })
+        assert long.splice_backend == 'gather'
+        estimates = long.splice_choice['estimates']
+        assert sorted(estimates) == sorted(SPLICERS)
+        assert min(estimates.values()) == estimates['gather']
+        assert long.explain(measure=0)['splice']['backend'] == 'gather'
+    
+    def test_override(self):
+        for backend in SPLICERS:
+            token = Token({
+                "private_token_bits": 32,
+                "seed_bits": 4,
+                "splice_backend": backend,
+                "layers": [{"type": "int", "bits": 20}, {"type": "bool"}],
+            })
+            assert token.splice_backend == backend
+            assert token.splice_choice['reason'] == 'set by config'
+            result = token.encode(123456, True)
+            assert token.decode(result.public_token).layers == [123456, True]
+        with pytest.raises(ConfigError):
+            Token({"private_token_bits": 32, "splice_backend": "fastest"})
+    
+    def test_calibrate(self):
+        token = Token({
+            "private_token_bits": 32,
+            "seed_bits": 4,
+            "splice_backend": "calibrate",
+            "layers": [{"type": "hex", "length": 6}],
+        })
+        choice = token.splice_choice
+        assert choice['reason'] == 'measured fastest'
+        assert sorted(choice['timings']) == sorted(SPLICERS)
+        assert token.splice_backend == min(
+                choice['timings'], key=choice['timings'].get)
+        assert token.decode(token.encode('c0ffee').public_token).layers == [
+                'c0ffee']
+    
+    def test_place_inserts(self):
+        rnd = random.Random(3)
+        for i in range(50):
+            content = list(range(rnd.randint(0, 40)))
+            positions = []
+            for j in range(rnd.randint(1, 20)):
+                positions.append(rnd.randint(0, len(content)))
+                content.insert(positions[-1], 'bit %d' % j)
+            placed = place_inserts(positions)
+            assert [content[k] for k in placed] == [
+                    'bit %d' % j for j in range(len(positions))]
+            
+            # Bits that were there before are found around the inserts.
+            taken = sorted(placed)
+            for k in range(len(content) - len(positions)):
+                assert content[free_slot(k, taken)] == k
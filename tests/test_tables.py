@@ -0,0 +1,57 @@
+import os
+import pytest
+import random
+import token_cloak
+from token_cloak import BitCollection, Token
+from token_cloak.exceptions import ConfigError
+
+
+class TestPositionTables:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the table tests"
+        self.config = {
+            "private_token_bits": 64,
+            "seed_bits": 4,
+            "layers": [
+                {"type": "int", "bits": 12},
+                {"type": "hex", "length": 3, "seed_bits": 6},
+                {"type": "bytes", "length": 1, "positions": list(range(8))},
+                {"type": "int", "bits": 9, "seed_bits": 0},
+                {"type": "int", "bits": 5, "seed_bits": 20},
+            ],
+        }
+    
+    def test_table(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'positions.table')
+        token = Token(self.config)
+        assert token.build_position_table(path) == 2
+        
+        loaded = Token(self.config)
+        loaded.load_position_table(path)
+        assert sorted(loaded.position_tables) == [0, 1]
+        assert loaded.position_tables[1].seeds == 64
+        for seed in [0, 1, 17, 63]:
+            assert loaded.position_tables[1].positions(seed) == (
+                    token.generate_bit_positions(
+                            seed=seed, max_position=64 + 12 + 4, bits=12))
+        
+        for i in range(20):
+            values = [
+                random.randint(0, 4095), '%03x' % i, b'x',
+                random.randint(0, 511), random.randint(0, 31)]
+            first = loaded.encode(*values)
+            second = token.decode(first.public_token)
+            assert second.layers == values
+            third = loaded.decode(token.encode(*values).public_token)
+            assert third.layers == values
+    
+    def test_fingerprint(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'positions.table')
+        Token(self.config).build_position_table(path)
+        self.config["secret_key"] = "another secret key"
+        token = Token(self.config)
+        assert token.fingerprint() != Token(
+                dict(self.config, secret_key="x" * 9)).fingerprint()
+        with pytest.raises(ConfigError):
+            token.load_position_table(path)
@@ -0,0 +1,67 @@
+import threading
+import token_cloak
+from token_cloak import Token
+
+
+class TestThreads:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the thread tests"
+    
+    def test_shared_token(self):
+        token = Token({
+            "private_token_bits": 64,
+            "seed_bits": 6,
+            "layers": [
+                {"type": "int", "bits": 24},
+                {"type": "hex", "length": 5, "seed_bits": 3},
+            ],
+        }).freeze()
+        errors = []
+        barrier = threading.Barrier(8)
+        
+        def work(n):
+            barrier.wait()
+            for i in range(40):
+                values = [n * 1000 + i, '%05x' % (n * 100 + i)]
+                result = token.encode(*values)
+                decoded = token.decode(result.public_token.to_base64(),
+                        data_type='base64')
+                if decoded is None or decoded.layers != values:
+                    errors.append(values)
+                elif (decoded.private_token.to_int()
+                        != result.private_token.to_int()):
+                    errors.append(values)
+        
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+    
+    def test_shared_compile(self):
+        from token_cloak.codegen import cache
+        configs = [{
+            "private_token_bits": 32,
+            "layers": [{"type": "int", "bits": 8 + n % 4}],
+        } for n in range(16)]
+        for config in configs:
+            cache.pop(Token(config).fingerprint(), None)
+        sources = []
+        barrier = threading.Barrier(8)
+        
+        def work():
+            barrier.wait()
+            for config in configs:
+                sources.append(Token(config).compile().source)
+        
+        threads = [threading.Thread(target=work) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Every thread ends up sharing the same source per config.
+        assert len(sources) == 8 * 16
+        assert len(set(map(id, sources))) == 4
@@ -1,6 +1,12 @@
+import datetime
+import pytest
 import random
 import token_cloak
+import tracemalloc
+import warnings
 from token_cloak import BitCollection, Token
+from token_cloak.exceptions import ConfigError
+from token_cloak.tokens import TokenResult
 
 
 class TestToken:
@@ -89,6 +95,25 @@ class TestToken:
                     data_type='base64')
             assert second.private_token.to_int() == first.private_token.to_int()
     
+    def test_dense_tokens(self):
+        self.config["layers"] = [
+            {
+                "type": "int",
+                "bits": 13,
+            },
+        ]
+        for i in range(self.start, self.end, 7):
+            self.config["private_token_bits"] = i
+            token = Token(self.config)
+            first = token.encode(1234)
+            for data_type in ['base32', 'base58', 'base85']:
+                s = getattr(first.public_token, 'to_' + data_type)()
+                second = token.decode(s, data_type=data_type)
+                assert second.private_token.to_int() == first.private_token.to_int()
+                assert second.layers[0] == 1234
+            assert token.decode('ILOU', data_type='base32') is None
+            assert token.decode('0OIl', data_type='base58') is None
+    
     def test_bitcollection_layer(self):
         for i in range(self.start, self.end):
             self.config["layers"] = [
@@ -209,4 +234,424 @@ class TestToken:
             assert first.private_token.to_int() == second.private_token.to_int()
             assert second.layers[0] == a
             assert second.public_token.length() == self.config["private_token_bits"] + i
-    
\ No newline at end of file
+    
+    def test_update_layer(self):
+        self.config["layers"] = [
+            {
+                "type": "int",
+                "bits": 20,
+            },
+            {
+                "type": "hex",
+                "length": 6,
+                "seed_bits": 5,
+            },
+            {
+                "type": "int",
+                "bits": 12,
+                "positions": [random.randint(0, 120) for i in range(12)],
+            },
+            {
+                "type": "bytes",
+                "length": 2,
+            },
+        ]
+        token = Token(self.config)
+        first = token.encode(7, "abcdef", 9, b'hi')
+        public_token = first.public_token
+        before = public_token.to_int()
+        for index, value in enumerate([1234, "012345", 4000, b'yo']):
+            token.update_layer(public_token, index, value)
+            second = token.decode(public_token)
+            assert first.private_token.to_int() == second.private_token.to_int()
+            assert second.layers[index] == value
+        assert second.layers == [1234, "012345", 4000, b'yo']
+        token.update_layer(public_token, 0, 7)
+        token.update_layer(public_token, 1, "abcdef")
+        token.update_layer(public_token, 2, 9)
+        token.update_layer(public_token, 3, b'hi')
+        assert public_token.to_int() == before
+        
+        # Frozen tokens keep their bits, and so their cached hash.
+        frozen = public_token.freeze()
+        key = hash(frozen)
+        with pytest.raises(TypeError):
+            token.update_layer(frozen, 0, 8)
+        assert frozen == public_token and hash(frozen) == key
+    
+    def test_struct_layer(self):
+        fields = [
+            {"name": "flag", "type": "bool"},
+            {"name": "shard", "type": "int", "bits": 10},
+            {"name": "region", "type": "hex", "length": 3},
+            {"name": "tag", "type": "bytes", "length": 2},
+            {"name": "other", "type": "bool"},
+        ]
+        self.config["layers"] = [
+            {
+                "type": "struct",
+                "fields": fields,
+            },
+            {
+                "type": "int",
+                "bits": 8,
+            },
+        ]
+        value = {
+            "flag": True,
+            "shard": 1000,
+            "region": "a1f",
+            "tag": b'ok',
+            "other": False,
+        }
+        token = Token(self.config)
+        assert token.layers[0].bits == 1 + 10 + 12 + 16 + 1
+        first = token.encode(value, 200)
+        second = token.decode(first.public_token)
+        assert first.private_token.to_int() == second.private_token.to_int()
+        assert second.layers == [value, 200]
+        self.config["layers"][0]["namedtuple"] = True
+        token = Token(self.config)
+        second = token.decode(token.encode(value, 5).public_token)
+        assert second.layers[0]._asdict() == value
+        assert second.layers[0].shard == 1000
+        first = token.encode(second.layers[0], 5)
+        assert token.decode(first.public_token).layers[0] == second.layers[0]
+    
+    def test_struct_layer_errors(self):
+        self.config["layers"] = [
+            {
+                "type": "struct",
+                "fields": [
+                    {"name": "a", "type": "int", "bits": 4},
+                    {"name": "a", "type": "bool"},
+                ],
+            },
+        ]
+        with pytest.raises(ConfigError):
+            Token(self.config)
+        self.config["layers"][0]["fields"][1]["name"] = "b"
+        self.config["layers"][0]["fields"][1]["seed_bits"] = 3
+        with pytest.raises(ConfigError):
+            Token(self.config)
+        del self.config["layers"][0]["fields"][1]["seed_bits"]
+        token = Token(self.config)
+        with pytest.raises(ValueError):
+            token.encode({"a": 1})
+        with pytest.raises(ValueError):
+            token.encode({"a": 1, "b": 1})
+        
+        # Names namedtuple can't take are config errors too.
+        for name in ["class", "_b", "2b", "b-c"]:
+            self.config["layers"][0]["fields"][1]["name"] = name
+            for namedtuple in [False, True]:
+                self.config["layers"][0]["namedtuple"] = namedtuple
+                with pytest.raises(ConfigError):
+                    Token(self.config)
+    
+    def test_compact_objects(self):
+        self.config["layers"] = [
+            {
+                "type": "int",
+                "bits": 10,
+                "positions": list(range(10)),
+            },
+        ]
+        token = Token(self.config)
+        layer = token.layers[0]
+        assert not hasattr(layer, '__dict__')
+        assert layer.positions == tuple(range(10))
+        with pytest.raises(AttributeError):
+            layer.bits = 3
+        result = token.encode(token.encode(5).private_token.freeze(), 6)
+        assert isinstance(result, TokenResult)
+        assert not hasattr(result, '__dict__')
+        private_token, public_token, layers = result
+        assert layers == [6]
+        second = token.decode(public_token.freeze())
+        assert second.private_token.to_int() == private_token.to_int()
+        assert TokenResult(layers=[1]) == (None, None, [1])
+    
+    def test_compile(self):
+        from token_cloak.codegen import cache
+        from token_cloak.revocation import RevocationIndex
+        from token_cloak.tokens import RevokedTokenResult
+        config = {
+            "private_token_bits": 20,
+            "seed_bits": 3,
+            "layers": [
+                {"type": "int", "bits": 12, "seed_bits": 0},
+                {"type": "hex", "length": 3},
+                {"type": "bool", "positions": [4]},
+            ],
+        }
+        token = Token(config).freeze()
+        compiled = token.compile()
+        assert 'def encode' in compiled.source
+        assert Token(config).compile().source is compiled.source
+        assert cache[token.fingerprint()][0] is compiled.source
+        
+        result = compiled.encode(7, 'abc', True)
+        assert result.layers == [7, 'abc', True]
+        for decode in [token.decode, compiled.decode]:
+            decoded = decode(result.public_token.to_hex(), data_type='hex')
+            assert decoded.layers == [7, 'abc', True]
+            assert decoded.private_token == result.private_token
+        assert compiled.decode('abc', data_type='hex') is None
+        
+        # Seeds work the same way.
+        generic = token.encode(result.private_token, 7, 'abc', True, seeds=[5])
+        assert compiled.encode(result.private_token, 7, 'abc', True,
+                seeds=[5]).public_token == generic.public_token
+        
+        # So do errors.
+        for args, kwargs in [
+                ((7, 'abc'), {}),
+                ((7, 'abcd', True), {}),
+                ((4096, 'abc', True), {}),
+                ((7, 'abc', 1), {}),
+                ((7, 'abc', True), {'seeds': [8]}),
+                ((7, 'abc', True), {'seeds': []}),
+                ((7, 'abc', True), {'seeds': [1, 2]})]:
+            for encode in [token.encode, compiled.encode]:
+                with pytest.raises((ConfigError, ValueError)):
+                    encode(*args, **kwargs)
+        
+        index = RevocationIndex.build([result.private_token])
+        assert compiled.decode(
+                result.public_token, revocations=index) is None
+        revoked = compiled.decode(
+                result.public_token, revocations=index, status=True)
+        assert isinstance(revoked, RevokedTokenResult)
+        with pytest.raises(ConfigError):
+            compiled.decode(result.public_token, now=0)
+        with pytest.raises(TypeError):
+            compiled.decode(result.public_token, nwo=0)
+    
+    def test_compile_checks(self):
+        from token_cloak.revocation import RevocationIndex
+        self.config["layers"] = [
+            {"type": "int", "bits": 8},
+            {"type": "timestamp", "bits": 24, "epoch": 1700000000,
+                    "expiry": True},
+        ]
+        token = Token(self.config)
+        compiled = token.compile()
+        fresh = token.encode(1, 1700000100)
+        stale = token.encode(2, 1700000050)
+        index = RevocationIndex.build([fresh.private_token])
+        for public_token in [fresh.public_token, stale.public_token]:
+            s = public_token.to_base64()
+            for kwargs in [{}, {"now": 1700000075}, {"now": 1800000000},
+                    {"revocations": index}, {"revocations": index,
+                    "now": 1700000075}]:
+                for status in [False, True]:
+                    results = [decode(s, data_type='base64', status=status,
+                            **kwargs) for decode in [token.decode,
+                            compiled.decode]]
+                    assert results[0] == results[1]
+                    assert type(results[0]) is type(results[1])
+        assert compiled.decode(fresh.public_token, now=1800000000) is None
+    
+    def test_encode_to(self):
+        self.config["seed_bits"] = 3
+        self.config["layers"] = [
+            {"type": "BitCollection", "bits": 8},
+            {"type": "int", "bits": 10, "seed_bits": 0},
+            {"type": "bytes", "length": 3, "positions": [0, 5, 9] * 8},
+            {"type": "hex", "length": 4},
+        ]
+        token = Token(self.config)
+        args = [BitCollection.from_random(123), BitCollection.from_random(8),
+                91, b'zzz', 'f00d']
+        seeds = [1, 6]
+        public_token = token.encode(*args, seeds=seeds).public_token
+        for fmt in Token.ENCODINGS:
+            encoded = token.encode_to(fmt, *args, seeds=seeds)
+            assert encoded == getattr(public_token, 'to_' + fmt)()
+            out = bytearray(token.encoded_length(fmt) + 4)
+            length = token.encode_to(fmt, *args, seeds=seeds, out=out)
+            assert len(out) == token.encoded_length(fmt) + 4
+            assert out[:length] == (
+                    encoded if fmt == 'bytes' else encoded.encode('ascii'))
+        
+        # Random private tokens and seeds still decode.
+        encoded = token.encode_to('base64', *args[1:])
+        assert token.decode(encoded, data_type='base64').layers[1:] == [
+                91, b'zzz', 'f00d']
+        with pytest.raises(ValueError):
+            token.encode_to('base64', *args, out=bytearray(3))
+        with pytest.raises(ValueError):
+            token.encode_to('base36', *args)
+    
+    def test_encode_to_allocations(self):
+        token = Token({
+            "private_token_bits": 4096,
+            "splice_backend": "insert",
+            "layers": [
+                {"type": "bytes", "length": 512,
+                        "positions": list(range(0, 8192, 2))},
+                {"type": "int", "bits": 64, "positions": list(range(64))},
+            ],
+        })
+        private_token = BitCollection.from_random(4096)
+        value = bytes(range(256)) * 2
+        out = bytearray(token.encoded_length('base64'))
+        
+        def measure(f):
+            # Blocks still held by f's result, and peak bytes during f.
+            # Warnings (like bitarray's deprecations) allocate when shown.
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                f()
+                tracemalloc.start()
+                try:
+                    before = tracemalloc.take_snapshot()
+                    base = tracemalloc.get_traced_memory()[0]
+                    result = f()
+                    peak = tracemalloc.get_traced_memory()[1] - base
+                    after = tracemalloc.take_snapshot()
+                finally:
+                    tracemalloc.stop()
+            diff = after.filter_traces(ignore).compare_to(
+                    before.filter_traces(ignore), 'traceback')
+            del result
+            return [d for d in diff if d.count_diff > 0], peak
+        
+        def blocks(diff, size=0):
+            return sum(d.count_diff for d in diff if d.size_diff >= size)
+        
+        def separate():
+            result = token.encode(private_token, value, 7)
+            return result, result.public_token.to_base64()
+        
+        # The plain path keeps the bits, their collection, and the
+        # string. encode_to keeps only the string, and with out, not
+        # even that.
+        length = token.encoded_length('base64')
+        separate, separate_peak = measure(separate)
+        fused, fused_peak = measure(lambda: token.encode_to(
+                'base64', private_token, value, 7))
+        into, into_peak = measure(lambda: token.encode_to(
+                'base64', private_token, value, 7, out=out))
+        assert blocks(fused) < blocks(separate)
+        assert blocks(fused, length) == 1 and blocks(into, length) == 0
+        assert fused_peak <= separate_peak
+        
+        # Writing into out never holds the whole encoded string.
+        assert into_peak <= fused_peak - length
+    
+    def test_timestamp_layer(self):
+        self.config["layers"] = [
+            {"type": "int", "bits": 8},
+            {"type": "timestamp", "bits": 20, "epoch": 1700000000,
+                    "granularity": 60},
+        ]
+        token = Token(self.config)
+        when = datetime.datetime(2024, 1, 2, 3, 4, 59)
+        result = token.decode(token.encode(5, when).public_token)
+        assert result.layers == [5, 1704164660]
+        result = token.decode(token.encode(5, 1700000059.5).public_token)
+        assert result.layers[1] == 1700000000
+        for value in [1699999999, 1700000000 + 60 * 2 ** 20, '2024', True]:
+            with pytest.raises(ValueError):
+                token.encode(5, value)
+        for key, value in [("epoch", 1.5), ("granularity", 0),
+                ("expiry", 1)]:
+            layer = dict(self.config["layers"][1])
+            layer[key] = value
+            with pytest.raises(ConfigError):
+                Token(dict(self.config, layers=[layer]))
+        with pytest.raises(ConfigError):
+            token.decode(token.encode(5, when).public_token, now=when)
+    
+    def test_expiry(self):
+        self.config["layers"] = [
+            {"type": "hex", "length": 6},
+            {"type": "timestamp", "bits": 24, "epoch": 1700000000,
+                    "expiry": True},
+        ]
+        token = Token(self.config)
+        assert token.expiry_index == 1
+        s = token.encode('abcdef', 1700000100).public_token.to_base64()
+        
+        result = token.decode(s, data_type='base64', now=1700000099)
+        assert result.status == 'valid'
+        assert result.layers == ['abcdef', 1700000100]
+        assert token.decode(s, data_type='base64', now=1700000100) is None
+        result = token.decode(s, data_type='base64', now=1700000100,
+                status=True)
+        assert result.status == 'expired'
+        assert result.private_token is None and result.layers is None
+        assert result.public_token.to_base64() == s
+        assert token.decode('AAAA', data_type='base64', now=0) is None
+        
+        later = datetime.datetime(2030, 1, 1)
+        for engine in ['scalar', 'auto']:
+            results = token.decode_many([s, s], data_type='base64',
+                    now=later, engine=engine)
+            assert results == [None, None]
+            results = token.decode_many([s, s], data_type='base64',
+                    now=later, status=True, engine=engine)
+            assert [result.status for result in results] == ['expired'] * 2
+            columns = token.decode_many([s], data_type='base64',
+                    columnar=True, now=later, engine=engine)
+            assert not columns.valid[0]
+            columns = token.decode_many([s], data_type='base64',
+                    columnar=True, now=0, engine=engine)
+            assert columns.values(1) == [1700000100]
+        
+        self.config["layers"].append(dict(self.config["layers"][1]))
+        with pytest.raises(ConfigError):
+            Token(self.config)
+    
+    def test_envelope_layer(self):
+        self.config["seed_bits"] = 4
+        self.config["layers"] = [
+            {"type": "int", "bits": 64, "envelope": 24, "name": "id"},
+            {"type": "bytes", "length": 16, "envelope": 45},
+        ]
+        token = Token(self.config)
+        assert token.layers[0].bits == 24
+        assert token.public_token_bit_length() == 123 + 69 + 8
+        label = b'user' + bytes(12)
+        for value in [0, 1, 2 ** 17 - 1]:
+            result = token.encode(value, label, seeds=[1, 2])
+            assert token.decode(result.public_token).layers == [value, label]
+            assert result.public_token == token.encode(
+                    result.private_token, value, label,
+                    seeds=[1, 2]).public_token
+        
+        # Envelopes are padded, even with zero values.
+        bits = token.layers[0].to_bitarray(0)
+        assert bits.length() == 24 and bits[5:].any()
+        
+        # Padding longer than one hash block keeps going.
+        wide = Token(dict(self.config, layers=[
+                {"type": "bytes", "length": 64, "envelope": 600}]))
+        bits = wide.layers[0].to_bitarray(b'x' + bytes(63))
+        assert bits.length() == 600 and bits[400:].any()
+        assert bits == wide.layers[0].to_bitarray(b'x' + bytes(63))
+        assert wide.decode(wide.encode(b'x' + bytes(63)).public_token
+                ).layers == [b'x' + bytes(63)]
+        
+        for value, label in [(2 ** 17, label), (1, b'a' * 6 + bytes(10)),
+                (-1, label), (2 ** 64, label)]:
+            with pytest.raises(ValueError):
+                token.encode(value, label)
+        
+        s = token.encode(7, label).public_token.to_base64()
+        for engine in ['scalar', 'auto']:
+            columns = token.decode_many([s], data_type='base64',
+                    columnar=True, engine=engine)
+            assert columns.values('id') == [7]
+            assert columns.values(1) == [label]
+        assert token.compile().decode(s, data_type='base64').layers == [
+                7, label]
+        
+        for layer in [{"type": "hex", "length": 4, "envelope": 8},
+                {"type": "int", "bits": 64, "envelope": 7},
+                {"type": "int", "bits": 64, "envelope": "24"}]:
+            with pytest.raises(ConfigError):
+                Token(dict(self.config, layers=[layer]))
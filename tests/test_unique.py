@@ -0,0 +1,55 @@
+import pytest
+import token_cloak
+from token_cloak import Token
+from token_cloak.unique import FixedWidthSet
+
+
+class TestUniqueMinting:
+    
+    def setup_method(self, method):
+        token_cloak.secret_key = "a secret key for the minting tests"
+    
+    def test_fixed_width_set(self):
+        keys = FixedWidthSet(3, capacity=4)
+        for i in range(500):
+            assert not keys.add(i.to_bytes(3, 'big'))
+        assert keys.add((7).to_bytes(3, 'big'))
+        assert len(keys) == 500
+        assert all(i.to_bytes(3, 'big') in keys for i in range(500))
+        assert (500).to_bytes(3, 'big') not in keys
+        with pytest.raises(ValueError):
+            keys.add(b'ab')
+    
+    def test_mint_unique(self):
+        token = Token({
+            "private_token_bits": 12,
+            "layers": [{"type": "int", "bits": 4}],
+        })
+        minter = token.mint_unique(3000, 9)
+        results = list(minter)
+        keys = set(r.private_token.to_int() for r in results)
+        assert len(keys) == 3000
+        assert all(r.layers == [9] for r in results)
+        stats = minter.stats()
+        assert stats['minted'] == 3000
+        assert stats['collisions'] > 0
+        assert stats['retries'] == stats['collisions']
+        assert stats['memory'] > 0
+        
+        # Public tokens, with values per token.
+        minter = token.mint_unique(
+                500, values=lambda i: [i % 16], unique='public')
+        results = list(minter)
+        assert len(set(r.public_token.to_int() for r in results)) == 500
+        assert [r.layers[0] for r in results[:20]] == [
+                i % 16 for i in range(20)]
+    
+    def test_mint_errors(self):
+        token = Token({"private_token_bits": 4})
+        with pytest.raises(ValueError):
+            list(token.mint_unique(17, max_retries=50))
+        with pytest.raises(ValueError):
+            token.mint_unique(1, unique='both')
+        with pytest.raises(MemoryError):
+            list(Token({"private_token_bits": 64}).mint_unique(
+                    100000, max_memory=50000))
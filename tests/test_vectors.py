@@ -0,0 +1,54 @@
+from bitarray import bitarray
+import json
+import os
+import pytest
+from token_cloak import BitCollection, Token
+
+
+with open(os.path.join(os.path.dirname(__file__), 'vectors', 'golden.json')) as f:
+    VECTORS = json.load(f)['vectors']
+
+
+def to_input(layer, value):
+    """Convert a vector's JSON input to the layer's data type."""
+    if layer['type'] == 'bytes':
+        return bytes.fromhex(value)
+    if layer['type'] == 'BitCollection':
+        return BitCollection(bitarray(value))
+    return value
+
+
+def from_output(layer, value):
+    """Convert a decoded layer value to the vector's JSON input."""
+    if layer['type'] == 'bytes':
+        return value.hex()
+    if layer['type'] == 'BitCollection':
+        return value.content.to01()
+    return value
+
+
+@pytest.mark.parametrize('vector', VECTORS)
+def test_encode(vector):
+    config = vector['config']
+    args = [to_input(layer, value)
+            for layer, value in zip(config['layers'], vector['inputs'])]
+    if config['private_token_bits']:
+        args.insert(0, BitCollection(bitarray(vector['private_token'])))
+    result = Token(config).encode(*args, seeds=vector['seeds'])
+    assert result.public_token.content.to01() == vector['public_token']
+
+
+@pytest.mark.parametrize('vector', VECTORS)
+def test_decode(vector):
+    config = vector['config']
+    token = Token(config)
+    public_token = BitCollection(bitarray(vector['public_token']))
+    for data_type in [None] + Token.ENCODINGS:
+        if data_type is None:
+            encoded = public_token
+        else:
+            encoded = getattr(public_token, 'to_' + data_type)()
+        result = token.decode(encoded, data_type=data_type)
+        assert result.private_token.content.to01() == vector['private_token']
+        assert [from_output(layer, value) for layer, value in zip(
+                config['layers'], result.layers)] == vector['inputs']
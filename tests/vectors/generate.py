@@ -0,0 +1,171 @@
+"""
+Generates the golden vectors in golden.json.
+
+Every vector is a config, a fixed private token, fixed layer inputs,
+fixed seeds, and the public token that encode made from them. The
+corpus was generated from the original release of Token Cloak, so any
+change to splicing, position generation, MT19937, or conversions that
+would stop already issued tokens from decoding fails test_vectors.py.
+
+Randomness is patched out: os.urandom hands back each seed in turn, so
+this script also runs against releases whose encode has no seeds
+argument. To regenerate from a git revision (offline):
+    
+    $ python tests/vectors/generate.py --ref 890c7a8 > tests/vectors/golden.json
+"""
+
+import argparse
+from bitarray import bitarray
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+
+
+SEED = 20160704
+"""Seeds the workload, so the corpus is the same every time."""
+
+COUNT = 60
+"""Number of vectors in the corpus."""
+
+
+def random_layer(rnd, length):
+    """Make a random layer config and input for a token so far."""
+    kind = rnd.choice(['int', 'int', 'hex', 'bytes', 'BitCollection'])
+    if kind == 'int':
+        layer = {'type': 'int', 'bits': rnd.randint(1, 40)}
+        value = rnd.getrandbits(layer['bits'])
+        bits = layer['bits']
+    elif kind == 'hex':
+        layer = {'type': 'hex', 'length': rnd.randint(1, 8)}
+        value = ''.join(rnd.choice('0123456789abcdef')
+                for i in range(layer['length']))
+        bits = layer['length'] * 4
+    elif kind == 'bytes':
+        layer = {'type': 'bytes', 'length': rnd.randint(1, 4)}
+        value = ''.join(rnd.choice('0123456789abcdef')
+                for i in range(layer['length'] * 2))
+        bits = layer['length'] * 8
+    else:
+        layer = {'type': 'BitCollection', 'bits': rnd.randint(1, 20)}
+        value = ''.join(rnd.choice('01') for i in range(layer['bits']))
+        bits = layer['bits']
+    
+    # Positions are either given, or from a global or per-layer seed.
+    choice = rnd.random()
+    if choice < 0.2:
+        layer['positions'] = [rnd.randint(0, length + i) for i in range(bits)]
+    elif choice < 0.5:
+        layer['seed_bits'] = rnd.randint(0, 10)
+    return layer, value, bits
+
+
+def random_vector(rnd):
+    """Make a random config and the inputs to encode with it."""
+    secret = ''.join(rnd.choice(string.ascii_letters + string.digits + ' -_')
+            for i in range(rnd.randint(8, 40)))
+    config = {
+        'secret_key': secret,
+        'private_token_bits': rnd.choice([0, 8, 13, 32, 64, 128]),
+        'seed_bits': rnd.choice([0, 1, 4, 8]),
+        'layers': [],
+    }
+    inputs = []
+    seeds = []
+    length = config['private_token_bits']
+    for i in range(rnd.randint(1, 4)):
+        layer, value, bits = random_layer(rnd, length)
+        config['layers'].append(layer)
+        inputs.append(value)
+        length += bits
+        if 'positions' not in layer:
+            seed_bits = layer.get('seed_bits', config['seed_bits'])
+            if seed_bits:
+                seeds.append(rnd.getrandbits(seed_bits))
+                length += seed_bits
+    private_token = ''.join(rnd.choice('01')
+            for i in range(config['private_token_bits']))
+    return {
+        'config': config,
+        'private_token': private_token,
+        'inputs': inputs,
+        'seeds': seeds,
+    }
+
+
+def to_input(BitCollection, layer, value):
+    """Convert a vector's JSON input to the layer's data type."""
+    if layer['type'] == 'bytes':
+        return bytes.fromhex(value)
+    if layer['type'] == 'BitCollection':
+        return BitCollection(bitarray(value))
+    return value
+
+
+def encode(package, vector):
+    """Encode a vector with a Token Cloak package's own code."""
+    BitCollection = package.BitCollection
+    config = vector['config']
+    
+    # Hand out the seeds in order, as from_random would read them.
+    seed_bits = [layer.get('seed_bits', config['seed_bits'])
+            for layer in config['layers'] if 'positions' not in layer]
+    queue = [(seed, bits) for seed, bits in zip(
+            vector['seeds'], [b for b in seed_bits if b])]
+    urandom = os.urandom
+    
+    def fixed_urandom(n):
+        seed, bits = queue.pop(0)
+        return (seed << (n * 8 - bits)).to_bytes(n, byteorder='big')
+    
+    args = [to_input(BitCollection, layer, value)
+            for layer, value in zip(config['layers'], vector['inputs'])]
+    if config['private_token_bits']:
+        args.insert(0, BitCollection(bitarray(vector['private_token'])))
+    os.urandom = fixed_urandom
+    try:
+        result = package.Token(config).encode(*args)
+    finally:
+        os.urandom = urandom
+    if queue:
+        raise AssertionError('not every seed was used')
+    return result.public_token.content.to01()
+
+
+def load_package(ref):
+    """Import token_cloak, from a git revision if one is given."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+    if ref:
+        directory = tempfile.mkdtemp()
+        archive = subprocess.check_output(
+                ['git', 'archive', ref, 'token_cloak'], cwd=root)
+        subprocess.run(['tar', '-x', '-C', directory], input=archive,
+                check=True)
+        root = directory
+    sys.path.insert(0, root)
+    import token_cloak
+    return token_cloak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ref', help='git revision to generate from')
+    args = parser.parse_args()
+    package = load_package(args.ref)
+    rnd = random.Random(SEED)
+    vectors = []
+    for i in range(COUNT):
+        vector = random_vector(rnd)
+        vector['public_token'] = encode(package, vector)
+        vectors.append(vector)
+    json.dump({'ref': args.ref, 'vectors': vectors}, sys.stdout, indent=1,
+            sort_keys=True)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Command line tools for Token Cloak.
+
+Every command takes a JSON file holding a Token config. If the config
+has no secret_key, the TOKEN_CLOAK_SECRET_KEY environment variable is
+used instead.
+    
+    $ python -m token_cloak serve config.json --unix /tmp/tokens.sock
+    $ python -m token_cloak loadtest config.json --rate 2000 --mode threads
+    $ python -m token_cloak explain config.json --tables tokens.table
+    $ python -m token_cloak mint config.json 1000000 --shard 3 --shards 8
+    $ python -m token_cloak merge tokens.txt tokens-*.txt.manifest.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import token_cloak
+from .loadtest import Workload, run
+from .server import FRAMINGS, TokenServer, from_json
+from .shards import DATA_TYPES, merge_shards
+from .tokens import Token
+
+
+def load_token(path, tables=None):
+    """Build a frozen Token from a JSON config file.
+    
+    Args:
+        path (str): The config file.
+        tables (Optional[str]): A position table file to load.
+    
+    """
+    with open(path) as f:
+        config = json.load(f)
+    if not config.get('secret_key', None):
+        token_cloak.secret_key = os.environ.get('TOKEN_CLOAK_SECRET_KEY', None)
+    token = Token(config)
+    if tables:
+        token.load_position_table(tables)
+    return token.freeze()
+
+
+def serve(args):
+    """Run the micro-batching server until interrupted."""
+    server = TokenServer(
+            load_token(args.config),
+            framing=args.framing,
+            max_batch=args.max_batch,
+            max_wait=args.max_wait / 1000)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if args.unix:
+        loop.run_until_complete(server.start_unix(args.unix))
+        where = args.unix
+    else:
+        loop.run_until_complete(server.start_tcp(args.host, args.port))
+        where = '%s:%d' % server.server.sockets[0].getsockname()[:2]
+    print('serving on %s' % where, file=sys.stderr)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.close())
+        loop.close()
+
+
+def loadtest(args):
+    """Replay a reproducible traffic mix and print the latency report."""
+    token = load_token(args.config)
+    mix = {}
+    for part in args.mix.split(','):
+        kind, weight = part.split('=')
+        mix[kind.strip()] = float(weight)
+    workload = Workload(token, seed=args.seed, mix=mix,
+            data_types=args.data_types.split(','))
+    report = run(token, workload.requests(args.requests), rate=args.rate,
+            mode=args.mode, workers=args.workers)
+    print('requests    %d in %.2fs' % (report['count'], report['seconds']))
+    print('throughput  %.0f/s' % report['throughput'])
+    for key in ['p50', 'p99', 'p999', 'max']:
+        print('%-11s %.1fus' % (key, report[key]))
+    for outcome, count in sorted(report['outcomes'].items()):
+        print('%-11s %d' % (outcome, count))
+
+
+def explain(args):
+    """Print what each layer of a config costs per token."""
+    token = load_token(args.config, tables=args.tables)
+    report = token.explain(measure=args.measure)
+    print('private token  %d bits' % report['private_token_bits'])
+    print('public token   %d bits' % report['public_token_bits'])
+    for data_type, length in sorted(report['encoded_lengths'].items()):
+        print('  %-12s %d' % (data_type, length))
+    print()
+    print('%-5s %-16s %-8s %5s %5s %6s %-9s %4s %10s' % (
+            'layer', 'name', 'type', 'bits', 'seed', 'into', 'positions',
+            'prng', 'table'))
+    for info in report['layers']:
+        if info['tabled']:
+            table = 'loaded'
+        elif info['table_bytes'] is not None:
+            table = '%dB' % info['table_bytes']
+        else:
+            table = '-'
+        print('%-5d %-16s %-8s %5d %5d %6d %-9s %4d %10s' % (
+                info['index'], info['name'], info['type'], info['bits'],
+                info['seed_bits'], info['spliced_into'], info['positions'],
+                info['generators'], table))
+    print()
+    print('generators     %d per encode and decode' % report['generators'])
+    print('table bytes    %d' % report['table_bytes'])
+    print('splice         %s (%s)' % (report['splice']['backend'],
+            report['splice']['reason']))
+    if args.measure:
+        print('encode         %.1fus' % report['encode_us'])
+        print('decode         %.1fus' % report['decode_us'])
+
+
+def mint(args):
+    """Mint a shard of tokens into a file with a manifest."""
+    token = load_token(args.config)
+    values = json.loads(args.values)
+    values = [from_json(layer, value)
+            for layer, value in zip(token.layers, values)]
+    out = args.out or 'tokens-%d.txt' % args.shard
+    manifest = token.mint_shard(args.count, args.shard, args.shards,
+            *values).write(out, data_type=args.data_type)
+    print('minted %d tokens into %s' % (manifest['count'], out))
+
+
+def merge(args):
+    """Merge shards' outputs into one file by their manifests."""
+    manifest = merge_shards(args.manifests, args.out)
+    print('merged %d tokens from shards %s into %s' % (
+            manifest['count'], ','.join(map(str, manifest['parts'])),
+            args.out))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m token_cloak')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    
+    p = commands.add_parser('serve', help='encode and decode over a socket')
+    p.add_argument('config', help='JSON file holding a Token config')
+    p.add_argument('--unix', help='path of a Unix domain socket to serve on')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=7878)
+    p.add_argument('--framing', choices=FRAMINGS, default='line')
+    p.add_argument('--max-batch', type=int, default=64)
+    p.add_argument('--max-wait', type=float, default=2.0,
+            help='milliseconds to wait for a batch to fill')
+    p.set_defaults(run=serve)
+    
+    p = commands.add_parser('loadtest', help='replay a mix of traffic')
+    p.add_argument('config', help='JSON file holding a Token config')
+    p.add_argument('--requests', type=int, default=10000)
+    p.add_argument('--rate', type=float, default=None,
+            help='requests per second (default: as fast as possible)')
+    p.add_argument('--mode', choices=['inline', 'threads', 'processes'],
+            default='inline')
+    p.add_argument('--workers', type=int, default=4)
+    p.add_argument('--seed', type=int, default=0,
+            help='makes the workload reproducible')
+    p.add_argument('--mix', default='valid=90,malformed=5,wrong_config=5',
+            help='weights of valid, malformed, wrong_config, and encode')
+    p.add_argument('--data-types', default='base64',
+            help='comma-separated data types to spread requests over')
+    p.set_defaults(run=loadtest)
+    
+    p = commands.add_parser('explain', help='break down what a config costs')
+    p.add_argument('config', help='JSON file holding a Token config')
+    p.add_argument('--measure', type=int, default=100,
+            help='round trips to time (0 to skip)')
+    p.add_argument('--tables', help='position table file to load first')
+    p.set_defaults(run=explain)
+    
+    p = commands.add_parser('mint', help='mint a shard of unique tokens')
+    p.add_argument('config', help='JSON file holding a Token config')
+    p.add_argument('count', type=int, help='tokens to mint in this shard')
+    p.add_argument('--shard', type=int, default=0)
+    p.add_argument('--shards', type=int, default=1)
+    p.add_argument('--values', default='[]',
+            help='JSON list of layer values for every token')
+    p.add_argument('--data-type', choices=DATA_TYPES, default='base64')
+    p.add_argument('--out', help='file to write (default: tokens-SHARD.txt)')
+    p.set_defaults(run=mint)
+    
+    p = commands.add_parser('merge', help='join shards by their manifests')
+    p.add_argument('out', help='file to write the merged tokens to')
+    p.add_argument('manifests', nargs='+', help='manifest of every shard')
+    p.set_defaults(run=merge)
+    
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,320 @@
+from bitarray import bitarray
+import os
+
+
+ENGINES = ['auto', 'scalar', 'numpy']
+"""Engines a batch can run on."""
+
+
+MAX_SEED_BITS = 64
+"""Widest seed the NumPy engine can hold (its seeds are uint64)."""
+
+
+def load_engine(engine, token=None):
+    """Decide which engine runs a batch.
+    
+    Tokens with a seed over MAX_SEED_BITS always run on the scalar
+    engine, whichever engine was asked for.
+    
+    Args:
+        engine (str): 'scalar', 'numpy', or 'auto' for NumPy whenever
+            it's installed.
+        token (Optional[Token]): The Token the batch is for.
+    
+    Returns:
+        module: numpy, or None for the scalar engine.
+    
+    Raises:
+        ImportError: 'numpy' was asked for, but isn't installed.
+        ValueError: unknown engine.
+    
+    """
+    if engine not in ENGINES:
+        raise ValueError('engine must be one of %s' % ', '.join(ENGINES))
+    if engine == 'scalar':
+        return None
+    if token is not None and wide_seeds(token):
+        return None
+    try:
+        import numpy
+    except ImportError:
+        if engine == 'numpy':
+            raise
+        return None
+    return numpy
+
+
+def wide_seeds(token):
+    """Check whether any of a Token's layers has a seed over 64 bits."""
+    for layer in token.layers:
+        if layer.positions:
+            continue
+        seed_bits = layer.seed_bits
+        if seed_bits is None:
+            seed_bits = token.seed_bits
+        if seed_bits > MAX_SEED_BITS:
+            return True
+    return False
+
+
+def unpack(numpy, contents, bits):
+    """Stack bitarrays of the same length into an N x bits matrix."""
+    width = (bits + 7) // 8
+    packed = numpy.frombuffer(
+            b''.join(content.tobytes() for content in contents),
+            dtype=numpy.uint8).reshape(len(contents), width)
+    return numpy.unpackbits(packed, axis=1)[:, :bits]
+
+
+def pack(numpy, matrix):
+    """Split an N x bits matrix back into a bitarray per row."""
+    bits = matrix.shape[1]
+    packed = numpy.packbits(matrix, axis=1)
+    rows = []
+    for row in packed:
+        content = bitarray()
+        content.frombytes(row.tobytes())
+        del content[bits:]
+        rows.append(content)
+    return rows
+
+
+def seed_matrix(numpy, seeds, bits):
+    """Spread seed values into bits, lowest bit first, like insert_int."""
+    shifts = numpy.arange(bits, dtype=numpy.uint64)
+    values = numpy.asarray(seeds, dtype=numpy.uint64)
+    return ((values[:, None] >> shifts) & 1).astype(numpy.uint8)
+
+
+def seed_sources(token):
+    """Get the secret seed for every layer without positions, in order."""
+    need_seeds = token.needed_seeds()
+    if not need_seeds:
+        return []
+    return list(token.secret_key_collection.chunk(need_seeds))
+
+
+def encode_batch(numpy, token, private_tokens, values, seeds=None):
+    """Splice many tokens at once on an N x bits matrix.
+    
+    Every bit that ends up in the public tokens starts out in a source
+    matrix: the private tokens, then each layer's values and seeds.
+    Rows with the same seeds share the same final index map, which is
+    worked out once per group by splicing indexes instead of bits, and
+    applied to the whole group as a single gather.
+    
+    Args:
+        numpy (module): NumPy.
+        token (Token): The config to encode with.
+        private_tokens (list): A BitCollection per token.
+        values (list): A tuple of layer values per token.
+        seeds (Optional[list]): A list of seeds per token, as with
+            Token.encode.
+    
+    Returns:
+        list: a bitarray per public token.
+    
+    Raises:
+        ValueError: seeds don't match the seeded layers.
+    
+    """
+    count = len(private_tokens)
+    blocks = [unpack(numpy, [stored.content for stored in private_tokens],
+            token.private_token_bits)]
+    offset = token.private_token_bits
+    sources = seed_sources(token)[::-1]
+    
+    # Lay out every layer's bits (and seed bits) in the source matrix.
+    plan = []
+    keys = []
+    for index, layer in enumerate(token.layers):
+        blocks.append(unpack(numpy, [layer.to_bitarray(args[index])
+                for args in values], layer.bits))
+        step = {'index': index, 'offset': offset, 'seed_offset': None,
+                'positions': layer.positions, 'seed': None}
+        offset += layer.bits
+        if not layer.positions:
+            source = sources.pop()
+            seed_bits = layer.seed_bits
+            if seed_bits is None:
+                seed_bits = token.seed_bits
+            if not seed_bits:
+                step['seed'] = source
+            else:
+                layer_seeds = next_seeds(seeds, count, len(keys), seed_bits)
+                step['key'] = len(keys)
+                step['seed_bits'] = seed_bits
+                keys.append(layer_seeds)
+                
+                # Seeds are only spliced in after a non-zero secret seed.
+                if source:
+                    step['source'] = source
+                    step['seed_offset'] = offset
+                    blocks.append(seed_matrix(numpy, layer_seeds, seed_bits))
+                    offset += seed_bits
+        plan.append(step)
+    if seeds is not None:
+        for row in seeds:
+            if len(row) > len(keys):
+                raise ValueError('more seeds than seeded layers')
+    
+    source = numpy.concatenate(blocks, axis=1)
+    public = numpy.empty((count, token.public_token_bit_length()),
+            dtype=numpy.uint8)
+    for key, rows in group_rows(numpy, keys, count):
+        index_map = list(range(token.private_token_bits))
+        for step in plan:
+            positions = step['positions']
+            if not positions:
+                if step['seed'] is not None:
+                    seed = step['seed']
+                else:
+                    seed = key[step['key']]
+                positions = token.seeded_positions(
+                        step['index'], seed=seed,
+                        max_position=len(index_map),
+                        bits=token.layers[step['index']].bits)
+            for j, position in enumerate(positions):
+                index_map.insert(position, step['offset'] + j)
+            if step['seed_offset'] is not None:
+                seed_positions = token.generate_bit_positions(
+                        seed=step['source'], max_position=len(index_map),
+                        bits=step['seed_bits'])
+                for j, position in enumerate(seed_positions):
+                    index_map.insert(position, step['seed_offset'] + j)
+        public[rows] = source[rows[:, None], index_map]
+    return pack(numpy, public)
+
+
+def next_seeds(seeds, count, k, seed_bits):
+    """Get the kth seeded layer's seed for every token.
+    
+    Raises:
+        ValueError: a token's seeds are missing or too big.
+    
+    """
+    if seeds is None:
+        width = (seed_bits + 7) // 8
+        b = os.urandom(width * count)
+        mask = (1 << seed_bits) - 1
+        return [int.from_bytes(b[i * width:(i + 1) * width], 'big') & mask
+                for i in range(count)]
+    layer_seeds = []
+    for row in seeds:
+        if len(row) <= k:
+            raise ValueError('not enough seeds for the layers')
+        if not 0 <= row[k] < 2 ** seed_bits:
+            raise ValueError('seed must fit in %d bits' % seed_bits)
+        layer_seeds.append(row[k])
+    return layer_seeds
+
+
+def group_rows(numpy, keys, count):
+    """Group rows by their seeds.
+    
+    Yields:
+        tuple: the seeds (one per seeded layer) and the array of rows
+            that have them.
+    
+    """
+    if not keys:
+        yield (), numpy.arange(count)
+        return
+    matrix = numpy.array(keys, dtype=numpy.uint64).T
+    unique, inverse = numpy.unique(matrix, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    for i, key in enumerate(unique):
+        yield tuple(int(seed) for seed in key), numpy.nonzero(inverse == i)[0]
+
+
+def peel_batch(numpy, token, public_tokens):
+    """Peel many public tokens at once on an N x bits matrix.
+    
+    Layers are peeled last first, as in Token.peel_layers, but on
+    index maps instead of bits. Whenever a seed is read, rows are split
+    into a group per seed value, so each group's layers are gathered
+    out of the matrix in one go.
+    
+    Args:
+        numpy (module): NumPy.
+        token (Token): The config the tokens were made with.
+        public_tokens (list): BitCollections of the right length.
+    
+    Returns:
+        tuple: an N x bits matrix of private tokens, and one per layer.
+    
+    """
+    count = len(public_tokens)
+    length = token.public_token_bit_length()
+    matrix = unpack(numpy, [public.content for public in public_tokens],
+            length)
+    sources = seed_sources(token)
+    private = numpy.empty((count, token.private_token_bits),
+            dtype=numpy.uint8)
+    layers = [numpy.empty((count, layer.bits), dtype=numpy.uint8)
+            for layer in token.layers]
+    
+    # Each entry is a group of rows that share every seed read so far.
+    groups = [(numpy.arange(count), list(range(length)),
+            len(token.layers) - 1, len(sources))]
+    while groups:
+        rows, index_map, index, source_count = groups.pop()
+        if index < 0:
+            private[rows] = matrix[rows[:, None], index_map]
+            continue
+        layer = token.layers[index]
+        if layer.positions:
+            groups.append(take_layer(
+                    matrix, layers, rows, index_map, index,
+                    layer.positions, source_count))
+            continue
+        
+        # Layers without positions get their seed from the secret.
+        source_count -= 1
+        seed = sources[source_count]
+        seed_bits = layer.seed_bits
+        if seed_bits is None:
+            seed_bits = token.seed_bits
+        if not seed_bits:
+            positions = token.seeded_positions(
+                    index, seed=seed,
+                    max_position=len(index_map) - layer.bits,
+                    bits=layer.bits)
+            groups.append(take_layer(
+                    matrix, layers, rows, index_map, index, positions,
+                    source_count))
+            continue
+        
+        # Read every row's seed, then split the rows by it.
+        seed_positions = token.generate_bit_positions(
+                seed=seed, max_position=len(index_map) - seed_bits,
+                bits=seed_bits)
+        index_map = list(index_map)
+        taken = [index_map.pop(position)
+                for position in seed_positions[::-1]][::-1]
+        bits = matrix[rows[:, None], taken].astype(numpy.uint64)
+        values = (bits << numpy.arange(seed_bits, dtype=numpy.uint64)).sum(
+                axis=1)
+        for value in numpy.unique(values):
+            positions = token.seeded_positions(
+                    index, seed=int(value),
+                    max_position=len(index_map) - layer.bits,
+                    bits=layer.bits)
+            groups.append(take_layer(
+                    matrix, layers, rows[values == value], index_map,
+                    index, positions, source_count))
+    return private, layers
+
+
+def take_layer(matrix, layers, rows, index_map, index, positions,
+        source_count):
+    """Gather a layer's bits for a group and peel them off its map.
+    
+    Returns:
+        tuple: the group, ready to peel the layer before.
+    
+    """
+    index_map = list(index_map)
+    taken = [index_map.pop(position) for position in positions[::-1]][::-1]
+    layers[index][rows] = matrix[rows[:, None], taken]
+    return rows, index_map, index - 1, source_count
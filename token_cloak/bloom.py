@@ -0,0 +1,102 @@
+from bitarray import bitarray
+import hashlib
+import math
+
+
+class BloomFilter:
+    """A fixed-size set of byte strings that can give false positives.
+    
+    Keys are never stored, only a few bits each, so a filter sized for
+    a million keys at a 1% error rate takes about 1.2 MB. Membership
+    tests never give false negatives; they give false positives at
+    roughly the error rate the filter was sized for.
+    
+    Here is a sample usage:
+        >>> bloom = BloomFilter(1000000, error_rate=0.01)
+        >>> bloom.add(b'key')
+        >>> b'key' in bloom
+        True
+    
+    """
+    
+    def __init__(self, capacity, error_rate=0.01, size=None, hashes=None):
+        """Size an empty filter.
+        
+        Args:
+            capacity (int): Number of keys the filter should hold.
+            error_rate (Optional[float]): False positive rate at capacity.
+            size (Optional[int]): Number of bits, to skip sizing.
+            hashes (Optional[int]): Number of hashes, to skip sizing.
+        
+        """
+        if not isinstance(capacity, int) or capacity < 1:
+            raise ValueError('capacity must be a positive int')
+        if not 0 < error_rate < 1:
+            raise ValueError('error rate must be between 0 and 1')
+        if size is None:
+            size = int(math.ceil(
+                    -capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        if hashes is None:
+            hashes = max(1, int(round(size / capacity * math.log(2))))
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = size
+        self.hashes = hashes
+        self.count = 0
+        self.bits = bitarray(size)
+        self.bits.setall(False)
+    
+    
+    def __len__(self):
+        """Number of keys added (including duplicates)."""
+        return self.count
+    
+    
+    def __contains__(self, key):
+        """Test whether a key might have been added."""
+        bits = self.bits
+        for position in self.positions(key):
+            if not bits[position]:
+                return False
+        return True
+    
+    
+    def add(self, key):
+        """Add a key to the filter.
+        
+        Returns:
+            bool: whether the key might already have been added.
+        
+        """
+        bits = self.bits
+        seen = True
+        for position in self.positions(key):
+            if not bits[position]:
+                bits[position] = True
+                seen = False
+        self.count += 1
+        return seen
+    
+    
+    def positions(self, key):
+        """Get the bit positions for a key, by double hashing."""
+        d = hashlib.sha256(key).digest()
+        a = int.from_bytes(d[:8], byteorder='big')
+        b = int.from_bytes(d[8:16], byteorder='big') | 1
+        size = self.size
+        return [(a + i * b) % size for i in range(self.hashes)]
+    
+    
+    def to_bytes(self):
+        """Get the filter's bits, padded to a whole byte."""
+        return self.bits.tobytes()
+    
+    
+    @classmethod
+    def from_bytes(cls, b, capacity, error_rate, size, hashes):
+        """Rebuild a filter from to_bytes and its parameters."""
+        bloom = cls(capacity, error_rate=error_rate, size=size, hashes=hashes)
+        bits = bitarray()
+        bits.frombytes(bytes(b))
+        bloom.bits = bits[:size]
+        return bloom
@@ -0,0 +1,427 @@
+from bitarray import bitarray
+import datetime
+import os
+import threading
+
+from .collections import BitCollection
+from .exceptions import ConfigError
+from .utils import (bitarray_to_hex, bytes_to_bitarray, hex_to_bitarray,
+        to_unix_time)
+
+
+UNROLL_BITS = 64
+"""Widest layer whose bits get a line of source apiece."""
+
+MAX_CACHED = 256
+"""Most configs to keep compiled code for."""
+
+cache = {}
+"""Compiled code by config fingerprint, oldest first."""
+
+cache_lock = threading.Lock()
+"""Guards cache, since shared Tokens compile from many threads."""
+
+
+class CompiledToken:
+    """Encode and decode functions specialized to a single config.
+    
+    Token.encode and Token.decode walk the layer list on every call,
+    asking each layer its type, whether it has positions, and how many
+    seed bits it takes. Compiling a Token answers all of that once and
+    writes it out as Python source: every layer's handling is unrolled,
+    positions that don't depend on a token's own seed are worked out
+    ahead of time and written in as constants, and type checks and
+    conversions are written in place. The source is compiled and kept
+    by the config's fingerprint, so every Token with the same config
+    shares it.
+    
+    Here is a sample usage:
+        >>> compiled = token.compile()
+        >>> result = compiled.encode(5, 'a1f')
+        >>> compiled.decode(result.public_token).layers
+        [5, 'a1f']
+    
+    """
+    
+    def __init__(self, token, source, code):
+        """Bind compiled code to a Token.
+        
+        Args:
+            token (Token): The config the code was generated for.
+            source (str): The generated source.
+            code (code): The source, compiled.
+        
+        """
+        from .tokens import (
+                ExpiredTokenResult, RevokedTokenResult, TokenResult)
+        namespace = {
+            'bitarray': bitarray,
+            'BitCollection': BitCollection,
+            'ConfigError': ConfigError,
+            'TokenResult': TokenResult,
+            'RevokedTokenResult': RevokedTokenResult,
+            'ExpiredTokenResult': ExpiredTokenResult,
+            'datetime': datetime.datetime,
+            'urandom': os.urandom,
+            'to_unix_time': to_unix_time,
+            'bytes_to_bitarray': bytes_to_bitarray,
+            'hex_to_bitarray': hex_to_bitarray,
+            'bitarray_to_hex': bitarray_to_hex,
+            'split_args': token.split_args,
+            'parse_token': token.parse_token,
+            'read_layer': token.read_layer,
+            'expired': token.expired,
+            'seeded_positions': token.seeded_positions,
+            'layers': tuple(token.layers),
+        }
+        exec(code, namespace)
+        self.token = token
+        self.source = source
+        self.encode = namespace['encode']
+        self.decode = namespace['decode']
+
+
+def compile_token(token):
+    """Get a Token's compiled encode and decode, compiling if need be.
+    
+    Args:
+        token (Token): The config to compile.
+    
+    Returns:
+        CompiledToken: bound to the token.
+    
+    """
+    fingerprint = token.fingerprint()
+    with cache_lock:
+        cached = cache.pop(fingerprint, None)
+        if cached is not None:
+            cache[fingerprint] = cached
+    
+    # Compile outside the lock so other configs aren't held up.
+    if cached is None:
+        source = generate_source(token)
+        code = compile(source, '<token %s>' % fingerprint[:12], 'exec')
+        with cache_lock:
+            
+            # Another thread may have got here first; keep its code.
+            cached = cache.pop(fingerprint, None) or (source, code)
+            while len(cache) >= MAX_CACHED:
+                del cache[next(iter(cache))]
+            cache[fingerprint] = cached
+    return CompiledToken(token, *cached)
+
+
+def layer_plan(token):
+    """Work out everything about splicing that doesn't depend on a token.
+    
+    Returns:
+        list: a dict per layer, with its index, seed source, seed_bits,
+            positions (None when they depend on the token's seed),
+            seed_positions, and the token's length before the layer.
+    
+    """
+    sources = []
+    if token.needed_seeds():
+        sources = list(token.secret_key_collection.chunk(
+                token.needed_seeds()))[::-1]
+    plan = []
+    length = token.private_token_bits or 0
+    for index, layer in enumerate(token.layers):
+        step = {'index': index, 'layer': layer, 'length': length,
+                'source': None, 'seed_bits': 0, 'positions': layer.positions,
+                'seed_positions': None}
+        length += layer.bits
+        if not layer.positions:
+            source = sources.pop()
+            seed_bits = layer.seed_bits
+            if seed_bits is None:
+                seed_bits = token.seed_bits
+            step['source'] = source
+            step['seed_bits'] = seed_bits
+            if not seed_bits:
+                step['positions'] = token.seeded_positions(
+                        index, seed=source, max_position=step['length'],
+                        bits=layer.bits)
+            else:
+                # Seed positions come from the secret, so they're fixed,
+                # but encode only splices them in after a non-zero one.
+                step['seed_positions'] = token.generate_bit_positions(
+                        seed=source, max_position=length, bits=seed_bits)
+                if source:
+                    length += seed_bits
+        plan.append(step)
+    return plan
+
+
+def generate_source(token):
+    """Write the Python source of a Token's encode and decode.
+    
+    Returns:
+        str: source defining encode(*args, seeds=None) and
+            decode(token, data_type=None, revocations=None, now=None,
+            status=False, url_safe=None).
+    
+    """
+    plan = layer_plan(token)
+    lines = []
+    emit = lines.append
+    
+    emit('def encode(*args, seeds=None):')
+    emit('    stored_token, args = split_args(args)')
+    emit('    content = bitarray(stored_token.content)')
+    emit('    insert = content.insert')
+    emit('    if seeds is not None:')
+    emit('        seeds = list(seeds)[::-1]')
+    for step in plan:
+        encode_layer(emit, step)
+    emit('    if seeds:')
+    emit('        raise ValueError(\'more seeds than seeded layers\')')
+    if plan:
+        emit('    return TokenResult(public_token=BitCollection(content),')
+        emit('            private_token=stored_token, layers=list(args))')
+    else:
+        emit('    return TokenResult(public_token=BitCollection(content),')
+        emit('            private_token=stored_token)')
+    emit('')
+    emit('')
+    
+    emit('def decode(token, data_type=None, revocations=None, now=None,')
+    emit('        status=False, url_safe=None):')
+    if token.expiry_index is None:
+        emit('    if now is not None:')
+        emit('        raise ConfigError(\'no layer is the expiry\')')
+    emit('    public_token = parse_token(token, data_type=data_type, '
+            'url_safe=url_safe)')
+    emit('    if public_token is None:')
+    emit('        return None')
+    if token.expiry_index is not None:
+        # The expiry is read on its own first, as in Token.decode.
+        emit('    if now is not None and expired(')
+        emit('            read_layer(public_token, %d), now):'
+                % token.expiry_index)
+        emit('        if not status:')
+        emit('            return None')
+        emit('        return ExpiredTokenResult(public_token=public_token)')
+    emit('    content = bitarray(public_token.content)')
+    emit('    pop = content.pop')
+    for step in plan[::-1]:
+        decode_layer(emit, step)
+    emit('    private_token = BitCollection(content)')
+    emit('    if revocations is not None and private_token in revocations:')
+    emit('        if not status:')
+    emit('            return None')
+    emit('        return RevokedTokenResult(public_token=public_token,')
+    emit('                private_token=private_token)')
+    if plan:
+        emit('    return TokenResult(public_token=public_token,')
+        values = ', '.join('v%d' % step['index'] for step in plan)
+        emit('            private_token=private_token, layers=[%s])' % values)
+    else:
+        emit('    return TokenResult(public_token=public_token,')
+        emit('            private_token=private_token)')
+    return '\n'.join(lines) + '\n'
+
+
+def encode_layer(emit, step):
+    """Write the source that splices one layer (and its seed) in."""
+    index = step['index']
+    layer = step['layer']
+    bits = layer.bits
+    emit('    ')
+    emit('    # Layer %d: %s (%d bits).' % (index, layer.type, bits))
+    
+    # The token's own seed comes first, as in Token.splice_layers.
+    seed_bits = step['seed_bits']
+    if seed_bits:
+        width = (seed_bits + 7) // 8
+        emit('    if seeds is None:')
+        emit('        seed = int.from_bytes(urandom(%d), \'big\') >> %d' % (
+                width, width * 8 - seed_bits))
+        emit('    elif not seeds:')
+        emit('        raise ValueError(\'not enough seeds for the layers\')')
+        emit('    else:')
+        emit('        seed = seeds.pop()')
+        emit('        if not 0 <= seed < %d:' % 2 ** seed_bits)
+        emit('            raise ValueError(\'seed must fit in %d bits\')'
+                % seed_bits)
+        emit('    positions = seeded_positions(%d, seed=seed, '
+                'max_position=%d, bits=%d)' % (index, step['length'], bits))
+    
+    emit('    v = args[%d]' % index)
+    value = layer_to_bits(emit, layer, index)
+    positions = step['positions']
+    if value == 'int':
+        # Bits of an int go in most significant first.
+        if positions is None or bits > UNROLL_BITS:
+            emit('    for j, position in enumerate(%s):' % (
+                    'positions' if positions is None else repr(positions)))
+            emit('        insert(position, v >> %d - j & 1)' % (bits - 1))
+        else:
+            for j, position in enumerate(positions):
+                emit('    insert(%d, v >> %d & 1)' % (position, bits - 1 - j))
+    elif value == 'bool':
+        if positions is None:
+            emit('    insert(positions[0], v)')
+        else:
+            emit('    insert(%d, v)' % positions[0])
+    else:
+        if positions is None or bits > UNROLL_BITS:
+            emit('    for j, position in enumerate(%s):' % (
+                    'positions' if positions is None else repr(positions)))
+            emit('        insert(position, bits[j])')
+        else:
+            for j, position in enumerate(positions):
+                emit('    insert(%d, bits[%d])' % (position, j))
+    
+    if seed_bits and step['source']:
+        for j, position in enumerate(step['seed_positions']):
+            if j:
+                emit('    insert(%d, seed >> %d & 1)' % (position, j))
+            else:
+                emit('    insert(%d, seed & 1)' % position)
+
+
+def layer_to_bits(emit, layer, index):
+    """Write the source that checks and converts a layer's value.
+    
+    Returns:
+        str: 'int' if v is left as an int whose bits go in, 'bool' if
+            it's a single bit, or 'bits' if it's converted to a bitarray
+            called bits.
+    
+    """
+    bits = layer.bits
+    if layer.envelope is not None:
+        # Envelopes are left to the layer.
+        emit('    bits = layers[%d].to_bitarray(v)' % index)
+        return 'bits'
+    if layer.type == 'int':
+        emit('    if not isinstance(v, int):')
+        emit('        raise ValueError(\'layer value must be an int\')')
+        emit('    if v.bit_length() > %d:' % bits)
+        emit('        raise ValueError(\'layer value is too many bits\')')
+        return 'int'
+    if layer.type == 'bool':
+        emit('    if not isinstance(v, bool):')
+        emit('        raise ValueError(\'layer value must be a bool\')')
+        return 'bool'
+    if layer.type == 'timestamp':
+        emit('    if isinstance(v, bool) or not isinstance(')
+        emit('            v, (int, float, datetime)):')
+        emit('        raise ValueError(\'layer value must be a Unix time or \'')
+        emit('                \'datetime\')')
+        emit('    v = int((to_unix_time(v) - %d) // %d)' % (
+                layer.epoch, layer.granularity))
+        emit('    if not 0 <= v < %d:' % 2 ** bits)
+        emit('        raise ValueError(\'layer value is out of range\')')
+        return 'int'
+    if layer.type == 'BitCollection':
+        emit('    if not isinstance(v, BitCollection):')
+        emit('        raise ValueError(\'layer value must be a \'')
+        emit('                \'BitCollection\')')
+        emit('    if v.length() != %d:' % bits)
+        emit('        raise ValueError(\'layer value has incorrect number of '
+                'bits\')')
+        emit('    bits = v.content')
+        return 'bits'
+    if layer.type in ['bytes', 'hex']:
+        kind = 'bytes' if layer.type == 'bytes' else 'str'
+        emit('    if not isinstance(v, %s):' % kind)
+        emit('        raise ValueError(\'layer value must be %s\')' % kind)
+        emit('    if len(v) != %d:' % layer.length)
+        emit('        raise ValueError(\'layer value is incorrect length\')')
+        emit('    bits = %s_to_bitarray(v)' % layer.type)
+        return 'bits'
+    
+    # Structs are left to the layer.
+    emit('    bits = layers[%d].to_bitarray(v)' % index)
+    return 'bits'
+
+
+def decode_layer(emit, step):
+    """Write the source that peels one layer (and its seed) out."""
+    index = step['index']
+    layer = step['layer']
+    bits = layer.bits
+    emit('    ')
+    emit('    # Layer %d: %s (%d bits).' % (index, layer.type, bits))
+    
+    # The seed went in last, so it comes out first.
+    seed_bits = step['seed_bits']
+    positions = step['positions']
+    if seed_bits:
+        seed = pop_int(step['seed_positions'], lowest_first=True)
+        emit('    seed = %s' % seed)
+        emit('    positions = seeded_positions(%d, seed=seed, '
+                'max_position=%d, bits=%d)' % (index, step['length'], bits))
+    
+    name = 'v%d' % index
+    as_int = layer.type in ['int', 'timestamp'] and layer.envelope is None
+    if positions is not None and bits <= UNROLL_BITS and as_int:
+        value = pop_int(positions)
+    elif positions is not None and layer.type == 'bool':
+        value = 'bool(pop(%d))' % positions[0]
+    elif positions is not None and bits <= UNROLL_BITS:
+        pops = ['pop(%d)' % position for position in positions[::-1]]
+        emit('    bits = bitarray([')
+        for i in range(0, len(pops), 8):
+            emit('        %s,' % ', '.join(pops[i:i + 8]))
+        emit('    ])')
+        emit('    bits.reverse()')
+        value = None
+    else:
+        emit('    bits = bitarray()')
+        emit('    for position in %s[::-1]:' % (
+                'positions' if positions is None else repr(positions)))
+        emit('        bits.append(pop(position))')
+        emit('    bits.reverse()')
+        value = None
+    
+    if value is not None and layer.type == 'timestamp':
+        emit('    %s = %d + (%s) * %d' % (
+                name, layer.epoch, value, layer.granularity))
+    elif value is not None:
+        emit('    %s = %s' % (name, value))
+    elif layer.envelope is not None:
+        emit('    %s = layers[%d].from_bitcollection(BitCollection(bits))'
+                % (name, index))
+    elif layer.type == 'int':
+        emit('    %s = int(bits.to01(), 2)' % name)
+    elif layer.type == 'timestamp':
+        emit('    %s = %d + int(bits.to01(), 2) * %d' % (
+                name, layer.epoch, layer.granularity))
+    elif layer.type == 'bool':
+        emit('    %s = bool(bits[0])' % name)
+    elif layer.type == 'bytes':
+        emit('    %s = bits.tobytes()' % name)
+    elif layer.type == 'hex':
+        emit('    %s = bitarray_to_hex(bits)' % name)
+    elif layer.type == 'BitCollection':
+        emit('    %s = BitCollection(bits)' % name)
+    else:
+        emit('    %s = layers[%d].from_bitcollection(BitCollection(bits))'
+                % (name, index))
+
+
+def pop_int(positions, lowest_first=False):
+    """Write an expression that pops bits out into an int.
+    
+    Bits are popped in the opposite order they were inserted in.
+    
+    Args:
+        positions (list): Where the bits were inserted, in order.
+        lowest_first (Optional[bool]): Whether the first bit inserted
+            is the lowest, as with seeds, instead of the highest.
+    
+    """
+    count = len(positions)
+    terms = []
+    for j in range(count - 1, -1, -1):
+        shift = j if lowest_first else count - 1 - j
+        if shift:
+            terms.append('pop(%d) << %d' % (positions[j], shift))
+        else:
+            terms.append('pop(%d)' % positions[j])
+    if count == 1:
+        return 'int(%s)' % terms[0]
+    return ' | '.join(terms)
@@ -6,9 +6,12 @@ import os
 
 from .exceptions import ConfigError
 from .utils import (
-        base64_to_bitarray, bitarray_to_base64, bitarray_to_bytes,
-        bitarray_to_hex, bitarray_to_int, bitarray_to_str, bytes_to_bitarray,
-        hex_to_bitarray, int_to_bitarray, str_to_bitarray)
+        base32_to_bitarray, base58_to_bitarray, base64_to_bitarray,
+        base64_to_bitarrays, base85_to_bitarray, bitarray_to_base32,
+        bitarray_to_base58, bitarray_to_base64, bitarray_to_base85,
+        bitarray_to_bytes, bitarray_to_hex, bitarray_to_int, bitarray_to_str,
+        bitarrays_to_base64, bitarrays_to_hex, bytes_to_bitarray,
+        hex_to_bitarray, hex_to_bitarrays, int_to_bitarray, str_to_bitarray)
 
 
 class BitCollection:
@@ -18,8 +21,17 @@ class BitCollection:
     a few interfaces for data. This abstraction focuses on a variety of
     input and output formats, as well as the ability to sew in bits from
     each of these formats.
+    
+    Collections compare by their bits: equal when they hold the same
+    bits, and ordered bit by bit, with a prefix before anything longer.
+    Only frozen collections can be hashed.
+    
+    Slicing, +, &, |, ^, and ~ work on whole collections at once, in
+    bitarray's C routines, and return new collections of the same class.
     """
     
+    __slots__ = ('content',)
+    
     def __init__(self, b=None):
         """Make a new collection out of a bytearray.
         
@@ -36,6 +48,118 @@ class BitCollection:
             self.content = bitarray()
     
     
+    def __eq__(self, other):
+        """Test whether both collections hold the same bits."""
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return self.content == other.content
+    
+    
+    def __lt__(self, other):
+        """Order collections bit by bit."""
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return self.content < other.content
+    
+    
+    def __le__(self, other):
+        """Order collections bit by bit."""
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return self.content <= other.content
+    
+    
+    def __gt__(self, other):
+        """Order collections bit by bit."""
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return self.content > other.content
+    
+    
+    def __ge__(self, other):
+        """Order collections bit by bit."""
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return self.content >= other.content
+    
+    # Mutable collections can change after they're put in a dict or set.
+    __hash__ = None
+    
+    
+    def __getitem__(self, key):
+        """Get a bit, or a slice of the bits as a new collection."""
+        if isinstance(key, slice):
+            return self.__class__(self.content[key])
+        return self.content[key]
+    
+    
+    def __add__(self, other):
+        """Join two collections end to end."""
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return self.__class__(self.content + other.content)
+    
+    
+    def __and__(self, other):
+        """AND two collections of the same length."""
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return self.__class__(self.content & other.content)
+    
+    
+    def __or__(self, other):
+        """OR two collections of the same length."""
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return self.__class__(self.content | other.content)
+    
+    
+    def __xor__(self, other):
+        """XOR two collections of the same length."""
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return self.__class__(self.content ^ other.content)
+    
+    
+    def __invert__(self):
+        """Flip every bit."""
+        return self.__class__(~self.content)
+    
+    
+    @classmethod
+    def from_base32(cls, s):
+        """Creates a new collection from a Crockford base32 string.
+        
+        Args:
+            s (str): A base32 string to ingest to the collection.
+        
+        Return:
+            BitCollection: new instance.
+        
+        Raises:
+            ValueError: s isn't a valid base32 string.
+        
+        """
+        return cls(base32_to_bitarray(s))
+    
+    
+    @classmethod
+    def from_base58(cls, s):
+        """Creates a new collection from a base58 string.
+        
+        Args:
+            s (str): A base58 string to ingest to the collection.
+        
+        Return:
+            BitCollection: new instance.
+        
+        Raises:
+            ValueError: s isn't a valid base58 string.
+        
+        """
+        return cls(base58_to_bitarray(s))
+    
+    
     @classmethod
     def from_base64(cls, s, url_safe=False):
         """Creates a new collection from a base64 string.
@@ -52,6 +176,43 @@ class BitCollection:
         return cls(base64_to_bitarray(s, url_safe=url_safe))
     
     
+    @classmethod
+    def from_base64_many(cls, strings, url_safe=False):
+        """Creates a collection from each of many base64 strings.
+        
+        Strings of the same length and padding are decoded together in
+        a single call.
+        
+        Args:
+            strings (list): Base64 strings to ingest.
+            url_safe (Optional[bool]): If true, substitute '-_' with
+                '+/'.
+        
+        Return:
+            list: a new instance per string.
+        
+        """
+        bs = base64_to_bitarrays(strings, url_safe=url_safe)
+        return [cls(b) for b in bs]
+    
+    
+    @classmethod
+    def from_base85(cls, s):
+        """Creates a new collection from a base85 string.
+        
+        Args:
+            s (str): A base85 string to ingest to the collection.
+        
+        Return:
+            BitCollection: new instance.
+        
+        Raises:
+            ValueError: s isn't a valid base85 string.
+        
+        """
+        return cls(base85_to_bitarray(s))
+    
+    
     @classmethod
     def from_bytes(cls, b):
         """Creates a new collection from a hexidecimal string.
@@ -84,6 +245,26 @@ class BitCollection:
         return cls(hex_to_bitarray(s))
     
     
+    @classmethod
+    def from_hex_many(cls, strings):
+        """Creates a collection from each of many hexidecimal strings.
+        
+        Strings of the same even length are decoded together in a
+        single call.
+        
+        Args:
+            strings (list): Hexidecimal strings to ingest.
+        
+        Returns:
+            list: a new instance per string.
+        
+        Raises:
+            ValueError: a string isn't a valid hexidecimal number.
+        
+        """
+        return [cls(b) for b in hex_to_bitarrays(strings)]
+    
+    
     @classmethod
     def from_int(cls, i, bits):
         """Creates a new collection from a base64 string.
@@ -99,6 +280,25 @@ class BitCollection:
         return cls(int_to_bitarray(i, bits=bits))
     
     
+    @classmethod
+    def from_positions(cls, positions, bits):
+        """Creates a mask with the bits at the given positions set.
+        
+        Args:
+            positions (list): Positions of the bits to set.
+            bits (int): Length of the mask.
+        
+        Returns:
+            BitCollection: new instance, for set_positions.
+        
+        """
+        mask = bitarray(bits)
+        mask.setall(False)
+        for position in positions:
+            mask[position] = True
+        return cls(mask)
+    
+    
     @classmethod
     def from_random(cls, bits):
         """Generates a totally random BitCollection.
@@ -130,6 +330,11 @@ class BitCollection:
         return b
     
     
+    def count(self, value=True):
+        """Count the bits that are set (or, with value False, unset)."""
+        return self.content.count(value)
+    
+    
     def extract(self, positions):
         """Extract BitCollection from this collection.
         
@@ -249,6 +454,47 @@ class BitCollection:
         return bitarray_to_base64(bits, url_safe=url_safe)
     
     
+    def extract_range(self, start, stop):
+        """Extract a run of bits in one go.
+        
+        Args:
+            start (int): Position of the first bit to extract.
+            stop (int): Position after the last bit to extract.
+        
+        Returns:
+            BitCollection: bits start thru stop - 1, in order.
+        
+        """
+        bits = self.content[start:stop]
+        del self.content[start:stop]
+        return self.__class__(bits)
+    
+    
+    def find(self, sub, start=0):
+        """Find the first position of a bit or a run of bits.
+        
+        Args:
+            sub (bool|BitCollection): A bit value, or bits to match.
+            start (Optional[int]): Position to start looking from.
+        
+        Returns:
+            int: the position, or -1 if there's no match.
+        
+        """
+        content = self.content
+        if not isinstance(sub, BitCollection):
+            try:
+                return content.index(bool(sub), start)
+            except ValueError:
+                return -1
+        if start:
+            content = content[start:]
+        found = content.search(sub.content, 1)
+        if not found:
+            return -1
+        return found[0] + start
+    
+    
     def insert(self, b, positions):
         """Insert another BitCollection into this collection.
         
@@ -354,6 +600,47 @@ class BitCollection:
         return self.content.pop(index)
     
     
+    def set_positions(self, positions, value=True):
+        """Set the bits at many positions to the same value.
+        
+        A mask from from_positions is applied with a single OR (or AND
+        with its inverse), so build one when the same positions are
+        set on many collections. For a list used once, setting each
+        position is faster than building the mask.
+        
+        Args:
+            positions (list|BitCollection): Positions of the bits to
+                set, or a mask of the same length with them set.
+            value (Optional[bool]): What to set them to.
+        
+        Raises:
+            ValueError: the mask isn't the same length.
+        
+        """
+        content = self.content
+        if isinstance(positions, BitCollection):
+            if positions.content.length() != content.length():
+                raise ValueError('mask must be the same length')
+            if value:
+                content |= positions.content
+            else:
+                content &= ~positions.content
+            return
+        value = bool(value)
+        for position in positions:
+            content[position] = value
+    
+    
+    def to_base32(self):
+        """Express this collection as a Crockford base32 string."""
+        return bitarray_to_base32(self.content)
+    
+    
+    def to_base58(self):
+        """Express this collection as a base58 string."""
+        return bitarray_to_base58(self.content)
+    
+    
     def to_base64(self, url_safe=False):
         """Express this collection as a base64 string.
         
@@ -368,6 +655,31 @@ class BitCollection:
         return bitarray_to_base64(self.content, url_safe=url_safe)
     
     
+    @staticmethod
+    def to_base64_many(collections, url_safe=False):
+        """Express many collections as base64 strings.
+        
+        Collections of the same length, if it's a multiple of 24 bits,
+        are encoded together in a single call.
+        
+        Args:
+            collections (list): BitCollections to express.
+            url_safe (Optional[bool]): Whether the output should contain
+                '-_' instead of '+/'.
+        
+        Returns:
+            list: a base64 string per collection.
+        
+        """
+        return bitarrays_to_base64([b.content for b in collections],
+                url_safe=url_safe)
+    
+    
+    def to_base85(self):
+        """Express this collection as a base85 string."""
+        return bitarray_to_base85(self.content)
+    
+    
     def to_bytes(self):
         """Express this collection as bytes."""
         return self.content.tobytes()
@@ -378,9 +690,95 @@ class BitCollection:
         return bitarray_to_hex(self.content)
     
     
+    @staticmethod
+    def to_hex_many(collections):
+        """Express many collections as hexadecimal strings.
+        
+        Collections of the same whole number of bytes are encoded
+        together in a single call.
+        
+        Args:
+            collections (list): BitCollections to express.
+        
+        Returns:
+            list: a hexadecimal string per collection.
+        
+        """
+        return bitarrays_to_hex([b.content for b in collections])
+    
+    
     def to_int(self):
         """Express this collection as an integer."""
         return bitarray_to_int(self.content)
+    
+    
+    def freeze(self):
+        """Make an immutable copy of this collection.
+        
+        Returns:
+            FrozenBitCollection: holds its own copy of the bits.
+        
+        """
+        return FrozenBitCollection(bitarray(self.content))
+
+
+class FrozenBitCollection(BitCollection):
+    """A BitCollection that can't be changed once it's made.
+    
+    Every method that would insert, extract, or pop bits raises a
+    TypeError instead, which makes frozen collections safe to share
+    between results and long-lived indexes. They can be hashed, so they
+    key dicts and sets directly, and equal a mutable collection with
+    the same bits.
+    """
+    
+    __slots__ = ('cached_hash',)
+    
+    def __setattr__(self, name, value):
+        """Only allow the content to be set once."""
+        if hasattr(self, 'content'):
+            raise TypeError('FrozenBitCollection is immutable')
+        super(FrozenBitCollection, self).__setattr__(name, value)
+    
+    
+    def __hash__(self):
+        """Hash the bits, working it out only the first time."""
+        try:
+            return self.cached_hash
+        except AttributeError:
+            pass
+        
+        # Bits past the end pack as zeros, so the length tells '1' and
+        # '10' apart.
+        content = self.content
+        h = hash((len(content), content.tobytes()))
+        object.__setattr__(self, 'cached_hash', h)
+        return h
+    
+    
+    def immutable(self, *args, **kwargs):
+        """Stand-in for every method that would change the bits."""
+        raise TypeError('FrozenBitCollection is immutable')
+    
+    extract = extract_bitarray = extract_bytes = extract_int = immutable
+    extract_hex = extract_base64 = extract_range = immutable
+    insert = insert_bitarray = insert_bytes = insert_int = immutable
+    insert_hex = insert_base64 = pop = set_positions = immutable
+    
+    
+    def freeze(self):
+        """Frozen collections are already immutable."""
+        return self
+    
+    
+    def thaw(self):
+        """Make a mutable copy of this collection.
+        
+        Returns:
+            BitCollection: holds its own copy of the bits.
+        
+        """
+        return BitCollection(bitarray(self.content))
 
 
 class SecretKeyCollection:
@@ -411,7 +809,6 @@ class SecretKeyCollection:
         # Keep the data.
         self.original = s
         self.content = bits
-        self.index = 0
     
     
     def chunk(self, n):
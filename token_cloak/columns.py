@@ -0,0 +1,201 @@
+from array import array
+from bitarray import bitarray
+
+from .collections import BitCollection
+
+
+class TokenColumns:
+    """Holds the results of decoding a batch of tokens, column by column.
+    
+    Rather than a TokenResult per token, every layer gets one flat,
+    fixed-width buffer that holds its values for the whole batch:
+        
+        int (up to 64 bits):  array('Q') with one value per token.
+        int (over 64 bits):   bytearray of big-endian, fixed-width ints.
+        bytes, hex, BitCollection:
+                              bytearray of each value's packed bytes
+                              (right-padded with 0 bits).
+        bool:                 bitarray with one bit per token.
+        struct:               dict of the above, one per field name.
+    
+    Private tokens are packed the same way as bytes. Tokens that failed
+    to decode are 0 bits in the 'valid' bitmap and zeros in every
+    column. Each buffer supports the buffer protocol, so it can be
+    handed to other code (or NumPy) without a Python object per token.
+    """
+    
+    __slots__ = ('count', 'valid', 'private_tokens', 'private_token_width',
+            'layers', 'columns')
+    
+    def __init__(self, layers, private_token_bits, count):
+        """Allocate every column for a batch of tokens.
+        
+        Args:
+            layers (list): The TokenLayers of the Token being decoded.
+            private_token_bits (int): Length of each private token.
+            count (int): Number of tokens in the batch.
+        
+        """
+        self.count = count
+        self.layers = layers
+        self.valid = bitarray(count)
+        self.valid.setall(False)
+        self.private_token_width = (private_token_bits + 7) // 8
+        self.private_tokens = bytearray(self.private_token_width * count)
+        self.columns = [self.allocate(layer) for layer in layers]
+    
+    
+    def allocate(self, layer):
+        """Make the empty column for a single layer."""
+        if layer.type == 'struct':
+            return dict(
+                    (field.name, self.allocate(field)) for field in layer.fields)
+        if layer.type == 'bool':
+            column = bitarray(self.count)
+            column.setall(False)
+            return column
+        if layer.type == 'int' and layer.value_bits <= 64:
+            return array('Q', bytes(8 * self.count))
+        return bytearray(self.width(layer) * self.count)
+    
+    
+    @staticmethod
+    def width(layer):
+        """Number of bytes each value takes in a packed column."""
+        return (layer.value_bits + 7) // 8
+    
+    
+    def set_row(self, i, private_token, layer_values):
+        """Fill in one decoded token and mark it as valid.
+        
+        Args:
+            i (int): Row of the token in the batch.
+            private_token (BitCollection): The decoded private token.
+            layer_values (list): A BitCollection for each layer.
+        
+        """
+        width = self.private_token_width
+        self.private_tokens[i * width:(i + 1) * width] = private_token.to_bytes()
+        for layer, column, value in zip(self.layers, self.columns, layer_values):
+            self.fill(layer, column, i, value.content)
+        self.valid[i] = True
+    
+    
+    def fill(self, layer, column, i, bits):
+        """Write a single layer's bits into its column."""
+        if layer.envelope is not None:
+            # Columns hold values, not the envelopes around them.
+            bits = layer.unseal(bits)
+        if layer.type == 'struct':
+            offset = 0
+            for field in layer.fields:
+                self.fill(field, column[field.name], i,
+                        bits[offset:offset + field.bits])
+                offset += field.bits
+        elif layer.type == 'bool':
+            column[i] = bits[0]
+        elif layer.type == 'int' and layer.value_bits <= 64:
+            column[i] = BitCollection(bits).to_int()
+        else:
+            width = self.width(layer)
+            if layer.type == 'int':
+                bytes_ = BitCollection(bits).to_int().to_bytes(width, 'big')
+            else:
+                bytes_ = bits.tobytes()
+            column[i * width:(i + 1) * width] = bytes_
+    
+    
+    def index(self, key):
+        """Find a layer's index from its index or name."""
+        if isinstance(key, int):
+            return key
+        for i, layer in enumerate(self.layers):
+            if layer.name == key:
+                return i
+        raise KeyError(key)
+    
+    
+    def column(self, key):
+        """Get the raw column for a layer.
+        
+        Args:
+            key (int|str): The layer's index or name.
+        
+        Returns:
+            array, bytearray, bitarray, or dict: see the class docs.
+        
+        """
+        return self.columns[self.index(key)]
+    
+    
+    def values(self, key):
+        """Convert a layer's column back into Python values.
+        
+        This allocates an object per token, so it's meant for spot
+        checks and small batches.
+        
+        Args:
+            key (int|str): The layer's index or name.
+        
+        Returns:
+            list: a value in the layer's data type per token, or None
+                for tokens that failed to decode.
+        
+        """
+        index = self.index(key)
+        layer = self.layers[index]
+        column = self.columns[index]
+        return [self.value(layer, column, i) if self.valid[i] else None
+                for i in range(self.count)]
+    
+    
+    def value(self, layer, column, i):
+        """Convert a single row of a column to the layer's data type."""
+        if layer.type == 'struct':
+            values = dict((field.name, self.value(field, column[field.name], i))
+                    for field in layer.fields)
+            if layer.struct_class:
+                return layer.struct_class(**values)
+            return values
+        if layer.type == 'bool':
+            return bool(column[i])
+        if layer.type == 'int':
+            if layer.value_bits <= 64:
+                return column[i]
+            width = self.width(layer)
+            return int.from_bytes(column[i * width:(i + 1) * width], 'big')
+        width = self.width(layer)
+        if layer.type == 'bytes':
+            return bytes(column[i * width:(i + 1) * width])
+        bits = bitarray()
+        bits.frombytes(bytes(column[i * width:(i + 1) * width]))
+        return layer.from_bitcollection(BitCollection(bits[:layer.bits]))
+    
+    
+    def to_numpy(self, key):
+        """Wrap a layer's column in a NumPy array without copying it.
+        
+        Requires NumPy. int columns of up to 64 bits become uint64
+        arrays, packed columns become (count, width) uint8 arrays, and
+        bool columns become bool arrays (the only ones that are copied).
+        
+        Args:
+            key (int|str): The layer's index or name.
+        
+        Returns:
+            numpy.ndarray: for every layer type but struct.
+        
+        """
+        import numpy
+        index = self.index(key)
+        layer = self.layers[index]
+        column = self.columns[index]
+        if layer.type == 'struct':
+            raise ValueError('struct columns must be converted by field')
+        if layer.type == 'bool':
+            bits = numpy.frombuffer(column.tobytes(), dtype=numpy.uint8)
+            return numpy.unpackbits(bits)[:self.count].astype(bool)
+        if isinstance(column, array):
+            return numpy.frombuffer(column, dtype=numpy.uint64)
+        return numpy.frombuffer(column, dtype=numpy.uint8).reshape(
+                self.count, self.width(layer))
@@ -1,5 +1,5 @@
-class ConfigError(Exception):
-    """
-    Some necessary configuration has not been set.
-    """
+class ConfigError(Exception):
+    """
+    Some necessary configuration has not been set.
+    """
     pass
\ No newline at end of file
@@ -0,0 +1,335 @@
+from array import array
+from bitarray import bitarray
+import bisect
+import itertools
+import multiprocessing
+import random
+import string
+import threading
+import time
+
+from .collections import BitCollection
+from .tokens import Token
+
+
+KINDS = ['valid', 'malformed', 'wrong_config', 'encode']
+"""Kinds of request a workload can mix."""
+
+
+class Histogram:
+    """Records latencies in log-linear buckets, like an HDR histogram.
+    
+    Values are nanoseconds. Each power of two is split into 2 **
+    precision buckets, so any recorded value is reported to within
+    1 / 2 ** precision of itself (under 1% by default) with a fixed
+    amount of memory, however many values are recorded.
+    """
+    
+    def __init__(self, precision=7, max_exponent=48):
+        """Allocate an empty histogram.
+        
+        Args:
+            precision (Optional[int]): Bits of precision per value.
+            max_exponent (Optional[int]): Largest power of two that
+                values can reach, about 78 hours in nanoseconds.
+        
+        """
+        self.precision = precision
+        self.counts = array('Q', bytes(8 * (max_exponent + 1) << precision))
+        self.total = 0
+        self.min = None
+        self.max = 0
+    
+    
+    def index(self, value):
+        """Find the bucket for a value."""
+        exponent = max(0, value.bit_length() - self.precision)
+        return (exponent << self.precision) + (value >> exponent)
+    
+    
+    def value(self, index):
+        """Get the highest value that falls in a bucket."""
+        exponent = index >> self.precision
+        low = index & ((1 << self.precision) - 1)
+        return ((low + 1) << exponent) - 1
+    
+    
+    def record(self, value):
+        """Add a single value."""
+        value = max(0, int(value))
+        self.counts[self.index(value)] += 1
+        self.total += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+    
+    
+    def merge(self, other):
+        """Add every value from another histogram of the same shape."""
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+    
+    
+    def percentile(self, p):
+        """Get the value that p percent of the values are at or under."""
+        if not self.total:
+            return 0
+        rank = max(1, int(round(self.total * p / 100.0)))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.value(i), self.max)
+        return self.max
+
+
+class Workload:
+    """A reproducible mix of requests to replay against a Token.
+    
+    Requests are generated up front from a seed, with fixed private
+    tokens and seeds, so the same seed gives the same requests on
+    every run and every version.
+    
+    Here is a sample usage:
+        >>> workload = Workload(token, seed=1, mix={'valid': 90,
+        ...         'malformed': 5, 'wrong_config': 5})
+        >>> report = run(token, workload.requests(10000), rate=2000)
+        >>> report['p99']
+    
+    """
+    
+    def __init__(self, token, seed=0, mix=None, data_types=None):
+        """Describe the traffic.
+        
+        Args:
+            token (Token): The config the traffic is meant for.
+            seed (Optional[int]): Makes the requests reproducible.
+            mix (Optional[dict]): Relative weight of each kind in KINDS.
+            data_types (Optional[list]): Data types to spread requests
+                over, from Token.ENCODINGS.
+        
+        Raises:
+            ValueError: unknown kind or data type.
+        
+        """
+        if mix is None:
+            mix = {'valid': 90, 'malformed': 5, 'wrong_config': 5}
+        for kind in mix:
+            if kind not in KINDS:
+                raise ValueError('unknown kind of request %s' % kind)
+        if data_types is None:
+            data_types = ['base64']
+        for data_type in data_types:
+            if data_type not in Token.ENCODINGS or data_type == 'bytes':
+                raise ValueError('invalid data_type %s' % data_type)
+        self.token = token
+        self.seed = seed
+        self.mix = mix
+        self.data_types = data_types
+        
+        # Same shape, different secret.
+        config = dict(token.config)
+        config['secret_key'] = token.secret_key[::-1] + 'x'
+        self.other = Token(config)
+    
+    
+    def requests(self, count):
+        """Generate the requests.
+        
+        Returns:
+            list: (kind, data_type, payload) tuples. Payloads are token
+                strings, or lists of layer values for 'encode'.
+        
+        """
+        rnd = random.Random(self.seed)
+        kinds = sorted(self.mix)
+        cumulative = list(itertools.accumulate(
+                self.mix[kind] for kind in kinds))
+        total = cumulative[-1]
+        requests = []
+        for i in range(count):
+            kind = kinds[bisect.bisect_right(
+                    cumulative, rnd.random() * total, 0, len(kinds) - 1)]
+            data_type = rnd.choice(self.data_types)
+            values = [random_value(rnd, layer) for layer in self.token.layers]
+            if kind == 'encode':
+                requests.append((kind, data_type, values))
+                continue
+            token = self.other if kind == 'wrong_config' else self.token
+            s = self.encode(rnd, token, values, data_type)
+            if kind == 'malformed':
+                s = malform(rnd, s)
+            requests.append((kind, data_type, s))
+        return requests
+    
+    
+    def encode(self, rnd, token, values, data_type):
+        """Encode a reproducible public token."""
+        args = list(values)
+        bits = token.private_token_bits
+        if bits:
+            args.insert(0, BitCollection.from_int(rnd.getrandbits(bits), bits))
+        seeds = []
+        for layer in token.layers:
+            if layer.positions:
+                continue
+            seed_bits = layer.seed_bits
+            if seed_bits is None:
+                seed_bits = token.seed_bits
+            if seed_bits:
+                seeds.append(rnd.getrandbits(seed_bits))
+        result = token.encode(*args, seeds=seeds)
+        return getattr(result.public_token, 'to_' + data_type)()
+
+
+def random_value(rnd, layer):
+    """Make a random value for a layer."""
+    if layer.envelope is not None:
+        # Only values that trim down to fit the envelope.
+        room = layer.bits - layer.prefix_bits
+        if layer.type == 'int':
+            return rnd.getrandbits(min(room, layer.value_bits))
+        count = rnd.randint(0, min(room // 8, layer.length))
+        return (bytes(rnd.getrandbits(8) for i in range(count))
+                + bytes(layer.length - count))
+    if layer.type == 'int':
+        return rnd.getrandbits(layer.bits)
+    if layer.type == 'bool':
+        return rnd.random() < 0.5
+    if layer.type == 'timestamp':
+        return layer.epoch + rnd.getrandbits(layer.bits) * layer.granularity
+    if layer.type == 'hex':
+        return ''.join(rnd.choice('0123456789abcdef')
+                for i in range(layer.length))
+    if layer.type == 'bytes':
+        return bytes(rnd.getrandbits(8) for i in range(layer.length))
+    if layer.type == 'struct':
+        return dict((field.name, random_value(rnd, field))
+                for field in layer.fields)
+    return BitCollection(bitarray(
+            [rnd.random() < 0.5 for i in range(layer.bits)]))
+
+
+def malform(rnd, s):
+    """Break a token string the way bad clients do."""
+    how = rnd.randrange(4)
+    if how == 0:
+        return s[:rnd.randrange(len(s))]
+    if how == 1:
+        return s + s[:rnd.randint(1, 4)]
+    if how == 2:
+        i = rnd.randrange(len(s))
+        return s[:i] + rnd.choice('!@#$% ') + s[i + 1:]
+    return ''.join(rnd.choice(string.printable)
+            for i in range(rnd.randint(0, 2 * len(s))))
+
+
+def replay(token, requests, start, interval, histogram, outcomes):
+    """Send requests at their scheduled times and record latencies.
+    
+    At a fixed rate, latency is measured from when each request was
+    due, not when it was sent, so a stall counts against every request
+    it delays. Otherwise, requests are sent back to back and each is
+    timed on its own.
+    """
+    clock = time.perf_counter
+    for scheduled, (kind, data_type, payload) in requests:
+        if interval:
+            due = start + scheduled * interval
+            wait = due - clock()
+            if wait > 0:
+                time.sleep(wait)
+        else:
+            due = clock()
+        try:
+            if kind == 'encode':
+                result = token.encode(*payload)
+            else:
+                result = token.decode(payload, data_type=data_type)
+            outcome = 'ok' if result is not None else 'rejected'
+        except (TypeError, ValueError):
+            outcome = 'error'
+        histogram.record((clock() - due) * 1e9)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+
+def process_worker(args):
+    """Replay a share of the requests in a worker process."""
+    config, secret_key, requests, interval = args
+    config = dict(config)
+    config['secret_key'] = secret_key
+    token = Token(config)
+    histogram = Histogram()
+    outcomes = {}
+    start = time.perf_counter()
+    replay(token, requests, start, interval, histogram, outcomes)
+    return histogram, outcomes
+
+
+def run(token, requests, rate=None, mode='inline', workers=4):
+    """Replay requests against a Token and report on the latency.
+    
+    Args:
+        token (Token): The config to run the requests through.
+        requests (list): From Workload.requests.
+        rate (Optional[float]): Requests per second to send them at.
+            By default, as fast as possible.
+        mode (Optional[str]): 'inline', 'threads', or 'processes'.
+        workers (Optional[int]): Threads or processes to spread over.
+    
+    Returns:
+        dict: count, seconds, throughput (per second), outcomes, and
+            latency in microseconds as p50, p99, p999, and max.
+    
+    """
+    if mode not in ['inline', 'threads', 'processes']:
+        raise ValueError('mode must be inline, threads, or processes')
+    if mode == 'inline':
+        workers = 1
+    interval = 1.0 / rate if rate else 0
+    scheduled = list(enumerate(requests))
+    shares = [scheduled[i::workers] for i in range(workers)]
+    histogram = Histogram()
+    outcomes = {}
+    
+    start = time.perf_counter()
+    if mode == 'inline':
+        replay(token, scheduled, start, interval, histogram, outcomes)
+    elif mode == 'threads':
+        results = [(Histogram(), {}) for share in shares]
+        threads = [threading.Thread(target=replay, args=(
+                token, share, start, interval) + result)
+                for share, result in zip(shares, results)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        # Clocks are per process, so each worker starts on its own.
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(process_worker, [
+                    (token.config, token.secret_key, share, interval)
+                    for share in shares])
+    elapsed = time.perf_counter() - start
+    
+    if mode != 'inline':
+        for other, other_outcomes in results:
+            histogram.merge(other)
+            for outcome, count in other_outcomes.items():
+                outcomes[outcome] = outcomes.get(outcome, 0) + count
+    return {
+        'count': histogram.total,
+        'seconds': elapsed,
+        'throughput': histogram.total / elapsed if elapsed else 0,
+        'outcomes': outcomes,
+        'p50': histogram.percentile(50) / 1000.0,
+        'p99': histogram.percentile(99) / 1000.0,
+        'p999': histogram.percentile(99.9) / 1000.0,
+        'max': histogram.max / 1000.0,
+    }
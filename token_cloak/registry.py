@@ -0,0 +1,145 @@
+from collections import OrderedDict
+import threading
+
+from .exceptions import ConfigError
+from .tokens import Token
+from .utils import config_fingerprint
+
+
+class TokenRegistry:
+    """Interns frozen Tokens by the fingerprint of their configs.
+    
+    Building a Token validates every layer and packs the secret key,
+    which adds up when tokens are made per request or per tenant. The
+    registry hands back the same frozen Token for every config with
+    the same fingerprint, so each config is only built once while it's
+    in use.
+    
+    Tokens are only built the first time their config is asked for,
+    and only the most recently used maxsize of them are kept, so
+    rarely used configs don't hold on to memory.
+    
+    Here is a sample usage:
+        >>> registry = TokenRegistry(maxsize=10000)
+        >>> token = registry.get(tenant_config)
+        >>> token is registry.get(dict(tenant_config))
+        True
+    
+    """
+    
+    def __init__(self, maxsize=1024):
+        """Start an empty registry.
+        
+        Args:
+            maxsize (Optional[int]): Most Tokens to keep at once.
+        
+        Raises:
+            ConfigError: maxsize must be a positive int.
+        
+        """
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise ConfigError('maxsize must be a positive int')
+        self.maxsize = maxsize
+        
+        # Tokens by fingerprint, least recently used first.
+        self.tokens = OrderedDict()
+        self.lock = threading.Lock()
+        
+        # Metrics.
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    
+    def __len__(self):
+        """Number of Tokens currently kept."""
+        return len(self.tokens)
+    
+    
+    def fingerprint(self, config):
+        """Hash a config the same way Token.fingerprint does.
+        
+        Raises:
+            ConfigError: secret key is not set.
+        
+        """
+        secret_key = config.get('secret_key', None)
+        if not secret_key:
+            from token_cloak import secret_key
+            if not secret_key:
+                raise ConfigError('secret key is not set')
+        return config_fingerprint(config, secret_key)
+    
+    
+    def get(self, config):
+        """Get the shared Token for a config, building it if needed.
+        
+        Args:
+            config (dict): A Token config.
+        
+        Returns:
+            Token: frozen, and shared with every equal config.
+        
+        Raises:
+            ConfigError: the config is invalid.
+        
+        """
+        key = self.fingerprint(config)
+        with self.lock:
+            token = self.tokens.get(key, None)
+            if token is not None:
+                self.tokens.move_to_end(key)
+                self.hits += 1
+                return token
+            self.misses += 1
+        
+        # Build outside the lock so other configs aren't held up.
+        token = Token(config).freeze() # Raises ConfigError
+        with self.lock:
+            token = self.tokens.setdefault(key, token)
+            self.tokens.move_to_end(key)
+            while len(self.tokens) > self.maxsize:
+                self.tokens.popitem(last=False)
+                self.evictions += 1
+        return token
+    
+    
+    def discard(self, config):
+        """Forget the Token for a config, if there is one."""
+        with self.lock:
+            self.tokens.pop(self.fingerprint(config), None)
+    
+    
+    def clear(self):
+        """Forget every Token and reset the metrics."""
+        with self.lock:
+            self.tokens.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+    
+    
+    def stats(self):
+        """Report how well the registry is working.
+        
+        Returns:
+            dict: size, maxsize, hits, misses, and evictions.
+        
+        """
+        with self.lock:
+            return {
+                'size': len(self.tokens),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+registry = TokenRegistry()
+"""The registry shared by the whole process."""
+
+
+def get_token(config):
+    """Get the shared, frozen Token for a config from the registry."""
+    return registry.get(config)
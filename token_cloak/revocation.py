@@ -0,0 +1,182 @@
+import mmap
+import struct
+
+from .bloom import BloomFilter
+from .collections import BitCollection
+
+
+MAGIC = b'TCRV'
+"""Identifies revocation index files."""
+
+VERSION = 1
+"""Format version of revocation index files."""
+
+HEADER = struct.Struct('<4sHHQQHd')
+"""Magic, version, key width, key count, Bloom bits, hashes, and rate."""
+
+
+class RevocationIndex:
+    """A sorted, fixed-width set of revoked private tokens.
+    
+    Private tokens are kept as their raw bytes, back to back and in
+    order, so a million 128-bit tokens take 16 MB and are found by
+    binary search. Indexes are written to files that load with mmap,
+    so they're shared between processes and only the pages that are
+    searched are ever read. An optional Bloom filter in front answers
+    most lookups for tokens that aren't revoked without a search.
+    
+    Here is a sample usage:
+        >>> index = RevocationIndex.build(private_tokens, error_rate=0.01)
+        >>> index.write('revoked.index')
+        >>> index = RevocationIndex.load('revoked.index')
+        >>> token.decode(s, data_type='base64', revocations=index) is None
+        True
+        >>> result = token.decode(s, data_type='base64', revocations=index,
+        ...         status=True)
+        >>> result.status
+        'revoked'
+    
+    """
+    
+    def __init__(self, width, keys, bloom=None, offset=0):
+        """Wrap an already sorted buffer of keys.
+        
+        Args:
+            width (int): Bytes per key.
+            keys (bytes|mmap): Sorted, unique keys laid end to end.
+            bloom (Optional[BloomFilter]): Filter holding every key.
+            offset (Optional[int]): Where the keys start in the buffer.
+        
+        """
+        self.width = width
+        self.keys = keys
+        self.offset = offset
+        self.count = (len(keys) - offset) // width if width else 0
+        self.bloom = bloom
+    
+    
+    def __len__(self):
+        """Number of revoked tokens."""
+        return self.count
+    
+    
+    def __contains__(self, private_token):
+        """Test whether a private token is revoked.
+        
+        Args:
+            private_token (BitCollection|bytes): The private token, or
+                its bytes.
+        
+        """
+        if isinstance(private_token, BitCollection):
+            key = private_token.content.tobytes()
+        else:
+            key = bytes(private_token)
+        if len(key) != self.width:
+            return False
+        if self.bloom is not None and key not in self.bloom:
+            return False
+        
+        # Binary search through the fixed-width keys.
+        keys = self.keys
+        width = self.width
+        low = 0
+        high = self.count
+        while low < high:
+            mid = (low + high) // 2
+            start = self.offset + mid * width
+            other = keys[start:start + width]
+            if other < key:
+                low = mid + 1
+            elif other > key:
+                high = mid
+            else:
+                return True
+        return False
+    
+    
+    @classmethod
+    def build(cls, private_tokens, error_rate=None):
+        """Make an index from revoked private tokens.
+        
+        Args:
+            private_tokens (iterable): BitCollections (or bytes), all
+                the same length.
+            error_rate (Optional[float]): If given, put a Bloom filter
+                with this false positive rate in front.
+        
+        Returns:
+            RevocationIndex: held in memory until written.
+        
+        Raises:
+            ValueError: private tokens aren't all the same length.
+        
+        """
+        keys = set()
+        width = None
+        for private_token in private_tokens:
+            if isinstance(private_token, BitCollection):
+                key = private_token.content.tobytes()
+            else:
+                key = bytes(private_token)
+            if width is None:
+                width = len(key)
+            elif len(key) != width:
+                raise ValueError('private tokens must be the same length')
+            keys.add(key)
+        
+        bloom = None
+        if error_rate is not None and keys:
+            bloom = BloomFilter(len(keys), error_rate=error_rate)
+            for key in keys:
+                bloom.add(key)
+        return cls(width or 0, b''.join(sorted(keys)), bloom=bloom)
+    
+    
+    def write(self, path):
+        """Save the index to a file that load can map."""
+        bloom = self.bloom
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(
+                    MAGIC, VERSION, self.width, self.count,
+                    bloom.size if bloom else 0,
+                    bloom.hashes if bloom else 0,
+                    bloom.error_rate if bloom else 0))
+            if bloom is not None:
+                f.write(bloom.to_bytes())
+            f.write(self.keys[self.offset:])
+    
+    
+    @classmethod
+    def load(cls, path):
+        """Memory-map an index file, read-only.
+        
+        Raises:
+            ValueError: the file isn't a revocation index.
+        
+        """
+        with open(path, 'rb') as f:
+            try:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError('revocation index file is invalid')
+        if len(m) < HEADER.size:
+            raise ValueError('revocation index file is invalid')
+        magic, version, width, count, size, hashes, error_rate = (
+                HEADER.unpack_from(m, 0))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('revocation index file is invalid')
+        
+        # The filter is small enough to copy; the keys stay mapped.
+        offset = HEADER.size
+        bloom = None
+        if size:
+            length = (size + 7) // 8
+            bloom = BloomFilter.from_bytes(
+                    m[offset:offset + length], count, error_rate, size,
+                    hashes)
+            bloom.count = count
+            offset += length
+        if len(m) != offset + width * count:
+            raise ValueError('revocation index file is truncated')
+        return cls(width, m, bloom=bloom, offset=offset)
@@ -0,0 +1,294 @@
+from .collections import BitCollection
+from .exceptions import ConfigError
+from .tokens import Token
+
+
+class TokenRouter:
+    """Sends each public token to the one Token config that can decode it.
+    
+    Running several configs side by side means an incoming token could
+    belong to any of them. Rather than trying each Token's decode in
+    turn, the router indexes every registered Token by the length of
+    its public tokens in each data type, so finding the right config
+    is a single dict lookup.
+    
+    Configs whose tokens have the same length can still be told apart
+    if each has a small version layer (named 'version' by default) and
+    is registered with its version value. Only that layer is read from
+    the token to pick between them, so it must be the last layer and
+    have explicit positions, and be the same type, size, and positions
+    in every config of that length; otherwise its bits would land in
+    different places for each config, and a token could be read as
+    the wrong version.
+    
+    Here is a sample usage:
+        >>> router = TokenRouter()
+        >>> router.register('sessions', Token(session_config))
+        >>> router.register('invites', Token(invite_config))
+        >>> name, result = router.decode(s, data_type='base64')
+    
+    """
+    
+    def __init__(self, version_layer='version'):
+        """Start an empty router.
+        
+        Args:
+            version_layer (Optional[str]): Name of the layer holding
+                the version tag in configs that share a length.
+        
+        """
+        self.version_layer = version_layer
+        
+        # Registered routes by name.
+        self.routes = {}
+        
+        # Routes by (data_type, length).
+        self.index = {}
+    
+    
+    def register(self, name, token, version=None, data_types=None):
+        """Add a Token config to the router.
+        
+        Args:
+            name (str): Unique name returned when a token is routed.
+            token (Token): The config to route tokens to.
+            version (Optional[mixed]): Value of the token's version
+                layer. Required when another config's tokens have the
+                same length.
+            data_types (Optional[list]): Data types to route this
+                config's tokens for, with None standing for
+                BitCollections. Defaults to all of them.
+        
+        Raises:
+            ConfigError: the config can't be told apart from another.
+        
+        """
+        if name in self.routes:
+            raise ConfigError('route %s is already registered' % name)
+        if not isinstance(token, Token):
+            raise ConfigError('routes must be Token objects')
+        
+        # Find the version layer if there is one.
+        version_index = None
+        if version is not None:
+            for i, layer in enumerate(token.layers):
+                if layer.name == self.version_layer:
+                    version_index = i
+            if version_index is None:
+                err = 'token has no %s layer' % self.version_layer
+                raise ConfigError(err)
+            if (version_index != len(token.layers) - 1
+                    or not token.layers[version_index].positions):
+                err = '%s layer must be last and have positions'
+                raise ConfigError(err % self.version_layer)
+        route = (name, token, version_index, version)
+        
+        # Index the route under every data type's length.
+        if data_types is None:
+            data_types = [None] + Token.ENCODINGS
+        keys = []
+        for data_type in data_types:
+            for length in self.lengths(token, data_type):
+                key = (data_type, length)
+                for other in self.index.get(key, []):
+                    if version is None or other[3] is None:
+                        err = 'route %s has the same length as %s'
+                        raise ConfigError(err % (name, other[0]))
+                    if other[3] == version:
+                        err = 'route %s has the same version as %s'
+                        raise ConfigError(err % (name, other[0]))
+                    if not self.same_version_layer(
+                            token.layers[version_index],
+                            other[1].layers[other[2]]):
+                        err = 'route %s has its %s layer unlike %s\'s'
+                        raise ConfigError(
+                                err % (name, self.version_layer, other[0]))
+                keys.append(key)
+        for key in keys:
+            self.index.setdefault(key, []).append(route)
+        self.routes[name] = token
+    
+    
+    @staticmethod
+    def same_version_layer(layer, other):
+        """Whether two version layers are read the same way.
+        
+        Routes that share a length are told apart by reading a single
+        version, so their version layers must have the same type,
+        size, and positions.
+        """
+        return (layer.type == other.type and layer.bits == other.bits
+                and layer.length == other.length
+                and layer.positions == other.positions)
+    
+    
+    @staticmethod
+    def lengths(token, data_type):
+        """List every length a config's public tokens can have.
+        
+        Args:
+            token (Token): The config to measure.
+            data_type (str): How the tokens are encoded. None stands for
+                BitCollections, whose length is in bits.
+        
+        Returns:
+            list: ints, which only has more than one for base58.
+        
+        """
+        bits = token.public_token_bit_length()
+        if data_type is None:
+            return [bits]
+        if data_type == 'base64':
+            return [TokenRouter.base64_length(bits)]
+        if data_type != 'base58':
+            return [token.encoded_length(data_type)]
+        
+        # Each leading zero byte is a '1', the rest is a base58 number.
+        length = (bits + 7) // 8
+        lengths = set([length])
+        for zeros in range(length):
+            low = 256 ** (length - zeros - 1)
+            high = 256 ** (length - zeros) - 1
+            for i in range(len(TokenRouter.base58_digits(low)),
+                    len(TokenRouter.base58_digits(high)) + 1):
+                lengths.add(zeros + i)
+        return sorted(lengths)
+    
+    
+    @staticmethod
+    def base64_length(bits):
+        """Length of an unpadded base64 string holding the given bits."""
+        return ((bits + 7) // 8 * 4 + 2) // 3
+    
+    
+    @staticmethod
+    def base58_digits(i):
+        """Base58 representation of a positive int (without zero bytes)."""
+        b = BitCollection.from_bytes(
+                i.to_bytes((i.bit_length() + 7) // 8, byteorder='big'))
+        return b.to_base58()
+    
+    
+    def key(self, token, data_type=None):
+        """Get the index key for an incoming public token.
+        
+        Returns:
+            tuple: the data type and length, or None if the token isn't
+                of the data type, so it matches no route.
+        
+        Raises:
+            ValueError: invalid data_type.
+        
+        """
+        if data_type is None:
+            if not isinstance(token, BitCollection):
+                return None
+            return (None, token.length())
+        if data_type not in Token.ENCODINGS:
+            raise ValueError('invalid data_type')
+        if data_type == 'bytes':
+            if not isinstance(token, (bytes, bytearray)):
+                return None
+        elif not isinstance(token, str):
+            return None
+        if data_type == 'base64':
+            return (data_type, len(token.rstrip('=')))
+        return (data_type, len(token))
+    
+    
+    def route(self, token, data_type=None, **kwargs):
+        """Find the config that made a public token.
+        
+        Args:
+            token (mixed): public token in a variety of possible types.
+            data_type (Optional[str]): How the token is encoded on a
+                data level. Required unless token is a BitCollection.
+        
+        Returns:
+            str: name of the route, or None if no config matches.
+        
+        """
+        key = self.key(token, data_type)
+        if key is None:
+            return None
+        routes = self.index.get(key, None)
+        if not routes:
+            return None
+        if len(routes) == 1:
+            return routes[0][0]
+        
+        # Every candidate is the same length, so parse the token once.
+        public_token = routes[0][1].parse_token(
+                token, data_type=data_type, **kwargs)
+        if public_token is None:
+            return None
+        
+        # Every candidate lays out its version the same way.
+        name, candidate, version_index, version = routes[0]
+        value = candidate.read_layer(public_token, version_index)
+        for name, candidate, version_index, version in routes:
+            if value == version:
+                return name
+        return None
+    
+    
+    def route_many(self, tokens, data_type=None, **kwargs):
+        """Group a mixed stream of public tokens by config.
+        
+        Args:
+            tokens (iterable): public tokens, all of the same data type.
+            data_type (Optional[str]): How the tokens are encoded.
+        
+        Returns:
+            dict: route names to lists of token indexes. Tokens that
+                no config matches are listed under None.
+        
+        """
+        groups = {}
+        for i, token in enumerate(tokens):
+            name = self.route(token, data_type=data_type, **kwargs)
+            groups.setdefault(name, []).append(i)
+        return groups
+    
+    
+    def decode(self, token, data_type=None, **kwargs):
+        """Route a public token and decode it with its config.
+        
+        Returns:
+            If successful, a tuple of the route name and TokenResult.
+            Otherwise, None.
+        
+        """
+        name = self.route(token, data_type=data_type, **kwargs)
+        if name is None:
+            return None
+        result = self.routes[name].decode(token, data_type=data_type, **kwargs)
+        if result is None:
+            return None
+        return name, result
+    
+    
+    def decode_many(self, tokens, data_type=None, **kwargs):
+        """Route and decode a mixed stream of public tokens.
+        
+        Tokens are grouped by config first, so each group goes through
+        its Token's decode_many in one batch.
+        
+        Returns:
+            list: a tuple of the route name and TokenResult per token,
+                or None where a token couldn't be routed or decoded.
+        
+        """
+        tokens = list(tokens)
+        results = [None] * len(tokens)
+        groups = self.route_many(tokens, data_type=data_type, **kwargs)
+        for name, indexes in groups.items():
+            if name is None:
+                continue
+            decoded = self.routes[name].decode_many(
+                    [tokens[i] for i in indexes], data_type=data_type,
+                    **kwargs)
+            for i, result in zip(indexes, decoded):
+                if result is not None:
+                    results[i] = (name, result)
+        return results
@@ -0,0 +1,343 @@
+import asyncio
+import json
+import struct
+
+from .collections import BitCollection
+
+
+FRAMINGS = ['line', 'length']
+"""How messages are separated on the wire."""
+
+LENGTH = struct.Struct('>I')
+"""Length prefix for length-framed messages."""
+
+
+def to_json(value):
+    """Convert a decoded layer value to something json can dump.
+    
+    bytes and BitCollections become hexadecimal strings and structs
+    become objects.
+    """
+    if isinstance(value, BitCollection):
+        return value.to_hex()
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).hex()
+    if hasattr(value, '_asdict'):
+        value = value._asdict()
+    if isinstance(value, dict):
+        return dict((k, to_json(v)) for k, v in value.items())
+    return value
+
+
+def from_json(layer, value):
+    """Convert a layer value from a request to the layer's data type."""
+    if layer.type == 'bytes':
+        return bytes.fromhex(value)
+    if layer.type == 'BitCollection':
+        return BitCollection.from_hex(value)
+    if layer.type == 'struct':
+        return dict((field.name, from_json(field, value[field.name]))
+                for field in layer.fields)
+    return value
+
+
+class TokenServer:
+    """Encodes and decodes tokens for other processes over a socket.
+    
+    Each message is a JSON object, one per line or behind a 4-byte
+    big-endian length, depending on the framing:
+        
+        {"id": 1, "op": "decode", "token": "...", "data_type": "base64"}
+        {"id": 2, "op": "encode", "layers": [...], "data_type": "base64"}
+        {"id": 3, "op": "stats"}
+    
+    Requests from every connection go into one queue. They're taken
+    off in micro-batches of up to max_batch requests, waiting at most
+    max_wait seconds for a batch to fill, and each batch's decodes go
+    through Token.decode_many together. Responses come back on each
+    connection in the order its requests were sent, with the request's
+    id:
+        
+        {"id": 1, "ok": true, "private_token": "<hex>",
+         "public_token": "...", "layers": [...]}
+        {"id": 4, "ok": false, "error": "invalid token"}
+    
+    Here is a sample usage:
+        >>> server = TokenServer(Token(config))
+        >>> loop.run_until_complete(server.start_unix('/tmp/tokens.sock'))
+    
+    """
+    
+    def __init__(self, token, framing='line', max_batch=64, max_wait=0.002):
+        """Set up a server for a single Token config.
+        
+        Args:
+            token (Token): The config to encode and decode with.
+            framing (Optional[str]): 'line' or 'length'.
+            max_batch (Optional[int]): Most requests in a batch.
+            max_wait (Optional[float]): Most seconds to wait for a
+                batch to fill.
+        
+        """
+        if framing not in FRAMINGS:
+            raise ValueError('framing must be one of %s' % ', '.join(FRAMINGS))
+        if not isinstance(max_batch, int) or max_batch < 1:
+            raise ValueError('max_batch must be a positive int')
+        self.token = token
+        self.framing = framing
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = None
+        self.batcher = None
+        self.server = None
+        
+        # Metrics.
+        self.requests = 0
+        self.batched = 0
+        self.batches = 0
+        self.largest_batch = 0
+    
+    
+    def stats(self):
+        """Report the queue and batch metrics.
+        
+        Returns:
+            dict: queue_depth, requests (queued so far), batches,
+                mean_batch_size, and largest_batch.
+        
+        """
+        return {
+            'queue_depth': self.queue.qsize() if self.queue else 0,
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': (
+                    self.batched / self.batches if self.batches else 0),
+            'largest_batch': self.largest_batch,
+        }
+    
+    
+    async def start_unix(self, path):
+        """Start serving on a Unix domain socket."""
+        self.start()
+        self.server = await asyncio.start_unix_server(self.handle, path=path)
+        return self.server
+    
+    
+    async def start_tcp(self, host='127.0.0.1', port=0):
+        """Start serving on a TCP socket, localhost by default."""
+        self.start()
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+    
+    
+    def start(self):
+        """Start the batching task on the running loop."""
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.ensure_future(self.run_batches())
+    
+    
+    async def close(self):
+        """Stop accepting connections and stop batching."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.batcher is not None:
+            self.batcher.cancel()
+            try:
+                await self.batcher
+            except asyncio.CancelledError:
+                pass
+    
+    
+    async def read_message(self, reader):
+        """Read one framed message, or None at the end of the stream."""
+        if self.framing == 'line':
+            line = await reader.readline()
+            if not line:
+                return None
+            return line
+        try:
+            header = await reader.readexactly(LENGTH.size)
+            return await reader.readexactly(LENGTH.unpack(header)[0])
+        except asyncio.IncompleteReadError:
+            return None
+    
+    
+    def frame(self, response):
+        """Serialize and frame one response."""
+        data = json.dumps(response, separators=(',', ':')).encode('utf-8')
+        if self.framing == 'line':
+            return data + b'\n'
+        return LENGTH.pack(len(data)) + data
+    
+    
+    async def handle(self, reader, writer):
+        """Serve one connection until it closes.
+        
+        Requests are queued as soon as they're read, so a client can
+        pipeline them. A writer task sends responses back in order.
+        """
+        pending = asyncio.Queue()
+        sender = asyncio.ensure_future(self.send(writer, pending))
+        try:
+            while True:
+                message = await self.read_message(reader)
+                if message is None:
+                    break
+                if not message.strip():
+                    continue
+                pending.put_nowait(self.submit(message))
+        finally:
+            pending.put_nowait(None)
+            await sender
+            writer.close()
+    
+    
+    async def send(self, writer, pending):
+        """Write each response once it's ready, in request order."""
+        while True:
+            future = await pending.get()
+            if future is None:
+                return
+            writer.write(self.frame(await future))
+            await writer.drain()
+    
+    
+    def submit(self, message):
+        """Parse a request and queue it for the next batch.
+        
+        Returns:
+            asyncio.Future: resolves to the response dict.
+        
+        """
+        future = asyncio.get_event_loop().create_future()
+        try:
+            request = json.loads(message.decode('utf-8'))
+            if not isinstance(request, dict):
+                raise ValueError('request must be an object')
+        except ValueError as e:
+            future.set_result({'id': None, 'ok': False, 'error': str(e)})
+            return future
+        if request.get('op') == 'stats':
+            future.set_result(
+                    {'id': request.get('id'), 'ok': True, 'stats': self.stats()})
+            return future
+        self.requests += 1
+        self.queue.put_nowait((request, future))
+        return future
+    
+    
+    async def run_batches(self):
+        """Take requests off the queue in batches forever."""
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                            await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            self.batched += len(batch)
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            
+            # Tokens are thread-safe, so the loop keeps reading meanwhile.
+            requests = [request for request, future in batch]
+            try:
+                responses = await loop.run_in_executor(
+                        None, self.process, requests)
+            except Exception as e:
+                # Never leave a batch hanging, or stop taking batches.
+                responses = [self.error(request, str(e))
+                        for request in requests]
+            for (request, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+    
+    
+    def process(self, requests):
+        """Run a batch of requests.
+        
+        Decodes with the same data type go through decode_many together.
+        
+        Returns:
+            list: a response dict per request.
+        
+        """
+        responses = [None] * len(requests)
+        groups = {}
+        for i, request in enumerate(requests):
+            op = request.get('op')
+            if op == 'decode':
+                groups.setdefault(request.get('data_type'), []).append(i)
+            elif op == 'encode':
+                responses[i] = self.encode(request)
+            else:
+                responses[i] = self.error(request, 'unknown op')
+        
+        for data_type, indexes in groups.items():
+            tokens = [requests[i].get('token') for i in indexes]
+            try:
+                results = self.token.decode_many(tokens, data_type=data_type)
+            except Exception:
+                results = [self.decode(token, data_type) for token in tokens]
+            for i, result in zip(indexes, results):
+                if result is None:
+                    responses[i] = self.error(requests[i], 'invalid token')
+                else:
+                    responses[i] = self.result(requests[i], result, data_type)
+        return responses
+    
+    
+    def decode(self, token, data_type):
+        """Decode a single token, or None if it's malformed."""
+        try:
+            return self.token.decode(token, data_type=data_type)
+        except Exception:
+            return None
+    
+    
+    def encode(self, request):
+        """Run a single encode request."""
+        layers = request.get('layers') or []
+        if (not isinstance(layers, list)
+                or len(layers) != len(self.token.layers)):
+            return self.error(request, 'expected a list of %d layer values'
+                    % len(self.token.layers))
+        try:
+            values = [from_json(layer, value)
+                    for layer, value in zip(self.token.layers, layers)]
+            result = self.token.encode(*values)
+        except Exception as e:
+            return self.error(request, str(e))
+        return self.result(request, result, request.get('data_type'))
+    
+    
+    def result(self, request, result, data_type):
+        """Build the response for a TokenResult."""
+        public_token = result.public_token
+        if data_type in ('base32', 'base58', 'base64', 'base85', 'hex'):
+            public_token = getattr(public_token, 'to_' + data_type)()
+        else:
+            public_token = public_token.to_hex()
+        return {
+            'id': request.get('id'),
+            'ok': True,
+            'private_token': result.private_token.to_hex(),
+            'public_token': public_token,
+            'layers': [to_json(value) for value in result.layers or []],
+        }
+    
+    
+    def error(self, request, message):
+        """Build the response for a failed request."""
+        return {'id': request.get('id'), 'ok': False, 'error': message}
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+
+from .collections import BitCollection
+from .unique import UniqueMinter
+
+
+MANIFEST_SUFFIX = '.manifest.json'
+"""Added to an output file's path to get its manifest's path."""
+
+DATA_TYPES = ['base32', 'base58', 'base64', 'base85', 'hex']
+"""Data types a shard's public tokens can be written in, one per line."""
+
+
+class ShardMinter(UniqueMinter):
+    """Mints one shard of a run that's split across workers or machines.
+    
+    The top bits of every private token are the shard's index, so no
+    two shards can ever mint the same token, and the rest are random.
+    Within a shard, tokens are kept unique as with UniqueMinter. Each
+    shard's output is written with a manifest, and merge_shards joins
+    the outputs without ever comparing their tokens.
+    
+    Here is a sample usage, on each of 8 machines:
+        >>> minter = token.mint_shard(1000000, shard=3, shards=8)
+        >>> minter.write('tokens-3.txt')
+    
+    And then on any one of them:
+        >>> merge_shards(['tokens-%d.txt.manifest.json' % i
+        ...         for i in range(8)], 'tokens.txt')
+    
+    """
+    
+    def __init__(self, token, count, shard, shards, args=(), values=None,
+            **kwargs):
+        """Set up a shard of a run.
+        
+        Args:
+            token (Token): The config to mint with.
+            count (int): Number of tokens in this shard.
+            shard (int): This shard's index, from 0 to shards - 1.
+            shards (int): Number of shards in the whole run.
+            args (Optional[tuple]): Layer values for every token.
+            values (Optional[callable]): Takes a token's number in the
+                shard and returns its layer values, instead of args.
+            **kwargs: unique, max_memory, and max_retries; see
+                UniqueMinter.
+        
+        Raises:
+            ValueError: shard is out of range, or the private token is
+                too short to hold it.
+        
+        """
+        if shards < 1 or not 0 <= shard < shards:
+            raise ValueError('shard must be in 0 thru shards - 1')
+        self.tag_bits = (shards - 1).bit_length()
+        private_token_bits = token.private_token_bits or 0
+        if private_token_bits < self.tag_bits:
+            err = 'private_token_bits must be at least %d for %d shards'
+            raise ValueError(err % (self.tag_bits, shards))
+        self.shard = shard
+        self.shards = shards
+        super(ShardMinter, self).__init__(
+                token, count, args=args, values=values,
+                private_tokens=self.private_token, **kwargs)
+    
+    
+    def private_token(self):
+        """Make a random private token that starts with the shard."""
+        random_bits = (self.token.private_token_bits or 0) - self.tag_bits
+        tag = BitCollection.from_int(self.shard, self.tag_bits)
+        if not random_bits:
+            return tag
+        return tag + BitCollection.from_random(random_bits)
+    
+    
+    def write(self, path, data_type='base64'):
+        """Mint the shard into a file, one public token per line.
+        
+        A manifest is written next to it, at path + MANIFEST_SUFFIX,
+        holding the shard, the number of tokens, the config's
+        fingerprint, and the file's SHA-256 checksum.
+        
+        Args:
+            path (str): Where to write the tokens.
+            data_type (Optional[str]): How to write them, from
+                DATA_TYPES.
+        
+        Returns:
+            dict: the manifest.
+        
+        Raises:
+            ValueError: unknown data type.
+        
+        """
+        if data_type not in DATA_TYPES:
+            raise ValueError('invalid data_type %s' % data_type)
+        to_string = 'to_' + data_type
+        checksum = hashlib.sha256()
+        count = 0
+        with open(path, 'wb') as f:
+            for result in self:
+                line = getattr(result.public_token, to_string)() + '\n'
+                line = line.encode('ascii')
+                checksum.update(line)
+                f.write(line)
+                count += 1
+        manifest = {
+            'file': os.path.basename(path),
+            'fingerprint': self.token.fingerprint(),
+            'shard': self.shard,
+            'shards': self.shards,
+            'count': count,
+            'data_type': data_type,
+            'sha256': checksum.hexdigest(),
+        }
+        write_manifest(path, manifest)
+        return manifest
+
+
+def write_manifest(path, manifest):
+    """Write the manifest for an output file."""
+    with open(path + MANIFEST_SUFFIX, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def read_manifest(path):
+    """Read a manifest, along with the path of the file it describes."""
+    with open(path) as f:
+        manifest = json.load(f)
+    return manifest, os.path.join(os.path.dirname(path), manifest['file'])
+
+
+def merge_shards(manifests, path):
+    """Join shards minted with the same config into a single file.
+    
+    Shards can't hold the same tokens, so their files are just copied
+    one after another, in shard order. Every file is checked against
+    its manifest's checksum and count along the way.
+    
+    Args:
+        manifests (list): Paths of the shards' manifest files.
+        path (str): Where to write the merged tokens. Its manifest is
+            written at path + MANIFEST_SUFFIX.
+    
+    Returns:
+        dict: the merged manifest, with the shards it holds in 'parts'.
+    
+    Raises:
+        ValueError: the shards don't belong together, a shard is there
+            twice, or a file doesn't match its manifest.
+    
+    """
+    parts = [read_manifest(manifest) for manifest in manifests]
+    if not parts:
+        raise ValueError('no shards to merge')
+    parts.sort(key=lambda part: part[0]['shard'])
+    first = parts[0][0]
+    for i, (manifest, source) in enumerate(parts):
+        for key in ['fingerprint', 'shards', 'data_type']:
+            if manifest[key] != first[key]:
+                raise ValueError('shards have different %s' % key)
+        if i and manifest['shard'] == parts[i - 1][0]['shard']:
+            raise ValueError('shard %d is there twice' % manifest['shard'])
+    
+    checksum = hashlib.sha256()
+    count = 0
+    try:
+        with open(path, 'wb') as f:
+            for manifest, source in parts:
+                part_checksum = hashlib.sha256()
+                part_count = 0
+                with open(source, 'rb') as part:
+                    for line in part:
+                        part_checksum.update(line)
+                        checksum.update(line)
+                        f.write(line)
+                        part_count += 1
+                if (part_checksum.hexdigest() != manifest['sha256']
+                        or part_count != manifest['count']):
+                    err = '%s doesn\'t match its manifest' % source
+                    raise ValueError(err)
+                count += part_count
+    except ValueError:
+        os.remove(path)
+        raise
+    
+    merged = {
+        'file': os.path.basename(path),
+        'fingerprint': first['fingerprint'],
+        'shards': first['shards'],
+        'parts': [manifest['shard'] for manifest, source in parts],
+        'count': count,
+        'data_type': first['data_type'],
+        'sha256': checksum.hexdigest(),
+    }
+    write_manifest(path, merged)
+    return merged
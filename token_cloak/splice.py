@@ -0,0 +1,323 @@
+from bisect import bisect_right, insort
+from bitarray import bitarray
+import time
+
+from .utils import (bitarray_to_int, extract_bits, insert_bits,
+        int_to_bitarray)
+
+
+class InsertSplicer:
+    """Splices bits in and out with bitarray insert and pop.
+    
+    Every bit moves all of the bits after it, in C, so this is the
+    cheapest backend for short tokens.
+    """
+    
+    name = 'insert'
+    
+    def __init__(self, content):
+        """Take over a bitarray, which is changed in place."""
+        self.content = content
+    
+    
+    def length(self):
+        """Number of bits in the token so far."""
+        return len(self.content)
+    
+    
+    def insert(self, bits, positions):
+        """Insert bits at positions, each shifting the bits after it."""
+        content = self.content
+        for j, position in enumerate(positions):
+            content.insert(position, bits[j])
+    
+    
+    def insert_int(self, i, positions):
+        """Insert bit j of an integer at the jth position."""
+        self.insert([(i >> j) & 1 for j in range(len(positions))], positions)
+    
+    
+    def extract(self, positions):
+        """Undo an insert at the same positions.
+        
+        Returns:
+            bitarray: the bits that were inserted, in order.
+        
+        """
+        content = self.content
+        bits = bitarray()
+        for position in positions[::-1]:
+            bits.append(content.pop(position))
+        bits.reverse()
+        return bits
+    
+    
+    def extract_int(self, positions):
+        """Undo an insert_int at the same positions."""
+        return bitarray_to_int(self.extract(positions)[::-1])
+    
+    
+    def finish(self):
+        """Get the finished bitarray."""
+        return self.content
+
+
+class IntSplicer(InsertSplicer):
+    """Splices bits in and out of a Python int with masks.
+    
+    Uses utils.insert_bits and utils.extract_bits. Each bit costs a few
+    big-int operations over the whole token, so long tokens get slow,
+    but there's no per-bit bitarray call.
+    """
+    
+    name = 'int'
+    
+    def __init__(self, content):
+        """Convert a bitarray to an int, keeping track of its length."""
+        self.bits = len(content)
+        
+        # A guard bit on top stops leading zeros from being lost, since
+        # the mask helpers size themselves by bit_length.
+        self.value = bitarray_to_int(content) | (1 << self.bits)
+    
+    
+    def length(self):
+        """Number of bits in the token so far."""
+        return self.bits
+    
+    
+    def insert(self, bits, positions):
+        """Insert bits at positions, each shifting the bits after it."""
+        
+        # Ints count positions from the other end, and grow as they go.
+        length = self.bits
+        offsets = [length + j - position
+                for j, position in enumerate(positions)]
+        insert = bitarray_to_int(bitarray(bits)[::-1])
+        self.value = insert_bits(self.value, insert, offsets)
+        self.bits += len(offsets)
+    
+    
+    def extract(self, positions):
+        """Undo an insert at the same positions.
+        
+        Returns:
+            bitarray: the bits that were inserted, in order.
+        
+        """
+        length = self.bits
+        count = len(positions)
+        offsets = [length - count + j - position
+                for j, position in enumerate(positions)][::-1]
+        self.value, extracted = extract_bits(self.value, offsets)
+        self.bits -= count
+        
+        # The first bit extracted, the last inserted, is the highest.
+        return int_to_bitarray(extracted, count)[::-1]
+    
+    
+    def finish(self):
+        """Get the finished bitarray."""
+        return int_to_bitarray(self.value ^ (1 << self.bits), self.bits)
+
+
+class GatherSplicer(InsertSplicer):
+    """Splices by moving indexes around and gathering the bits once.
+    
+    A list of where every bit came from is kept instead of the bits
+    themselves. Inserts and pops move list items, a plain memory move,
+    and the bits are only looked up when the token is finished, so
+    wide layers in long tokens cost the least.
+    """
+    
+    name = 'gather'
+    
+    def __init__(self, content):
+        """Start an index map over a bitarray."""
+        self.pool = content
+        self.index_map = list(range(len(content)))
+    
+    
+    def length(self):
+        """Number of bits in the token so far."""
+        return len(self.index_map)
+    
+    
+    def insert(self, bits, positions):
+        """Insert bits at positions, each shifting the bits after it."""
+        start = len(self.pool)
+        self.pool.extend(bits)
+        index_map = self.index_map
+        for j, position in enumerate(positions):
+            index_map.insert(position, start + j)
+    
+    
+    def extract(self, positions):
+        """Undo an insert at the same positions.
+        
+        Returns:
+            bitarray: the bits that were inserted, in order.
+        
+        """
+        pool = self.pool
+        index_map = self.index_map
+        bits = bitarray()
+        for position in positions[::-1]:
+            bits.append(pool[index_map.pop(position)])
+        bits.reverse()
+        return bits
+    
+    
+    def finish(self):
+        """Gather the bits in their final order."""
+        pool = self.pool
+        return bitarray([pool[i] for i in self.index_map])
+
+
+SPLICERS = {
+    'insert': InsertSplicer,
+    'int': IntSplicer,
+    'gather': GatherSplicer,
+}
+"""Splice backends by name."""
+
+COSTS = {
+    'insert': (0.18, 0.0017, 0.008),
+    'int': (0.29, 0.0058, 0.57),
+    'gather': (0.065, 0.00009, 0.056),
+}
+"""Microseconds per spliced bit, per bit shifted, and per token bit.
+
+Fit to calibrate's timings across token shapes with CPython 3.11 and
+bitarray 1.9. Only their ratios matter, since they're used to rank
+backends against each other.
+"""
+
+BACKENDS = ['auto', 'calibrate'] + sorted(SPLICERS)
+"""Values a config's splice_backend can take."""
+
+
+def free_slot(position, taken):
+    """Find where a bit ends up once other bits are inserted around it.
+    
+    Args:
+        position (int): The bit's position before the inserts.
+        taken (list): Sorted positions of the inserted bits, after all
+            of the inserts.
+    
+    Returns:
+        int: the position-th slot that isn't taken.
+    
+    """
+    slot = position
+    while True:
+        moved = position + bisect_right(taken, slot)
+        if moved == slot:
+            return slot
+        slot = moved
+
+
+def place_inserts(positions):
+    """Find where a run of inserted bits ends up once they're all in.
+    
+    Bits are inserted one at a time, each at its position in the
+    bits so far, as in InsertSplicer.insert. The last bit lands where
+    it's inserted, and each bit before it goes in the slot its position
+    points to among the slots the bits after it don't take.
+    
+    Returns:
+        list: every bit's position after the inserts, in insert order.
+    
+    """
+    taken = []
+    placed = [None] * len(positions)
+    for j in range(len(positions) - 1, -1, -1):
+        slot = free_slot(positions[j], taken)
+        insort(taken, slot)
+        placed[j] = slot
+    return placed
+
+
+def splice_shape(token):
+    """Measure the splicing work one token takes.
+    
+    Args:
+        token (Token): The config to measure.
+    
+    Returns:
+        tuple: bits spliced, bits shifted (the token length at every
+            spliced bit, added up), and bits in the public token.
+    
+    """
+    spliced = 0
+    shifted = 0
+    length = token.private_token_bits
+    for layer in token.layers:
+        seed_bits = 0
+        if not layer.positions:
+            seed_bits = layer.seed_bits
+            if seed_bits is None:
+                seed_bits = token.seed_bits
+        for bits in [layer.bits, seed_bits]:
+            spliced += bits
+            shifted += bits * length + bits * (bits - 1) // 2
+            length += bits
+    return spliced, shifted, length
+
+
+def estimate(token):
+    """Predict each backend's cost, in microseconds per token."""
+    spliced, shifted, length = splice_shape(token)
+    estimates = {}
+    for name, (per_bit, per_shift, per_gather) in COSTS.items():
+        estimates[name] = (per_bit * spliced + per_shift * shifted
+                + per_gather * length)
+    return estimates
+
+
+def calibrate(token, number=20):
+    """Time each backend on this config's shape.
+    
+    Random layers are spliced into a token of the right length at the
+    positions of a real encode, then spliced back out.
+    
+    Args:
+        token (Token): The config to time.
+        number (Optional[int]): Round trips per backend.
+    
+    Returns:
+        dict: mean microseconds per round trip, by backend name.
+    
+    """
+    steps = []
+    length = token.private_token_bits
+    for layer in token.layers:
+        seed_bits = 0
+        if not layer.positions:
+            seed_bits = layer.seed_bits
+            if seed_bits is None:
+                seed_bits = token.seed_bits
+        for bits in [layer.bits, seed_bits]:
+            if bits:
+                positions = token.generate_bit_positions(
+                        seed=len(steps), max_position=length, bits=bits)
+                content = bitarray(bits)
+                content.setall(True)
+                steps.append((content, positions))
+                length += bits
+    
+    timings = {}
+    for name, cls in SPLICERS.items():
+        start = time.perf_counter()
+        for i in range(number):
+            content = bitarray(token.private_token_bits)
+            content.setall(False)
+            splicer = cls(content)
+            for bits, positions in steps:
+                splicer.insert(bits, positions)
+            splicer = cls(splicer.finish())
+            for bits, positions in steps[::-1]:
+                splicer.extract(positions)
+            splicer.finish()
+        timings[name] = (time.perf_counter() - start) / number * 1e6
+    return timings
@@ -0,0 +1,162 @@
+from array import array
+import mmap
+import struct
+import sys
+
+from .exceptions import ConfigError
+
+
+MAGIC = b'TCPT'
+"""Identifies position table files."""
+
+VERSION = 1
+"""Format version of position table files."""
+
+HEADER = struct.Struct('<4sHH32s')
+"""Magic, version, number of tables, and the config's fingerprint."""
+
+ENTRY = struct.Struct('<HBBIIQ')
+"""Layer index, seed bits, item size, bits, max position, and offset."""
+
+
+class PositionTable:
+    """Every possible set of positions for a single seeded layer.
+    
+    The positions for seed s are the fixed-width run of values from
+    s * bits to (s + 1) * bits.
+    """
+    
+    __slots__ = ('seed_bits', 'seeds', 'bits', 'max_position', 'values')
+    
+    def __init__(self, seed_bits, bits, max_position, values):
+        """Wrap a flat array (or memoryview) of positions.
+        
+        Args:
+            seed_bits (int): Bits in the layer's seed.
+            bits (int): Bits in the layer, which is positions per seed.
+            max_position (int): The layer's max_position.
+            values (array|memoryview): Positions for every seed.
+        
+        """
+        self.seed_bits = seed_bits
+        self.seeds = 2 ** seed_bits
+        self.bits = bits
+        self.max_position = max_position
+        self.values = values
+    
+    
+    def positions(self, seed):
+        """Get the positions for a single seed."""
+        start = seed * self.bits
+        return self.values[start:start + self.bits].tolist()
+
+
+def build_position_tables(token, max_seed_bits=16):
+    """Generate the position tables for a Token's seeded layers.
+    
+    Args:
+        token (Token): The config to build tables for.
+        max_seed_bits (Optional[int]): Largest seed to build for.
+    
+    Returns:
+        dict: PositionTables by layer index.
+    
+    """
+    tables = {}
+    length = token.private_token_bits
+    for index, layer in enumerate(token.layers):
+        if layer.positions:
+            length += layer.bits
+            continue
+        seed_bits = layer.seed_bits
+        if seed_bits is None:
+            seed_bits = token.seed_bits
+        
+        # Layer positions are generated against the token so far.
+        if seed_bits and seed_bits <= max_seed_bits:
+            typecode = 'H' if length + layer.bits <= 0xFFFF else 'I'
+            values = array(typecode)
+            for seed in range(2 ** seed_bits):
+                values.extend(token.generate_bit_positions(
+                        seed=seed, max_position=length, bits=layer.bits))
+            tables[index] = PositionTable(
+                    seed_bits, layer.bits, length, values)
+        length += layer.bits + seed_bits
+    return tables
+
+
+def write_position_tables(path, fingerprint, tables):
+    """Save position tables to a file.
+    
+    Values are stored little-endian in fixed-width rows, after a header
+    and one entry per table.
+    
+    Args:
+        path (str): Where to write the file.
+        fingerprint (str): Hexadecimal fingerprint of the config.
+        tables (dict): PositionTables by layer index.
+    
+    """
+    offset = HEADER.size + ENTRY.size * len(tables)
+    entries = []
+    data = []
+    for index in sorted(tables):
+        table = tables[index]
+        values = array(table.values.typecode, table.values)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        entries.append(ENTRY.pack(
+                index, table.seed_bits, values.itemsize, table.bits,
+                table.max_position, offset))
+        data.append(values.tobytes())
+        offset += len(data[-1])
+    
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(
+                MAGIC, VERSION, len(tables), bytes.fromhex(fingerprint)))
+        for entry in entries:
+            f.write(entry)
+        for values in data:
+            f.write(values)
+
+
+def load_position_tables(path, fingerprint):
+    """Memory-map position tables from a file, read-only.
+    
+    Args:
+        path (str): A file from write_position_tables.
+        fingerprint (str): Hexadecimal fingerprint of the config that
+            will use the tables.
+    
+    Returns:
+        dict: PositionTables by layer index.
+    
+    Raises:
+        ConfigError: the file isn't a table for this config.
+    
+    """
+    with open(path, 'rb') as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(m) < HEADER.size:
+        raise ConfigError('position table file is invalid')
+    magic, version, count, digest = HEADER.unpack_from(m, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ConfigError('position table file is invalid')
+    if digest != bytes.fromhex(fingerprint):
+        raise ConfigError('position table was built for another config')
+    
+    tables = {}
+    view = memoryview(m)
+    for i in range(count):
+        index, seed_bits, itemsize, bits, max_position, offset = (
+                ENTRY.unpack_from(m, HEADER.size + ENTRY.size * i))
+        typecode = 'H' if itemsize == 2 else 'I'
+        size = (2 ** seed_bits) * bits * itemsize
+        values = view[offset:offset + size].cast(typecode)
+        
+        # Big-endian machines need their own (unshared) copy.
+        if sys.byteorder == 'big':
+            values = array(typecode, values)
+            values.byteswap()
+        tables[index] = PositionTable(seed_bits, bits, max_position, values)
+    return tables
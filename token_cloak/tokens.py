@@ -1,10 +1,35 @@
 import binascii
+from bitarray import bitarray
+from collections import namedtuple
 import copy
+import datetime
 import hashlib
+import keyword
+import random
+import threading
+import time
 
-from .collections import BitCollection, SecretKeyCollection
+from .batch import encode_batch, load_engine, pack, peel_batch
+from .codegen import compile_token
+from .collections import (
+        BitCollection, FrozenBitCollection, SecretKeyCollection)
+from .columns import TokenColumns
 from .exceptions import ConfigError
 from .random import MT19937
+from .shards import ShardMinter
+from .splice import (BACKENDS, SPLICERS, calibrate, estimate, free_slot,
+        place_inserts)
+from .tables import (
+        build_position_tables, load_position_tables, write_position_tables)
+from .unique import UniqueMinter
+from .utils import (bitarray_to_ascii, bitarray_to_ascii_into,
+        bitarray_to_int, bitarrays_to_base64, bitarrays_to_hex,
+        bytes_to_bitarray, config_fingerprint, hex_to_bitarray,
+        int_to_bitarray, to_unix_time)
+
+
+scratch = threading.local()
+"""Per-thread working state, so shared Tokens never need a lock."""
 
 
 class TokenLayer:
@@ -15,16 +40,40 @@ class TokenLayer:
         'int',
         'bytes',
         'hex',
+        'bool',
+        'struct',
+        'timestamp',
     ]
     """The list of valid types."""
     
+    FIELD_TYPES = [
+        'int',
+        'bytes',
+        'hex',
+        'bool',
+    ]
+    """The list of valid types for struct fields."""
+    
+    __slots__ = (
+        'type', 'name', 'bits', 'length', 'positions', 'seed_bits',
+        'fields', 'struct_class', 'epoch', 'granularity', 'expiry',
+        'envelope', 'value_bits', 'prefix_bits', 'frozen')
+    
     def __init__(self, d):
-        """Takes a dictionary of settings and ingests it as a layer."""
+        """Takes a dictionary of settings and ingests it as a layer.
+        
+        Only the resolved settings are kept, not the dictionary itself,
+        and the layer can't be changed once it's made.
+        
+        """
+        self.frozen = False
         
         # Must be a dictionary.
         if not isinstance(d, dict):
             raise ConfigError('layers must each be a dict')
-        self.config = d
+        
+        # Layers can be named, struct fields must be.
+        self.name = d.get('name', None)
         
         # What is this layer's type?
         self.type = d.get('type', None)
@@ -37,6 +86,35 @@ class TokenLayer:
         if self.bits != None and not isinstance(self.bits, int):
             raise ConfigError('layer bits key must be a positive int')
         
+        # Bools are a single bit.
+        if self.type == 'bool':
+            self.bits = 1
+        
+        # Structs are as wide as all of their fields put together.
+        self.fields = None
+        self.struct_class = None
+        if self.type == 'struct':
+            self.fields = self.ingest_fields(d.get('fields', None))
+            self.bits = sum(field.bits for field in self.fields)
+            if d.get('namedtuple', False):
+                self.struct_class = namedtuple(
+                        'Struct', [field.name for field in self.fields])
+        
+        # Timestamps count granularity seconds from an epoch.
+        self.epoch = None
+        self.granularity = None
+        self.expiry = False
+        if self.type == 'timestamp':
+            self.epoch = d.get('epoch', 0)
+            if not isinstance(self.epoch, int):
+                raise ConfigError('layer epoch must be an int')
+            self.granularity = d.get('granularity', 1)
+            if not isinstance(self.granularity, int) or self.granularity < 1:
+                raise ConfigError('layer granularity must be a positive int')
+            self.expiry = d.get('expiry', False)
+            if not isinstance(self.expiry, bool):
+                raise ConfigError('layer expiry must be a bool')
+        
         # Init the length.
         self.length = d.get('length', None)
         if not self.length and not self.bits:
@@ -46,7 +124,7 @@ class TokenLayer:
                 raise ConfigError('layer length must be a positive int')
         
         # Bits and ints require bits.
-        if self.type in ['BitCollection','int']:
+        if self.type in ['BitCollection','int','bool','struct','timestamp']:
             if not self.bits:
                 err = 'layer %s bits key must be a positive int'
                 raise ConfigError(err % self.type)
@@ -74,6 +152,22 @@ class TokenLayer:
         else:
             raise ConfigError('invalid layer type')
         
+        # Envelopes hold a length prefix, the trimmed value, and padding.
+        self.envelope = d.get('envelope', None)
+        self.value_bits = self.bits
+        self.prefix_bits = 0
+        if self.envelope is not None:
+            if self.type not in ['int', 'bytes']:
+                raise ConfigError('only int and bytes layers have envelopes')
+            units = self.bits if self.type == 'int' else self.length
+            self.prefix_bits = units.bit_length()
+            if (not isinstance(self.envelope, int)
+                    or isinstance(self.envelope, bool)
+                    or self.envelope <= self.prefix_bits):
+                err = 'layer envelope must be an int over %d bits'
+                raise ConfigError(err % self.prefix_bits)
+            self.bits = self.envelope
+        
         # Every type has the optional 'positions' key
         self.positions = None
         positions = d.get('positions', None)
@@ -92,7 +186,7 @@ class TokenLayer:
                 raise ConfigError('number of layer positions must match bits')
             
             # Positions is valid
-            self.positions = positions
+            self.positions = tuple(positions)
         
         self.seed_bits = None
         if 'seed_bits' in d:
@@ -100,10 +194,75 @@ class TokenLayer:
             if not isinstance(seed_bits, int) or seed_bits < 0:
                 raise ConfigError('seed bits must be a non-negative int')
             self.seed_bits = seed_bits
+        
+        # Nothing changes from here on out.
+        self.frozen = True
+    
+    
+    def __setattr__(self, name, value):
+        """Refuse changes once the layer is ingested."""
+        if getattr(self, 'frozen', False):
+            raise AttributeError('TokenLayer is immutable')
+        super(TokenLayer, self).__setattr__(name, value)
+    
+    
+    def ingest_fields(self, fields):
+        """Validate a struct's fields and turn them into TokenLayers.
+        
+        Args:
+            fields (list): dicts with a 'name' and the usual layer keys.
+        
+        Returns:
+            list: TokenLayers, each with a name.
+        
+        Raises:
+            ConfigError: fields aren't a valid list of field dicts.
+        
+        """
+        if not fields or not isinstance(fields, list):
+            raise ConfigError('struct fields must be a non-empty list')
+        
+        layers = []
+        names = set()
+        for field in fields:
+            if not isinstance(field, dict):
+                raise ConfigError('struct fields must each be a dict')
+            
+            # Every field needs its own identifier-friendly name.
+            name = field.get('name', None)
+            if not isinstance(name, str) or not name.isidentifier():
+                raise ConfigError('struct field name must be an identifier')
+            if keyword.iskeyword(name) or name.startswith('_'):
+                err = 'struct field name cannot be a keyword or start with _'
+                raise ConfigError(err)
+            if name in names:
+                raise ConfigError('struct field names must be unique')
+            names.add(name)
+            
+            # Fields are packed together, so they can't be placed.
+            if field.get('type', None) not in self.FIELD_TYPES:
+                err = 'struct field type must be in %s'
+                raise ConfigError(err % ', '.join(self.FIELD_TYPES))
+            if 'positions' in field or 'seed_bits' in field:
+                err = 'struct fields cannot have positions or seed bits'
+                raise ConfigError(err)
+            
+            layers.append(TokenLayer(field)) # Raises ConfigError
+        return layers
     
     
     def to_bitcollection(self, v):
         """Get the BitCollection for this layer."""
+        bits = self.to_bitarray(v)
+        
+        # BitCollections are passed through as they are.
+        if self.type == 'BitCollection':
+            return v
+        return BitCollection(bits)
+    
+    
+    def to_bitarray(self, v):
+        """Get the bits for this layer."""
         
         # Is it a BitCollection?
         if self.type == 'BitCollection':
@@ -111,15 +270,19 @@ class TokenLayer:
                 raise ValueError('layer value must be a BitCollection')
             if v.length() != self.bits:
                 raise ValueError('layer value has incorrect number of bits')
-            return v
+            return v.content
         
         # Is it an int?
         if self.type == 'int':
             if not isinstance(v, int):
                 raise ValueError('layer value must be an int')
-            if v.bit_length() > self.bits:
+            if v.bit_length() > self.value_bits:
                 raise ValueError('layer value is too many bits')
-            return BitCollection.from_int(v, bits=self.bits)
+            if self.envelope is not None:
+                if v < 0:
+                    raise ValueError('layer value must be non-negative')
+                return self.seal(int_to_bitarray(v, bits=self.value_bits))
+            return int_to_bitarray(v, bits=self.bits)
         
         # Is it bytes?
         if self.type == 'bytes':
@@ -127,7 +290,9 @@ class TokenLayer:
                 raise ValueError('layer value must be bytes')
             if len(v) != self.length:
                 raise ValueError('layer value is incorrect length')
-            return BitCollection.from_bytes(v)
+            if self.envelope is not None:
+                return self.seal(bytes_to_bitarray(v))
+            return bytes_to_bitarray(v)
         
         # Is it string?
         if self.type == 'hex':
@@ -135,14 +300,108 @@ class TokenLayer:
                 raise ValueError('layer value must be str')
             if len(v) != self.length:
                 raise ValueError('layer value is incorrect length')
-            return BitCollection.from_hex(v)
+            return hex_to_bitarray(v)
+        
+        # Is it a bool?
+        if self.type == 'bool':
+            if not isinstance(v, bool):
+                raise ValueError('layer value must be a bool')
+            return bitarray([v])
+        
+        # Is it a timestamp?
+        if self.type == 'timestamp':
+            if isinstance(v, bool) or not isinstance(
+                    v, (int, float, datetime.datetime)):
+                raise ValueError('layer value must be a Unix time or datetime')
+            ticks = int((to_unix_time(v) - self.epoch) // self.granularity)
+            if not 0 <= ticks < 2 ** self.bits:
+                raise ValueError('layer value is out of range')
+            return int_to_bitarray(ticks, bits=self.bits)
+        
+        # Is it a struct?
+        if self.type == 'struct':
+            if hasattr(v, '_asdict'):
+                v = v._asdict()
+            if not isinstance(v, dict):
+                raise ValueError('layer value must be a dict or namedtuple')
+            if len(v) != len(self.fields):
+                raise ValueError('layer value has incorrect fields')
+            
+            # Pack every field one after another.
+            bits = bitarray()
+            for field in self.fields:
+                if field.name not in v:
+                    raise ValueError('layer value is missing %s' % field.name)
+                bits.extend(field.to_bitarray(v[field.name]))
+            return bits
         
         # Something failed here, which should be impossible.
         raise ConfigError('unable to create BitCollection')
     
     
+    def seal(self, bits):
+        """Pack a value's full-width bits into the layer's envelope.
+        
+        Leading zeros of an int and trailing zero bytes of bytes are
+        dropped, and what's left is prefixed with how much of it there
+        is: a number of bits for ints, or of bytes for bytes. The rest
+        of the envelope is padded with bits hashed from the prefix and
+        payload, so it looks random, but a value always gets the same
+        envelope and encoding stays reproducible.
+        
+        Args:
+            bits (bitarray): value_bits bits, as a plain layer has them.
+        
+        Returns:
+            bitarray: the envelope's bits.
+        
+        Raises:
+            ValueError: the trimmed value doesn't fit in the envelope.
+        
+        """
+        if self.type == 'int':
+            count = bits.length() - bits.index(True) if bits.any() else 0
+            payload = bits[bits.length() - count:]
+        else:
+            count = len(bits.tobytes().rstrip(b'\0'))
+            payload = bits[:count * 8]
+        envelope = int_to_bitarray(count, bits=self.prefix_bits) + payload
+        padding = self.bits - envelope.length()
+        if padding < 0:
+            raise ValueError('layer value doesn\'t fit in its envelope')
+        if padding:
+            # SHA-256 in counter mode, one 32-byte block at a time.
+            data = envelope.tobytes()
+            digest = b''
+            counter = 0
+            while len(digest) * 8 < padding:
+                digest += hashlib.sha256(
+                        data + counter.to_bytes(4, 'big')).digest()
+                counter += 1
+            envelope.frombytes(digest[:(padding + 7) // 8])
+            del envelope[self.bits:]
+        return envelope
+    
+    
+    def unseal(self, bits):
+        """Get a value's full-width bits back out of its envelope."""
+        count = bitarray_to_int(bits[:self.prefix_bits])
+        if self.type == 'int':
+            payload = bits[self.prefix_bits:self.prefix_bits + count]
+            payload = payload[max(0, payload.length() - self.value_bits):]
+            plain = bitarray(self.value_bits - payload.length())
+            plain.setall(False)
+            return plain + payload
+        payload = bits[self.prefix_bits:self.prefix_bits + count * 8]
+        plain = bitarray(max(0, self.value_bits - payload.length()))
+        plain.setall(False)
+        return (payload + plain)[:self.value_bits]
+    
+    
     def from_bitcollection(self, b):
         """Convert to original format."""
+        if self.envelope is not None:
+            b = BitCollection(self.unseal(b.content))
         if self.type == 'BitCollection':
             return b
         if self.type == 'int':
@@ -151,23 +410,71 @@ class TokenLayer:
             return b.to_bytes()
         if self.type == 'hex':
             return b.to_hex()
+        if self.type == 'bool':
+            return bool(b.content[0])
+        if self.type == 'timestamp':
+            return self.epoch + b.to_int() * self.granularity
+        if self.type == 'struct':
+            
+            # Unpack every field from its slice of the bits.
+            values = {}
+            offset = 0
+            for field in self.fields:
+                bits = b.content[offset:offset + field.bits]
+                values[field.name] = field.from_bitcollection(
+                        BitCollection(bits))
+                offset += field.bits
+            if self.struct_class:
+                return self.struct_class(**values)
+            return values
         raise ConfigError('unable to convert to original format')
 
 
-class TokenResult:
+class TokenResult(namedtuple(
+        'TokenResult', ['private_token', 'public_token', 'layers'])):
     """Object created from decoding a token.
     
     The Token object only carries configuration information. It's
     resulting collection carries its results.
+    
+    Results are tuples, so they're immutable, carry no per-instance
+    dict, and unpack as (private_token, public_token, layers).
     """
     
-    def __init__(self, private_token=None, public_token=None, layers=None):
+    __slots__ = ()
+    
+    status = 'valid'
+    """Whether the token can be trusted. Subclasses say otherwise."""
+    
+    def __new__(cls, private_token=None, public_token=None, layers=None):
         """Populate the collection once with everything it'll ever have.
         
         """
-        self.layers = layers
-        self.public_token = public_token
-        self.private_token = private_token
+        return super(TokenResult, cls).__new__(
+                cls, private_token, public_token, layers)
+
+
+class RevokedTokenResult(TokenResult):
+    """Result for a token whose private token has been revoked.
+    
+    Its layers are never converted, so they're always None.
+    """
+    
+    __slots__ = ()
+    
+    status = 'revoked'
+
+
+class ExpiredTokenResult(TokenResult):
+    """Result for a token whose expiry layer has passed.
+    
+    Only the expiry is read, so the private token and layers are
+    always None.
+    """
+    
+    __slots__ = ()
+    
+    status = 'expired'
 
 
 class Token:
@@ -181,6 +488,12 @@ class Token:
     with all the necessary parameters. This is an easier method of
     sharing token configurations between functions and modules.
     
+    Encoding and decoding only ever read a Token's config and keep
+    their working state in locals (or per-thread scratch), so one Token
+    can be shared by any number of threads without a lock. Changing the
+    config while other threads use it is not safe, which freezing the
+    Token rules out.
+    
     A sample config could be stored as and submitted as the following:
         config = {
             "secret_key": "the length of this should be long",
@@ -208,9 +521,22 @@ class Token:
     
     """
     
+    ENCODINGS = [
+        'base32',
+        'base58',
+        'base64',
+        'base85',
+        'bytes',
+        'hex',
+    ]
+    """Data types that public tokens can be encoded to and decoded from."""
+    
     def __init__(self, config=None):
         """Set default object properties."""
         
+        # Frozen tokens can be shared, but never changed.
+        self.frozen = False
+        
         # The secret string to use for predictable randomness.
         self.secret_key = None
         
@@ -223,6 +549,16 @@ class Token:
         # Values getting spliced into the public token.
         self.layers = []
         
+        # Which layer, if any, holds the token's expiry.
+        self.expiry_index = None
+        
+        # Precomputed positions by layer index.
+        self.position_tables = {}
+        
+        # How bits get spliced in and out, and why.
+        self.splice_backend = 'insert'
+        self.splice_choice = None
+        
         # Is config here?
         self.config = {}
         if config:
@@ -291,23 +627,231 @@ class Token:
             for row in config.get('layers'):
                 self.layers.append(TokenLayer(row)) # Raises ConfigError
         
+        # Only one layer can say when the token expires.
+        self.expiry_index = None
+        for index, layer in enumerate(self.layers):
+            if layer.expiry:
+                if self.expiry_index is not None:
+                    raise ConfigError('only one layer can be the expiry')
+                self.expiry_index = index
+        
+        # Tables from another config would give the wrong positions.
+        self.position_tables = {}
+        
         # Make sure the secret is long enough for layers.
         if len(self.layers) > len(self.secret_key):
             err = "secret key length cannot be less than number of layers"
             raise ConfigError(err)
+        
+        # Pick the splice backend for this shape of token.
+        backend = config.get('splice_backend', 'auto')
+        if backend not in BACKENDS:
+            raise ConfigError('splice backend must be one of %s'
+                    % ', '.join(BACKENDS))
+        if backend == 'calibrate':
+            self.calibrate_splice()
+        else:
+            self.choose_splice(backend)
+    
+    
+    def __setattr__(self, name, value):
+        """Refuse changes once the token is frozen."""
+        if getattr(self, 'frozen', False):
+            raise AttributeError('frozen Token is immutable')
+        super(Token, self).__setattr__(name, value)
+    
+    
+    def freeze(self):
+        """Stop this token's config from ever changing.
+        
+        Encoding and decoding never change a Token, so a frozen one
+        can be shared by every caller with the same config. The config
+        dict is copied, so later changes to the caller's dict don't
+        leak in either.
+        
+        Returns:
+            Token: this token.
+        
+        """
+        if not self.frozen:
+            self.config = copy.deepcopy(self.config)
+            self.layers = tuple(self.layers)
+            self.frozen = True
+        return self
     
     
-    def encode(self, *args):
+    def compile(self):
+        """Get encode and decode functions specialized to this config.
+        
+        The layer list is worked through once, up front, into Python
+        source with every layer unrolled and every position that
+        doesn't depend on a token's own seed written in as a constant.
+        The source is compiled once per config and cached.
+        
+        Returns:
+            CompiledToken: holds encode(*args, seeds=None) and
+                decode(token, data_type=None, revocations=None,
+                now=None, status=False, url_safe=None), which work like
+                the Token's own, and the
+                generated source.
+        
+        """
+        return compile_token(self)
+    
+    
+    def encode(self, *args, seeds=None):
         """Make the public token based on the input values.
         
         If arguments are supplied with this method, then they will
         override any current settings on the object.
         
+        Args:
+            *args: An optional private token, then a value per layer.
+            seeds (Optional[list]): Seed values to use instead of random
+                ones, one per layer with seed bits. Along with a private
+                token, this makes the public token reproducible.
+        
         Returns:
             BitCollection: public token.
         
         Raises:
             ConfigError: number of args doesn't match number of layers.
+            ValueError: seeds don't match the seeded layers.
+        
+        """
+        stored_token, args = self.split_args(args)
+        
+        # Start the new public token (the stored token may be frozen).
+        public_token = BitCollection(copy.deepcopy(stored_token.content))
+        
+        # Are there any layers?
+        if not self.layers:
+            return TokenResult(
+                    public_token=public_token,
+                    private_token=stored_token)
+        
+        # All spliced - return results.
+        public_token.content = self.splice_layers(
+                public_token.content, args, seeds=seeds)
+        return TokenResult(
+                public_token=public_token,
+                private_token=stored_token,
+                layers=list(args))
+    
+    
+    def encode_to(self, fmt, *args, seeds=None, out=None):
+        """Make a public token straight into its encoded form.
+        
+        Takes the same args as encode, but skips the TokenResult and
+        the BitCollections along the way: layer values are spliced into
+        a single bitarray, which is encoded in one go.
+        
+        Args:
+            fmt (str): 'base32', 'base58', 'base64', 'base85', 'bytes',
+                or 'hex'.
+            *args: An optional private token, then a value per layer.
+            seeds (Optional[list]): As with encode.
+            out (Optional[bytearray]): Buffer to write the encoded token
+                into, from the start, instead of returning it. It's
+                encoded a chunk at a time, straight into the buffer,
+                except for base58, which is encoded whole and copied.
+                encoded_length(fmt) bytes is always enough.
+        
+        Returns:
+            str: the encoded public token (bytes for 'bytes'), or the
+                number of bytes written, if out was given.
+        
+        Raises:
+            ConfigError: number of args doesn't match number of layers.
+            ValueError: invalid fmt, seeds don't match the seeded layers,
+                or the token doesn't fit in out.
+        
+        """
+        if fmt not in self.ENCODINGS:
+            raise ValueError('invalid data_type')
+        stored_token, args = self.split_args(args)
+        content = bitarray(stored_token.content)
+        if self.layers:
+            content = self.splice_layers(content, args, seeds=seeds)
+        if out is not None:
+            return bitarray_to_ascii_into(content, fmt, out)
+        encoded = bitarray_to_ascii(content, fmt)
+        if fmt == 'bytes':
+            return encoded
+        return encoded.decode('ascii')
+    
+    
+    def encode_many(self, rows, data_type=None, seeds=None, engine='auto'):
+        """Encode a batch of tokens.
+        
+        With NumPy, every token's bits go into one matrix, and tokens
+        with the same seeds are spliced together with a single gather.
+        Without it, with engine='scalar', or when a seed is over 64
+        bits, each token is encoded in turn.
+        
+        Args:
+            rows (list): encode's args for each token.
+            data_type (Optional[str]): If given, return the public tokens
+                encoded, as with encode_to, instead of TokenResults.
+            seeds (Optional[list]): A list of seeds for each token, as
+                with encode.
+            engine (Optional[str]): 'auto', 'scalar', or 'numpy'.
+        
+        Returns:
+            list: a TokenResult (or encoded public token) per row.
+        
+        Raises:
+            ConfigError: number of args doesn't match number of layers.
+            ImportError: engine is 'numpy', but NumPy isn't installed.
+            ValueError: invalid data_type or engine, or seeds don't
+                match the seeded layers.
+        
+        """
+        rows = list(rows)
+        if data_type is not None and data_type not in self.ENCODINGS:
+            raise ValueError('invalid data_type')
+        if seeds is not None and len(seeds) != len(rows):
+            raise ValueError('seeds must be given for every row')
+        numpy = load_engine(engine, self)
+        if numpy is None or not rows:
+            if data_type is not None:
+                return [self.encode_to(data_type, *row,
+                        seeds=None if seeds is None else seeds[i])
+                        for i, row in enumerate(rows)]
+            return [self.encode(*row, seeds=None if seeds is None else seeds[i])
+                    for i, row in enumerate(rows)]
+        
+        split = [self.split_args(tuple(row)) for row in rows]
+        contents = encode_batch(
+                numpy, self, [stored for stored, args in split],
+                [args for stored, args in split], seeds=seeds)
+        if data_type == 'base64':
+            return bitarrays_to_base64(contents)
+        if data_type == 'hex':
+            return bitarrays_to_hex(contents)
+        if data_type is not None:
+            encoded = [bitarray_to_ascii(content, data_type)
+                    for content in contents]
+            if data_type == 'bytes':
+                return encoded
+            return [b.decode('ascii') for b in encoded]
+        return [TokenResult(
+                public_token=BitCollection(content),
+                private_token=stored,
+                layers=list(args) if self.layers else None)
+                for content, (stored, args) in zip(contents, split)]
+    
+    
+    def split_args(self, args):
+        """Split the private token off the front of encode's args.
+        
+        Returns:
+            tuple: the private token (random, if not given) and a value
+                per layer.
+        
+        Raises:
+            ConfigError: number of args doesn't match number of layers.
+            ValueError: the private token isn't valid.
         
         """
         # Ensure the input matches
@@ -339,15 +883,26 @@ class Token:
                 stored_token = BitCollection.from_random(self.private_token_bits)
             else:
                 stored_token = BitCollection()
+        return stored_token, args
+    
+    
+    def splice_layers(self, content, args, seeds=None):
+        """Splice every layer's value (and seed) into a private token.
         
-        # Start the new public token.
-        public_token = copy.deepcopy(stored_token)
+        Args:
+            content (bitarray): The private token's bits, which may be
+                changed in place.
+            args (tuple): A value per layer.
+            seeds (Optional[list]): As with encode.
         
-        # Are there any layers?
-        if not self.layers:
-            return TokenResult(
-                    public_token=public_token,
-                    private_token=stored_token)
+        Returns:
+            bitarray: the public token's bits.
+        
+        Raises:
+            ValueError: seeds don't match the seeded layers.
+        
+        """
+        splicer = SPLICERS[self.splice_backend](content)
         
         # Decide on predictable seed positions up front
         seed_sources = []
@@ -357,8 +912,11 @@ class Token:
                 seed_sources.append(chunk)
             seed_sources = seed_sources[::-1]
         
+        # Fixed seeds are used up in layer order.
+        if seeds is not None:
+            seeds = list(seeds)[::-1]
+        
         # Go through each layer in order
-        stored_layers = []
         for index, layer in enumerate(self.layers):
             
             # Does this layer have positions?
@@ -375,22 +933,27 @@ class Token:
                     seed_bits = self.seed_bits
                 if seed_bits:
                     layer_seed_seed = layer_seed_value
-                    b = BitCollection.from_random(seed_bits)
-                    layer_seed_value = b.to_int()
+                    if seeds is None:
+                        b = BitCollection.from_random(seed_bits)
+                        layer_seed_value = b.to_int()
+                    elif not seeds:
+                        raise ValueError('not enough seeds for the layers')
+                    else:
+                        layer_seed_value = seeds.pop()
+                        if not 0 <= layer_seed_value < 2 ** seed_bits:
+                            err = 'seed must fit in %d bits' % seed_bits
+                            raise ValueError(err)
                     
                 # Generate the layer positions using the seed.
-                layer_positions = self.generate_bit_positions(
+                layer_positions = self.seeded_positions(
+                        index,
                         seed=layer_seed_value,
-                        max_position=public_token.length(),
+                        max_position=splicer.length(),
                         bits=layer.bits)
             
             # Sew in the new bits.
-            public_token.insert(
-                    layer.to_bitcollection(
-                            args[index]), positions=layer_positions)
-            
-            # Save the content.
-            stored_layers.append(args[index])
+            splicer.insert(
+                    layer.to_bitarray(args[index]), positions=layer_positions)
             
             # Was there an automatic seed?
             if layer_seed_seed:
@@ -398,21 +961,59 @@ class Token:
                 # Generate the seed positions.
                 seed_positions = self.generate_bit_positions(
                         seed=layer_seed_seed,
-                        max_position=public_token.length(),
+                        max_position=splicer.length(),
                         bits=seed_bits)
                 
                 # Sew in the seed bits.
-                public_token.insert_int(
-                        layer_seed_value, positions=seed_positions)
+                splicer.insert_int(layer_seed_value, positions=seed_positions)
         
-        # All spliced - return results.
-        return TokenResult(
-                public_token=public_token,
-                private_token=stored_token,
-                layers=stored_layers)
+        if seeds:
+            raise ValueError('more seeds than seeded layers')
+        return splicer.finish()
+    
+    
+    def mint_unique(self, count, *args, **kwargs):
+        """Mint a run of tokens with no repeats among them.
+        
+        Args:
+            count (int): Number of tokens to mint.
+            *args: Layer values for every token, as with encode.
+            **kwargs: values, unique, max_memory, and max_retries; see
+                UniqueMinter.
+        
+        Returns:
+            UniqueMinter: yields a TokenResult per token when iterated,
+                and reports collisions and retries with stats().
+        
+        """
+        return UniqueMinter(self, count, args=args, **kwargs)
+    
+    
+    def mint_shard(self, count, shard, shards, *args, **kwargs):
+        """Mint one shard of a run that's split across workers.
+        
+        Args:
+            count (int): Number of tokens in this shard.
+            shard (int): This shard's index, from 0 to shards - 1.
+            shards (int): Number of shards in the whole run.
+            *args: Layer values for every token, as with encode.
+            **kwargs: values, unique, max_memory, and max_retries; see
+                UniqueMinter.
+        
+        Returns:
+            ShardMinter: yields a TokenResult per token when iterated,
+                or writes them to a file with a manifest.
+        
+        Raises:
+            ValueError: shard is out of range, or the private token is
+                too short to hold it.
+        
+        """
+        return ShardMinter(self, count, shard, shards, args=args, **kwargs)
     
     
-    def decode(self, token, data_type=None, **kwargs):
+    def decode(self, token, data_type=None, revocations=None, now=None,
+            status=False, **kwargs):
         """Decode a token created by this class.
         
         For accurate decoding, it is essential that the input
@@ -422,17 +1023,156 @@ class Token:
         The main difference is the 'values' attribute will be updated
         with the decoded values from the token.
         
+        Args:
+            token (mixed): public token in a variety of possible types.
+            data_type (Optional[str]): How the token is encoded on a
+                data level. Optional if not string or if in config.
+            revocations (Optional[RevocationIndex]): Revoked private
+                tokens to check the token's against.
+            now (Optional[int|float|datetime]): If given, the expiry
+                layer is read first, and tokens that have expired by
+                now go no further.
+            status (Optional[bool]): If true, revoked and expired tokens
+                get a RevokedTokenResult or ExpiredTokenResult, instead
+                of None like any other token that doesn't decode.
+        
+        Returns:
+            If successful, TokenResult (or, with status, a
+            RevokedTokenResult or ExpiredTokenResult). Otherwise, None.
+        
+        Raises:
+            ConfigError: now is given, but no layer is the expiry.
+        
+        """
+        if now is not None:
+            if self.expiry_index is None:
+                raise ConfigError('no layer is the expiry')
+            token = self.parse_token(token, data_type=data_type, **kwargs)
+            if token is None:
+                return None
+            if self.expired(self.read_layer(token, self.expiry_index), now):
+                if not status:
+                    return None
+                return ExpiredTokenResult(public_token=token)
+            data_type = None
+        decoded = self.decode_bits(token, data_type=data_type, **kwargs)
+        if decoded is None:
+            return None
+        return self.decoded_result(
+                *decoded, revocations=revocations, status=status)
+    
+    
+    def decoded_result(self, public_token, stored_token, layer_values,
+            revocations=None, status=False):
+        """Convert a decoded token's layers into a TokenResult.
+        
+        Args:
+            public_token (BitCollection): The token as it was decoded.
+            stored_token (BitCollection): Its private token.
+            layer_values (list): A BitCollection for each layer.
+            revocations (Optional[RevocationIndex]): As with decode.
+            status (Optional[bool]): As with decode.
+        
+        Returns:
+            TokenResult, or None (or, with status, a RevokedTokenResult)
+            if the token is revoked.
+        
+        """
+        # Revoked tokens skip converting their layers.
+        if revocations is not None and stored_token in revocations:
+            if not status:
+                return None
+            return RevokedTokenResult(
+                    public_token=public_token,
+                    private_token=stored_token)
+        
+        # Are there layers?
+        if not self.layers:
+            return TokenResult(
+                    public_token=public_token,
+                    private_token=stored_token)
+        
+        # Store the values away as their original datatypes.
+        stored_layers = []
+        for layer, layer_value in zip(self.layers, layer_values):
+            stored_layers.append(layer.from_bitcollection(layer_value))
+        
+        # All done!
+        return TokenResult(
+                public_token=public_token,
+                private_token=stored_token,
+                layers=stored_layers)
+    
+    
+    def expires(self, layer_values):
+        """Get the expiry from a decoded token's layer BitCollections.
+        
+        Raises:
+            ConfigError: no layer is the expiry.
+        
+        """
+        if self.expiry_index is None:
+            raise ConfigError('no layer is the expiry')
+        layer = self.layers[self.expiry_index]
+        return layer.from_bitcollection(layer_values[self.expiry_index])
+    
+    
+    def expired(self, expires, now):
+        """Test whether an expiry has passed.
+        
+        Args:
+            expires (int): The expiry layer's value.
+            now (int|float|datetime): The time to test against.
+        
+        """
+        return expires <= to_unix_time(now)
+    
+    
+    def decode_bits(self, token, data_type=None, **kwargs):
+        """Decode a token without converting its layers.
+        
+        This is the first half of decode, which splits the public token
+        into its private token and layers, but leaves each layer as a
+        BitCollection instead of converting it to its data type.
+        
+        Args:
+            token (mixed): public token in a variety of possible types.
+            data_type (Optional[str]): How the token is encoded on a
+                data level. Optional if not string or if in config.
+        
+        Returns:
+            If successful, a tuple of the public token, private token,
+            and a list of the layers' BitCollections. Otherwise, None.
+        
+        """
+        public_token = self.parse_token(token, data_type=data_type, **kwargs)
+        if public_token is None:
+            return None
+        
+        # Setup the stored token (the public token may be frozen).
+        stored_token = BitCollection(copy.deepcopy(public_token.content))
+        
+        # Are there layers?
+        if not self.layers:
+            return public_token, stored_token, []
+        return public_token, stored_token, self.peel_layers(stored_token)
+    
+    
+    def parse_token(self, token, data_type=None, **kwargs):
+        """Turn a public token of any data type into a BitCollection.
+        
         Args:
             token (mixed): public token in a variety of possible types.
             data_type (Optional[str]): How the token is encoded on a
                 data level. Optional if not string or if in config.
         
         Returns:
-            If successful, dict. Otherwise, None.
+            If the token has the right number of bits, BitCollection.
+            Otherwise, None.
         
         """
         # Get data_type from somewhere else.
-        if not data_type:
+        if not data_type and not isinstance(token, BitCollection):
             data_type = self.config.get('public_token_type', None)
         
         # Start with the expected length.
@@ -454,6 +1194,23 @@ class Token:
                 return None
             bit_remainder = self.remainder_by_divisor(expected_length, 8)
         
+        # Decode from the denser string encodings.
+        elif data_type == 'base32':
+            try:
+                public_token = BitCollection.from_base32(token)
+            except ValueError:
+                return None
+            bit_remainder = self.remainder_by_divisor(expected_length, 5)
+        elif data_type in ['base58', 'base85']:
+            try:
+                if data_type == 'base58':
+                    public_token = BitCollection.from_base58(token)
+                else:
+                    public_token = BitCollection.from_base85(token)
+            except ValueError:
+                return None
+            bit_remainder = self.remainder_by_divisor(expected_length, 8)
+        
         # Decode from bytes.
         elif data_type == 'bytes':
             public_token = BitCollection.from_bytes(token)
@@ -482,16 +1239,20 @@ class Token:
         # Validate the token by its length.
         if expected_length != public_token.length():
             return None
+        return public_token
+    
+    
+    def peel_layers(self, stored_token):
+        """Extract every layer from a public token, last layer first.
         
-        # Setup the stored token.
-        stored_token = copy.deepcopy(public_token)
+        Args:
+            stored_token (BitCollection): public token, which is left
+                holding just the private token.
         
-        # Are there layers?
-        if not self.layers:
-            return TokenResult(
-                    public_token=public_token,
-                    private_token=stored_token)
+        Returns:
+            list: a BitCollection for each layer, in layer order.
         
+        """
         # Setup for peeling away layers.
         stored_layers = []
         seed_sources = []
@@ -501,7 +1262,9 @@ class Token:
                 seed_sources.append(chunk)
         
         # Start off with the layers!
-        for index, layer in enumerate(self.layers[::-1]):
+        splicer = SPLICERS[self.splice_backend](stored_token.content)
+        for index in range(len(self.layers) - 1, -1, -1):
+            layer = self.layers[index]
             
             # Does it have a seeded position?
             layer_seed_seed = None
@@ -517,34 +1280,265 @@ class Token:
                 if seed_bits:
                     seed_positions = self.generate_bit_positions(
                             seed=layer_seed_value,
-                            max_position=stored_token.length() - seed_bits,
+                            max_position=splicer.length() - seed_bits,
                             bits=seed_bits)
                     
                     # Extract in the seed bits.
-                    layer_seed_value = stored_token.extract_int(
-                            positions=seed_positions[::-1])
+                    layer_seed_value = splicer.extract_int(
+                            positions=seed_positions)
                 
                 # Generate the layer positions using the seed.
-                layer_positions = self.generate_bit_positions(
+                layer_positions = self.seeded_positions(
+                        index,
                         seed=layer_seed_value,
-                        max_position=stored_token.length() - layer.bits,
+                        max_position=splicer.length() - layer.bits,
                         bits=layer.bits)
                 
             # Get the layer value from the token based on format.
-            layer_value = stored_token.extract(
-                    positions=layer_positions[::-1])
-            
-            # Store the value away as its original datatype.
-            stored_layers.append(layer.from_bitcollection(layer_value))
+            stored_layers.append(BitCollection(
+                    splicer.extract(positions=layer_positions)))
+        stored_token.content = splicer.finish()
         
         # Reverse the stored_layers in order to match how layers are added.
-        stored_layers = stored_layers[::-1]
+        return stored_layers[::-1]
+    
+    
+    def decode_many(self, tokens, data_type=None, columnar=False,
+            revocations=None, now=None, status=False, engine='auto',
+            **kwargs):
+        """Decode a batch of tokens created by this class.
         
-        # All done!
-        return TokenResult(
-                public_token=public_token,
-                private_token=stored_token,
-                layers=stored_layers)
+        With NumPy, the tokens are peeled together on one bit matrix,
+        splitting them into groups by seed as each seed is read, so
+        each group's layers come out in a single gather. Without it,
+        with engine='scalar', or when a seed is over 64 bits, each token
+        is decoded in turn.
+        
+        Args:
+            tokens (iterable): public tokens, all of the same data type.
+            data_type (Optional[str]): How the tokens are encoded on a
+                data level. Optional if not string or if in config.
+            columnar (Optional[bool]): If true, collect the results
+                column by column instead of one TokenResult per token.
+            revocations (Optional[RevocationIndex]): Revoked private
+                tokens. In columns, revoked tokens are left invalid.
+            now (Optional[int|float|datetime]): As with decode. In
+                columns, expired tokens are left invalid.
+            status (Optional[bool]): As with decode.
+            engine (Optional[str]): 'auto', 'scalar', or 'numpy'.
+        
+        Returns:
+            If columnar, a TokenColumns. Otherwise, a list holding a
+            TokenResult or None for each token.
+        
+        Raises:
+            ImportError: engine is 'numpy', but NumPy isn't installed.
+        
+        """
+        numpy = load_engine(engine, self)
+        if numpy is not None:
+            return self.decode_matrix(
+                    numpy, list(tokens), data_type, columnar, revocations,
+                    now, status, **kwargs)
+        if not columnar:
+            results = []
+            for token in tokens:
+                results.append(self.decode(
+                        token, data_type=data_type, revocations=revocations,
+                        now=now, status=status, **kwargs))
+            return results
+        
+        # Every column is sized up front, so the tokens are needed too.
+        tokens = list(tokens)
+        columns = TokenColumns(self.layers, self.private_token_bits, len(tokens))
+        for i, token in enumerate(tokens):
+            decoded = self.decode_bits(token, data_type=data_type, **kwargs)
+            if decoded is None:
+                continue
+            if revocations is not None and decoded[1] in revocations:
+                continue
+            if now is not None and self.expired(
+                    self.expires(decoded[2]), now):
+                continue
+            columns.set_row(i, decoded[1], decoded[2])
+        return columns
+    
+    
+    def decode_matrix(self, numpy, tokens, data_type, columnar, revocations,
+            now, status, **kwargs):
+        """Decode a batch with NumPy, for decode_many."""
+        parsed = [self.parse_token(token, data_type=data_type, **kwargs)
+                for token in tokens]
+        valid = [i for i, public_token in enumerate(parsed)
+                if public_token is not None]
+        if columnar:
+            results = TokenColumns(
+                    self.layers, self.private_token_bits, len(tokens))
+        else:
+            results = [None] * len(tokens)
+        if not valid:
+            return results
+        
+        private, layers = peel_batch(
+                numpy, self, [parsed[i] for i in valid])
+        private = pack(numpy, private)
+        layers = [pack(numpy, layer) for layer in layers]
+        for row, i in enumerate(valid):
+            stored_token = BitCollection(private[row])
+            layer_values = [BitCollection(layer[row]) for layer in layers]
+            if now is not None and self.expired(
+                    self.expires(layer_values), now):
+                if status and not columnar:
+                    results[i] = ExpiredTokenResult(public_token=parsed[i])
+                continue
+            if columnar:
+                if revocations is None or stored_token not in revocations:
+                    results.set_row(i, stored_token, layer_values)
+            else:
+                results[i] = self.decoded_result(
+                        parsed[i], stored_token, layer_values,
+                        revocations=revocations, status=status)
+        return results
+    
+    
+    def layer_positions(self, token, index):
+        """Find where a layer's bits reside in a finished public token.
+        
+        Layers spliced after the requested one shift its bits around,
+        so their seeds are read out of the token (without decoding
+        their values) to follow each bit to its final position. Only
+        the positions of the layer's bits and of the seeds are tracked,
+        through the sorted positions each later insert took, so the
+        cost grows with the bits of this layer and the ones after it,
+        not with the length of the token.
+        
+        Args:
+            token (BitCollection): public token made by this class.
+            index (int): Which layer to locate.
+        
+        Returns:
+            list: positions in the public token, in the layer's bit
+                order.
+        
+        """
+        # How long the token was before each layer went in.
+        lengths = []
+        length = self.private_token_bits
+        for layer in self.layers:
+            lengths.append(length)
+            length += layer.bits
+            if not layer.positions:
+                seed_bits = layer.seed_bits
+                if seed_bits is None:
+                    seed_bits = self.seed_bits
+                length += seed_bits or 0
+        
+        # Seeds are handed out to layers in order.
+        seed_sources = []
+        need_seeds = self.needed_seeds()
+        if need_seeds > 0:
+            for chunk in self.secret_key_collection.chunk(need_seeds):
+                seed_sources.append(chunk)
+        
+        # Where each later insert's bits ended up, nearest first.
+        steps = []
+        
+        def follow(position):
+            for taken in steps:
+                position = free_slot(position, taken)
+            return position
+        
+        # Work back from the last layer to this one.
+        for layer_index in range(len(self.layers) - 1, index - 1, -1):
+            layer = self.layers[layer_index]
+            layer_positions = layer.positions
+            if not layer_positions:
+                
+                # Read the seed straight out of the token.
+                layer_seed_value = seed_sources.pop()
+                seed_bits = layer.seed_bits
+                if seed_bits is None:
+                    seed_bits = self.seed_bits
+                if seed_bits:
+                    seed_positions = place_inserts(self.generate_bit_positions(
+                            seed=layer_seed_value,
+                            max_position=lengths[layer_index] + layer.bits,
+                            bits=seed_bits))
+                    layer_seed_value = 0
+                    for j, position in enumerate(seed_positions):
+                        bit = token.content[follow(position)]
+                        layer_seed_value |= bit << j
+                    steps.insert(0, sorted(seed_positions))
+                
+                # Generate the layer positions using the seed.
+                layer_positions = self.seeded_positions(
+                        layer_index,
+                        seed=layer_seed_value,
+                        max_position=lengths[layer_index],
+                        bits=layer.bits)
+            
+            placed = place_inserts(layer_positions)
+            if layer_index > index:
+                steps.insert(0, sorted(placed))
+        
+        # The last layer placed is the one requested.
+        return [follow(position) for position in placed]
+    
+    
+    def read_layer(self, token, index):
+        """Read a single layer's value without decoding the whole token.
+        
+        Args:
+            token (BitCollection): public token made by this class.
+            index (int): Which layer to read.
+        
+        Returns:
+            mixed: the layer's value in its data type.
+        
+        """
+        bits = bitarray()
+        for position in self.layer_positions(token, index):
+            bits.append(token.content[position])
+        return self.layers[index].from_bitcollection(BitCollection(bits))
+    
+    
+    def update_layer(self, token, index, value):
+        """Rewrite a single layer's value inside a public token.
+        
+        The private token, the other layers, and every seed are left
+        untouched, so only the layer's own bits are overwritten.
+        
+        Args:
+            token (BitCollection): public token made by this class.
+                It's modified in place, so it can't be frozen.
+            index (int): Which layer to rewrite.
+            value (mixed): New value in the layer's data type.
+        
+        Returns:
+            BitCollection: the updated public token.
+        
+        Raises:
+            TypeError: token is a FrozenBitCollection.
+            ValueError: token or value doesn't fit the config.
+        
+        """
+        if isinstance(token, FrozenBitCollection):
+            raise TypeError('FrozenBitCollection is immutable')
+        if not isinstance(token, BitCollection):
+            raise ValueError('token must be a BitCollection')
+        if token.length() != self.public_token_bit_length():
+            raise ValueError('token has incorrect number of bits')
+        if not 0 <= index < len(self.layers):
+            raise ValueError('layer index out of range')
+        
+        # Convert first so bad values leave the token alone.
+        bits = self.layers[index].to_bitcollection(value).content
+        
+        # Overwrite the bits where they sit.
+        positions = self.layer_positions(token, index)
+        for j, position in enumerate(positions):
+            token.content[position] = bits[j]
+        return token
     
     
     def hash_seed(self, seed):
@@ -615,6 +1609,180 @@ class Token:
         return total_bits
         
     
+    def encoded_length(self, data_type):
+        """Length of this config's public tokens in a given encoding.
+        
+        Args:
+            data_type (str): 'base32', 'base58', 'base64', 'base85',
+                'bytes', or 'hex'.
+        
+        Returns:
+            int: characters (or bytes) produced by the matching
+                BitCollection.to_* method. For base58, whose length
+                varies, this is the longest possible.
+        
+        """
+        if data_type not in self.ENCODINGS:
+            raise ValueError('invalid data_type')
+        
+        # All 1 bits make for the longest base58 number.
+        bits = bitarray(self.public_token_bit_length())
+        bits.setall(True)
+        return len(getattr(BitCollection(bits), 'to_' + data_type)())
+    
+    
+    def explain(self, measure=100):
+        """Break down what this config costs for each token.
+        
+        Every layer is spliced into a token that has grown by all the
+        layers before it. Layers with explicit positions cost nothing
+        to place. Seeded layers run a pseudo-random generator for their
+        positions (unless a position table covers them) and, with seed
+        bits, another for the seed's own positions.
+        
+        Args:
+            measure (Optional[int]): Round trips to time for a measured
+                estimate. 0 skips measuring.
+        
+        Returns:
+            dict: 'private_token_bits', 'public_token_bits',
+                'encoded_lengths' by data type, 'generators' (per
+                encode, the same per decode), 'table_bytes' for all
+                tableable layers, 'splice' (see splice_choice),
+                'layers' (a dict per layer), and
+                'encode_us' and 'decode_us' if measured.
+        
+        """
+        layers = []
+        length = self.private_token_bits
+        for index, layer in enumerate(self.layers):
+            info = {
+                'index': index,
+                'name': layer.name,
+                'type': layer.type,
+                'bits': layer.bits,
+                'spliced_into': length,
+                'seed_bits': 0,
+                'positions': 'explicit',
+                'generators': 0,
+                'table_bytes': None,
+                'tabled': False,
+            }
+            if not layer.positions:
+                seed_bits = layer.seed_bits
+                if seed_bits is None:
+                    seed_bits = self.seed_bits
+                info['seed_bits'] = seed_bits
+                info['positions'] = 'seeded' if seed_bits else 'secret'
+                info['tabled'] = index in self.position_tables
+                info['generators'] = (0 if info['tabled'] else 1) + (
+                        1 if seed_bits else 0)
+                
+                # Tables hold every seed's positions, as uint16 or uint32.
+                if seed_bits and seed_bits <= 16:
+                    itemsize = 2 if length + layer.bits <= 0xFFFF else 4
+                    info['table_bytes'] = (
+                            2 ** seed_bits * layer.bits * itemsize)
+            info['spliced'] = layer.bits + info['seed_bits']
+            length += info['spliced']
+            layers.append(info)
+        
+        explanation = {
+            'private_token_bits': self.private_token_bits,
+            'public_token_bits': self.public_token_bit_length(),
+            'encoded_lengths': dict((data_type, self.encoded_length(data_type))
+                    for data_type in self.ENCODINGS),
+            'generators': sum(info['generators'] for info in layers),
+            'table_bytes': sum(info['table_bytes'] or 0 for info in layers),
+            'splice': dict(self.splice_choice),
+            'layers': layers,
+        }
+        if measure:
+            explanation.update(self.measure(measure))
+        return explanation
+    
+    
+    def measure(self, number=100):
+        """Time encoding and decoding random values.
+        
+        Returns:
+            dict: 'encode_us' and 'decode_us', the mean microseconds
+                per token.
+        
+        """
+        from .loadtest import random_value
+        rnd = random.Random(0)
+        values = [[random_value(rnd, layer) for layer in self.layers]
+                for i in range(number)]
+        start = time.perf_counter()
+        public_tokens = [self.encode(*args).public_token for args in values]
+        encoded = time.perf_counter()
+        for public_token in public_tokens:
+            self.decode(public_token)
+        decoded = time.perf_counter()
+        return {
+            'encode_us': (encoded - start) / number * 1e6,
+            'decode_us': (decoded - encoded) / number * 1e6,
+        }
+    
+    
+    def choose_splice(self, backend='auto'):
+        """Pick how bits get spliced into and out of tokens.
+        
+        Bit-by-bit bitarray inserts are cheapest for short tokens, but
+        every bit moves all the bits after it. Moving a list of indexes
+        instead and gathering the bits once wins as tokens grow. A cost
+        model ranks the backends by this config's shape.
+        
+        Args:
+            backend (Optional[str]): 'auto' for the cost model, or a
+                backend in splice.SPLICERS to use it regardless.
+        
+        Returns:
+            str: the backend picked.
+        
+        """
+        estimates = estimate(self)
+        if backend == 'auto':
+            chosen = min(sorted(estimates), key=estimates.get)
+            reason = 'predicted cheapest'
+        else:
+            chosen = backend
+            reason = 'set by config'
+        self.splice_backend = chosen
+        self.splice_choice = {
+            'backend': chosen,
+            'reason': reason,
+            'estimates': estimates,
+        }
+        return chosen
+    
+    
+    def calibrate_splice(self, number=20):
+        """Pick the splice backend by timing each on this config.
+        
+        Takes a few milliseconds for most configs, and longer for long
+        tokens, so it's best done once at startup.
+        
+        Args:
+            number (Optional[int]): Round trips to time per backend.
+        
+        Returns:
+            str: the backend picked.
+        
+        """
+        timings = calibrate(self, number=number)
+        chosen = min(sorted(timings), key=timings.get)
+        self.splice_backend = chosen
+        self.splice_choice = {
+            'backend': chosen,
+            'reason': 'measured fastest',
+            'estimates': estimate(self),
+            'timings': timings,
+        }
+        return chosen
+    
+    
     @staticmethod
     def remainder_by_divisor(expected, divisor):
         """Shortcut to get the remainder from the expected length.
@@ -640,6 +1808,74 @@ class Token:
         return 0
     
     
+    def seeded_positions(self, index, seed, max_position, bits):
+        """Get a layer's positions, from a position table if possible.
+        
+        Args:
+            index (int): Which layer the positions are for.
+            seed (int): The layer's seed.
+            max_position (int): Highest allowed position to generate.
+            bits (int): Number of positions needed for this operation.
+        
+        Returns:
+            list: the same positions as generate_bit_positions.
+        
+        """
+        table = self.position_tables.get(index, None)
+        if table is not None and seed < table.seeds:
+            return table.positions(seed)
+        return self.generate_bit_positions(
+                seed=seed, max_position=max_position, bits=bits)
+    
+    
+    def fingerprint(self):
+        """Hash everything in this config that affects its tokens.
+        
+        Returns:
+            str: hexadecimal SHA-256 digest.
+        
+        """
+        return config_fingerprint(self.config, self.secret_key)
+    
+    
+    def build_position_table(self, path, max_seed_bits=16):
+        """Write a file of every seeded layer's positions for every seed.
+        
+        Layers whose positions come from a seed of at most
+        max_seed_bits bits have so few possible seeds that all of their
+        positions can be generated ahead of time. The table is tagged
+        with this config's fingerprint, so it's only ever loaded by a
+        matching config.
+        
+        Args:
+            path (str): Where to write the table file.
+            max_seed_bits (Optional[int]): Largest seed to build for.
+        
+        Returns:
+            int: number of layers in the table.
+        
+        """
+        tables = build_position_tables(self, max_seed_bits=max_seed_bits)
+        write_position_tables(path, self.fingerprint(), tables)
+        return len(tables)
+    
+    
+    def load_position_table(self, path):
+        """Use a table file from build_position_table for positions.
+        
+        The file is memory-mapped read-only, so every process that
+        loads it (or forks after loading it) shares one copy.
+        
+        Args:
+            path (str): The table file.
+        
+        Raises:
+            ConfigError: the table was built for another config.
+        
+        """
+        self.position_tables = load_position_tables(path, self.fingerprint())
+    
+    
     def generate_bit_positions(self, seed, max_position, bits):
         """
         Generates an ordered list of integer positions based on the
@@ -655,8 +1891,11 @@ class Token:
                 the public token for bits to reside.
         
         """
-        # Seed the randomness according to the seed
-        r = MT19937(self.hash_seed(seed))
+        # Seed this thread's generator according to the seed
+        r = getattr(scratch, 'random', None)
+        if r is None:
+            r = scratch.random = MT19937(0)
+        r.seed(self.hash_seed(seed))
         
         # Start generating
         positions = []
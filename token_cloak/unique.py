@@ -0,0 +1,230 @@
+from bitarray import bitarray
+
+
+class FixedWidthSet:
+    """An exact set of same-length byte strings in one flat buffer.
+    
+    Keys are kept in an open-addressing hash table with linear probing,
+    so each takes its own width in bytes plus some empty slots, rather
+    than a Python object apiece.
+    """
+    
+    LOAD = 0.7
+    """Most of the slots that may be used before the table doubles."""
+    
+    def __init__(self, width, capacity=1024):
+        """Allocate an empty table.
+        
+        Args:
+            width (int): Bytes in each key.
+            capacity (Optional[int]): Keys to make room for up front.
+        
+        """
+        self.width = width
+        self.count = 0
+        self.allocate(capacity)
+    
+    
+    def __len__(self):
+        """Number of keys in the set."""
+        return self.count
+    
+    
+    def __contains__(self, key):
+        """Test whether a key is in the set."""
+        return self.find(key)[1]
+    
+    
+    def allocate(self, capacity):
+        """Replace the table with an empty one for capacity keys."""
+        slots = 8
+        while slots * self.LOAD < capacity:
+            slots *= 2
+        self.mask = slots - 1
+        self.data = bytearray(slots * self.width)
+        self.used = bitarray(slots)
+        self.used.setall(False)
+    
+    
+    def memory(self):
+        """Bytes held by the table."""
+        return len(self.data) + (len(self.used) + 7) // 8
+    
+    
+    def find(self, key):
+        """Find a key's slot.
+        
+        Returns:
+            tuple: the slot holding the key (or the empty slot where it
+                would go), and whether it's there.
+        
+        """
+        width = self.width
+        data = self.data
+        used = self.used
+        slot = hash(key) & self.mask
+        while used[slot]:
+            start = slot * width
+            if data[start:start + width] == key:
+                return slot, True
+            slot = (slot + 1) & self.mask
+        return slot, False
+    
+    
+    def add(self, key):
+        """Add a key to the set.
+        
+        Returns:
+            bool: whether the key was already in the set.
+        
+        Raises:
+            ValueError: the key is the wrong length.
+        
+        """
+        if len(key) != self.width:
+            raise ValueError('key must be %d bytes' % self.width)
+        slot, found = self.find(key)
+        if found:
+            return True
+        start = slot * self.width
+        self.data[start:start + self.width] = key
+        self.used[slot] = True
+        self.count += 1
+        if self.count > len(self.used) * self.LOAD:
+            self.rehash()
+        return False
+    
+    
+    def rehash(self):
+        """Double the table and put every key back in."""
+        width = self.width
+        data = self.data
+        used = self.used
+        self.allocate(len(used))
+        for slot in used.itersearch(bitarray('1')):
+            key = bytes(data[slot * width:(slot + 1) * width])
+            new_slot = self.find(key)[0]
+            self.data[new_slot * width:(new_slot + 1) * width] = key
+            self.used[new_slot] = True
+
+
+class UniqueMinter:
+    """Mints tokens that are guaranteed to be unique within a run.
+    
+    Every minted token's private (or public) bits are checked against
+    a FixedWidthSet of every token so far, which answers exactly in
+    a probe or two. Real repeats are thrown away and minted again.
+    
+    Here is a sample usage:
+        >>> minter = token.mint_unique(10000000)
+        >>> for result in minter:
+        ...     save(result.public_token)
+        >>> minter.stats()['collisions']
+        0
+    
+    """
+    
+    def __init__(self, token, count, args=(), values=None, unique='private',
+            max_memory=None, max_retries=100, private_tokens=None):
+        """Set up a run of minting.
+        
+        Args:
+            token (Token): The config to mint with.
+            count (int): Number of unique tokens to mint.
+            args (Optional[tuple]): Layer values for every token.
+            values (Optional[callable]): Takes a token's number in the
+                run and returns its layer values, instead of args.
+            unique (Optional[str]): 'private' or 'public' tokens.
+            max_memory (Optional[int]): Most bytes for the exact set.
+            max_retries (Optional[int]): Most repeats in a row before
+                giving up, which only happens when tokens are too
+                short for the run.
+            private_tokens (Optional[callable]): Makes a new private
+                token for every attempt, instead of a random one.
+        
+        Raises:
+            ValueError: unique isn't 'private' or 'public'.
+        
+        """
+        if unique not in ['private', 'public']:
+            raise ValueError('unique must be private or public')
+        self.token = token
+        self.count = count
+        self.args = tuple(args)
+        self.values = values
+        self.unique = unique
+        self.max_memory = max_memory
+        self.max_retries = max_retries
+        self.private_tokens = private_tokens
+        self.exact = None
+        
+        # Metrics.
+        self.minted = 0
+        self.collisions = 0
+        self.retries = 0
+    
+    
+    def __iter__(self):
+        """Mint the tokens, one TokenResult at a time.
+        
+        Raises:
+            MemoryError: the run won't fit in max_memory.
+            ValueError: max_retries repeats were minted in a row.
+        
+        """
+        token = self.token
+        capacity = max(self.count, 1)
+        for i in range(self.count):
+            args = self.values(i) if self.values else self.args
+            for attempt in range(self.max_retries + 1):
+                if self.private_tokens:
+                    result = token.encode(self.private_tokens(), *args)
+                else:
+                    result = token.encode(*args)
+                if self.unique == 'private':
+                    key = result.private_token.content.tobytes()
+                else:
+                    key = result.public_token.content.tobytes()
+                if self.exact is None:
+                    self.exact = FixedWidthSet(len(key), capacity=capacity)
+                    self.check_memory()
+                if self.exact.add(key):
+                    self.collisions += 1
+                    self.retries += 1
+                    continue
+                self.check_memory()
+                self.minted += 1
+                yield result
+                break
+            else:
+                err = 'no unique token after %d retries' % self.max_retries
+                raise ValueError(err)
+    
+    
+    def check_memory(self):
+        """Make sure the run is still under its memory ceiling."""
+        if self.max_memory is not None and self.memory() > self.max_memory:
+            raise MemoryError('minting would exceed its memory ceiling')
+    
+    
+    def memory(self):
+        """Bytes held by the exact set."""
+        if self.exact is None:
+            return 0
+        return self.exact.memory()
+    
+    
+    def stats(self):
+        """Report on the run so far.
+        
+        Returns:
+            dict: minted, collisions (repeats), retries, and memory in
+                bytes.
+        
+        """
+        return {
+            'minted': self.minted,
+            'collisions': self.collisions,
+            'retries': self.retries,
+            'memory': self.memory(),
+        }
@@ -1,6 +1,42 @@
 import base64
 import binascii
 from bitarray import bitarray
+import datetime
+import hashlib
+import json
+
+
+BASE32_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+"""Crockford's base32 alphabet, which skips I, L, O, and U."""
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+"""Bitcoin's base58 alphabet, which skips 0, O, I, and l."""
+
+# Base32 is translated to and from the RFC 4648 alphabet.
+_RFC4648_BASE32 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ234567'
+_BASE32_ENCODE = str.maketrans(_RFC4648_BASE32, BASE32_ALPHABET)
+_BASE32_ENCODE_BYTES = bytes.maketrans(
+        _RFC4648_BASE32.encode('ascii'), BASE32_ALPHABET.encode('ascii'))
+_BASE32_DECODE = str.maketrans(
+        BASE32_ALPHABET + BASE32_ALPHABET.lower() + 'OoIiLl' + 'Uu=',
+        _RFC4648_BASE32 * 2 + 'AABBBB' + '!!!',
+        '-')
+
+# Base58 is handled two characters (58**2 values) at a time.
+_BASE58_PAIRS = []
+_BASE58_PAIR_VALUES = {}
+for _i, _c in enumerate(BASE58_ALPHABET):
+    for _j, _d in enumerate(BASE58_ALPHABET):
+        _BASE58_PAIRS.append(_c + _d)
+        _BASE58_PAIR_VALUES[_c + _d] = _i * 58 + _j
+_BASE58_VALUES = dict((_c, _i) for _i, _c in enumerate(BASE58_ALPHABET))
+
+# Base64 is checked before it's decoded in bulk, since a2b_base64 skips
+# characters it doesn't know, which would shift every token after them.
+_BASE64_ALPHABET = (b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+        b'0123456789+/')
+_BASE64_URL_SAFE = str.maketrans('-_', '+/')
+_BASE64_TO_URL_SAFE = str.maketrans('+/', '-_')
 
 
 def bitarray_to_base64(b, url_safe=False):
@@ -22,13 +58,208 @@ def bitarray_to_base64(b, url_safe=False):
     return string
 
 
+def bitarrays_to_base64(bs, url_safe=False):
+    """Convert many bitarrays to base64 strings.
+    
+    When every bitarray is the same length and that's a multiple of 24
+    bits, each one is exactly 4 characters per 3 bytes, so they're all
+    encoded in a single call and split apart. Otherwise, each is
+    encoded on its own.
+    
+    Returns:
+        list: the same strings as bitarray_to_base64 gives.
+    
+    """
+    lengths = set(len(b) for b in bs)
+    if len(lengths) != 1 or lengths == set([0]) or min(lengths) % 24:
+        return [bitarray_to_base64(b, url_safe=url_safe) for b in bs]
+    s = binascii.b2a_base64(
+            b''.join(b.tobytes() for b in bs))[:-1].decode('ascii')
+    if url_safe:
+        s = s.translate(_BASE64_TO_URL_SAFE)
+    width = min(lengths) // 6
+    padding = '=' * ((3 - width % 3) % 3)
+    return [s[i:i + width] + padding for i in range(0, len(s), width)]
+
+
+def bitarrays_to_hex(bs):
+    """Convert many bitarrays to hexadecimal strings.
+    
+    Bitarrays of the same whole number of bytes are encoded in a single
+    call and split apart. Otherwise, each is encoded on its own.
+    
+    Returns:
+        list: the same strings as bitarray_to_hex gives.
+    
+    """
+    lengths = set(len(b) for b in bs)
+    if len(lengths) != 1 or lengths == set([0]) or min(lengths) % 8:
+        return [bitarray_to_hex(b) for b in bs]
+    s = binascii.hexlify(b''.join(b.tobytes() for b in bs)).decode('ascii')
+    width = min(lengths) // 4
+    return [s[i:i + width] for i in range(0, len(s), width)]
+
+
+def bitarray_to_ascii(b, data_type):
+    """Convert a bitarray straight to the bytes of an encoded string.
+    
+    Gives the same characters as the matching bitarray_to_* function,
+    but as ASCII bytes, without going through str.
+    
+    Args:
+        data_type (str): 'base32', 'base58', 'base64', 'base85',
+            'bytes', or 'hex'. Bytes are returned as they are.
+    
+    Returns:
+        bytes: the encoded string.
+    
+    """
+    bytes_ = b.tobytes()
+    if data_type == 'bytes':
+        return bytes_
+    if data_type == 'base64':
+        s = binascii.b2a_base64(bytes_)[:-1]
+        mod = len(s) % 3
+        if mod:
+            s += b'=' * (3 - mod)
+        return s
+    if data_type == 'hex':
+        return binascii.hexlify(bytes_)[:(len(b) + 3) // 4]
+    if data_type == 'base32':
+        s = base64.b32encode(bytes_)[:(len(b) + 4) // 5]
+        return s.translate(_BASE32_ENCODE_BYTES)
+    if data_type == 'base85':
+        return base64.b85encode(bytes_)
+    if data_type == 'base58':
+        return bitarray_to_base58(b).encode('ascii')
+    raise ValueError('invalid data_type')
+
+
+_ASCII_CHUNK = 240
+"""Bytes encoded at a time by bitarray_to_ascii_into. It's a multiple of
+the group sizes of base32 (5), base64 (3), and base85 (4), so chunks
+encode the same as the whole."""
+
+
+def bitarray_to_ascii_into(b, data_type, out):
+    """Encode a bitarray straight into a buffer.
+    
+    Gives the same characters as bitarray_to_ascii, but the bits are
+    read through a memoryview and encoded a chunk at a time into out,
+    so the whole encoded string never exists on its own. Base58 can't
+    be split into chunks, so it's encoded in full and then copied.
+    
+    Args:
+        data_type (str): 'base32', 'base58', 'base64', 'base85',
+            'bytes', or 'hex'.
+        out (bytearray): Buffer to write into, from the start.
+    
+    Returns:
+        int: the number of bytes written.
+    
+    Raises:
+        ValueError: invalid data_type, or out is too small.
+    
+    """
+    bits = len(b)
+    size = (bits + 7) // 8
+    if data_type == 'base58':
+        encoded = bitarray_to_base58(b).encode('ascii')
+        length = len(encoded)
+    elif data_type == 'bytes':
+        length = size
+    elif data_type == 'hex':
+        length = (bits + 3) // 4
+    elif data_type == 'base32':
+        length = (bits + 4) // 5
+    elif data_type == 'base64':
+        length = 4 * ((size + 2) // 3)
+        length += -length % 3
+    elif data_type == 'base85':
+        length = 5 * (size // 4) + (size % 4 + 1 if size % 4 else 0)
+    else:
+        raise ValueError('invalid data_type')
+    if len(out) < length:
+        raise ValueError('out must hold at least %d bytes' % length)
+    view = memoryview(out)
+    if data_type == 'base58':
+        view[:length] = encoded
+        return length
+    
+    # Pad bits in the buffer aren't cleared, so the last byte is copied.
+    source = memoryview(b)[:size]
+    last = b[(size - 1) * 8:].tobytes() if bits % 8 else None
+    written = 0
+    for start in range(0, size, _ASCII_CHUNK):
+        chunk = source[start:start + _ASCII_CHUNK]
+        if last is not None and start + len(chunk) == size:
+            chunk = bytes(chunk[:-1]) + last
+        if data_type == 'bytes':
+            encoded = chunk
+        elif data_type == 'hex':
+            encoded = binascii.hexlify(chunk)
+        elif data_type == 'base32':
+            encoded = base64.b32encode(chunk).translate(
+                    _BASE32_ENCODE_BYTES)
+        elif data_type == 'base64':
+            encoded = binascii.b2a_base64(chunk)[:-1]
+        else:
+            encoded = base64.b85encode(chunk)
+        count = min(len(encoded), length - written)
+        view[written:written + count] = encoded[:count]
+        written += count
+    
+    # Base64 is padded out to a multiple of 3, as in bitarray_to_base64.
+    view[written:length] = b'=' * (length - written)
+    return length
+
+
+def bitarray_to_base32(b):
+    """Convert a bitarray to a Crockford base32 string.
+    
+    The bits are right-padded with 0 bits to a multiple of 5.
+    
+    """
+    # Characters past the last bit only encode byte padding.
+    length = (len(b) + 4) // 5
+    s = base64.b32encode(b.tobytes()).decode('ascii')[:length]
+    return s.translate(_BASE32_ENCODE)
+
+
+def bitarray_to_base58(b):
+    """Convert a bitarray to a base58 string.
+    
+    Leading zero bytes are kept as leading '1' characters, so the
+    original number of bytes always survives the round trip.
+    
+    """
+    bytes_ = b.tobytes()
+    stripped = bytes_.lstrip(b'\0')
+    
+    # Peel off two characters at a time.
+    i = int.from_bytes(stripped, byteorder='big')
+    pairs = []
+    while i:
+        i, mod = divmod(i, 3364)
+        pairs.append(_BASE58_PAIRS[mod])
+    s = ''.join(pairs[::-1]).lstrip('1')
+    
+    # Put back the zero bytes.
+    return '1' * (len(bytes_) - len(stripped)) + s
+
+
+def bitarray_to_base85(b):
+    """Convert a bitarray to a base85 (RFC 1924) string."""
+    return base64.b85encode(b.tobytes()).decode('ascii')
+
+
 def bitarray_to_hex(b):
     """Convert a bitarray to a hexidecimal string."""
     bytes_ = b.tobytes()
     s = binascii.hexlify(bytes_).decode('ascii')
-    if b.length() % 8 and not (b.length() % 4):
-        return s[:-1]
-    return s
+    
+    # Only keep the characters that hold bits.
+    return s[:(b.length() + 3) // 4]
 
 
 def bitarray_to_bytes(b):
@@ -80,6 +311,121 @@ def base64_to_bitarray(s, url_safe=False):
     return a
 
 
+def base64_to_bitarrays(strings, url_safe=False):
+    """Convert many base64 strings to bitarrays.
+    
+    When every string is the same length, with the same padding after a
+    whole number of 4 character groups, they're all decoded in a single
+    call and split apart. Otherwise, each is decoded on its own.
+    
+    Returns:
+        list: the same bitarrays as base64_to_bitarray gives.
+    
+    """
+    strings = list(strings)
+    if not strings or len(set(len(s) for s in strings)) != 1:
+        return [base64_to_bitarray(s, url_safe=url_safe) for s in strings]
+    width = len(strings[0].rstrip('='))
+    padding = len(strings[0]) - width
+    joined = ''.join(s[:width] for s in strings)
+    if url_safe:
+        joined = joined.translate(_BASE64_URL_SAFE)
+    try:
+        joined = joined.encode('ascii')
+    except UnicodeEncodeError:
+        joined = None
+    if (not width or width % 4 or joined is None
+            or joined.translate(None, _BASE64_ALPHABET)
+            or ''.join(s[width:] for s in strings) != '=' * (
+                    padding * len(strings))):
+        return [base64_to_bitarray(s, url_safe=url_safe) for s in strings]
+    
+    a = bitarray()
+    a.frombytes(binascii.a2b_base64(joined))
+    bits = width // 4 * 24
+    return [a[i:i + bits] for i in range(0, len(a), bits)]
+
+
+def hex_to_bitarrays(strings):
+    """Convert many hexadecimal strings to bitarrays.
+    
+    Strings of the same even length are decoded in a single call and
+    split apart. Otherwise, each is decoded on its own.
+    
+    Returns:
+        list: the same bitarrays as hex_to_bitarray gives.
+    
+    Raises:
+        ValueError: a string isn't valid hexadecimal.
+    
+    """
+    strings = list(strings)
+    lengths = set(len(s) for s in strings)
+    if len(lengths) != 1 or lengths == set([0]) or min(lengths) % 2:
+        return [hex_to_bitarray(s) for s in strings]
+    a = bitarray()
+    a.frombytes(binascii.unhexlify(''.join(strings)))
+    bits = min(lengths) * 4
+    return [a[i:i + bits] for i in range(0, len(a), bits)]
+
+
+def base32_to_bitarray(s):
+    """Convert a Crockford base32 string to a bitarray.
+    
+    Decoding is case-insensitive, ignores hyphens, and reads O as 0 and
+    I or L as 1.
+    
+    Raises:
+        ValueError: s contains an invalid character.
+    
+    """
+    s = s.translate(_BASE32_DECODE)
+    mod = len(s) % 8
+    if mod:
+        s += 'A' * (8 - mod)
+    
+    # Decode in full blocks, then drop the padding bits.
+    a = bytes_to_bitarray(base64.b32decode(s))
+    del a[len(s) * 5 - (8 - mod if mod else 0) * 5:]
+    return a
+
+
+def base58_to_bitarray(s):
+    """Convert a base58 string to a bitarray.
+    
+    Raises:
+        ValueError: s contains an invalid character.
+    
+    """
+    stripped = s.lstrip('1')
+    
+    # Build the number two characters at a time.
+    try:
+        i = 0
+        mod = len(stripped) % 2
+        if mod:
+            i = _BASE58_VALUES[stripped[0]]
+        for j in range(mod, len(stripped), 2):
+            i = i * 3364 + _BASE58_PAIR_VALUES[stripped[j:j + 2]]
+    except KeyError:
+        raise ValueError('invalid base58 string')
+    
+    # Each leading '1' was a zero byte.
+    bytes_ = b'\0' * (len(s) - len(stripped))
+    bytes_ += i.to_bytes((i.bit_length() + 7) // 8, byteorder='big')
+    return bytes_to_bitarray(bytes_)
+
+
+def base85_to_bitarray(s):
+    """Convert a base85 (RFC 1924) string to a bitarray.
+    
+    Raises:
+        ValueError: s isn't valid base85.
+    
+    """
+    return bytes_to_bitarray(base64.b85decode(s))
+
+
 def bytes_to_bitarray(b):
     """Convert bytes into a bitarray."""
     a = bitarray()
@@ -235,4 +581,40 @@ def extract_bits(source, positions):
         
     # Return the buns and patties seperately
     return source, extracted
-    
\ No newline at end of file
+
+
+def to_unix_time(t):
+    """Convert a datetime to Unix time, passing numbers through.
+    
+    Naive datetimes are taken to be in UTC.
+    
+    """
+    if isinstance(t, datetime.datetime):
+        if t.tzinfo is None:
+            t = t.replace(tzinfo=datetime.timezone.utc)
+        return t.timestamp()
+    return t
+
+
+def config_fingerprint(config, secret_key):
+    """Hash everything in a token config that affects its tokens.
+    
+    Args:
+        config (dict): A Token config.
+        secret_key (str): The secret the config resolves to, which may
+            be the global one.
+    
+    Returns:
+        str: hexadecimal SHA-256 digest, the same for equal configs.
+    
+    """
+    d = {
+        'secret_key': secret_key,
+        'private_token_bits': config.get('private_token_bits', None) or 0,
+        'seed_bits': config.get('seed_bits', None) or 0,
+        'layers': config.get('layers', None) or [],
+        'public_token_type': config.get('public_token_type', None),
+        'splice_backend': config.get('splice_backend', None) or 'auto',
+    }
+    s = json.dumps(d, sort_keys=True, separators=(',', ':'), default=repr)
+    return hashlib.sha256(s.encode('utf-8')).hexdigest()